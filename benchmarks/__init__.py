@@ -0,0 +1,17 @@
+"""
+benchmarks of the client against a local stand-in api
+
+Run all benchmarks, or some of them, from the repository root, e.g.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run download list --scale large
+    python -m benchmarks.run --baseline results.json
+    python -m benchmarks.run docs --profile docs.prof
+
+Each module bench_<name>.py has a function run(scale) returning a list of
+results, one per case, with the median time of several runs, the number of
+requests and the throughput. With --baseline, cases that are slower than
+in an earlier run are reported, and the exit status is 1. The exit status
+is also 1 when a scaling case (bench_docs) grows faster with the size of
+its input than allowed.
+"""
@@ -0,0 +1,158 @@
+"""
+the markdown document pipeline (functions of cap_client.docs applied to
+every published document)
+
+Two kinds of cases:
+ - corpus: each function applied to all documents of a generated corpus;
+   throughput is in documents per second
+ - scaling: one function timed on inputs of increasing size (body length,
+   number of placeholders, support files or notes). The slope of log(time)
+   against log(size) estimates the exponent of the complexity; a case fails
+   when the slope exceeds its limit, e.g. when a linear step becomes
+   quadratic.
+"""
+
+import math
+import os
+import tempfile
+import time
+from os.path import join
+from cap_client.docs import read_header_content, \
+    prep_header_body_from_file, inject_context, inject_support, prep_notes
+from .corpus import write_corpus, write_document
+
+
+# number of documents in the corpus, and sizes for scaling cases
+SIZES = {"small": (200, (500, 1000, 2000, 4000, 8000)),
+         "large": (2000, (1000, 4000, 16000, 64000, 256000))}
+# largest slope accepted for linear steps (above 1 to allow for noise)
+MAX_SLOPE = 1.3
+# minimum duration of one timing
+MIN_SECONDS = 0.02
+
+
+def per_call(function, repeat=3):
+    """smallest time for one call of a function, over several timings"""
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            break
+        calls *= 2
+    best = elapsed / calls
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+def slope(sizes, seconds):
+    """least-squares slope of log(seconds) against log(sizes)"""
+    x = [math.log(_) for _ in sizes]
+    y = [math.log(max(_, 1e-9)) for _ in seconds]
+    mean_x, mean_y = sum(x) / len(x), sum(y) / len(y)
+    covariance = sum((a - mean_x) * (b - mean_y) for a, b in zip(x, y))
+    variance = sum((a - mean_x) ** 2 for a in x)
+    return covariance / variance
+
+
+def corpus_cases(directory, documents):
+    """time each step of the pipeline over a corpus"""
+    paths = write_corpus(directory, documents, paragraphs=20,
+                         placeholders=4, support=3)
+    prepared = [prep_header_body_from_file(_, "blog") for _ in paths]
+    file_lists = [[{"file_name": _, "path": "x/" + _}
+                   for _ in header["support"]] for header, body in prepared]
+    memo = dict()
+    steps = {
+        "read_header_content": lambda: [read_header_content(_)
+                                        for _ in paths],
+        "prep_header_body_from_file": lambda: [
+            prep_header_body_from_file(_, "blog") for _ in paths],
+        "inject_context": lambda: [
+            inject_context(body["content"], header["context"],
+                           dir=directory, memo=memo)
+            for header, body in prepared],
+        "inject_support": lambda: [
+            inject_support(body["content"], header["support"], files,
+                           "https://api.captest.io")
+            for (header, body), files in zip(prepared, file_lists)],
+        "prep_notes": lambda: [prep_notes(header["notes"])
+                               for header, body in prepared]
+    }
+    results = []
+    for name, step in steps.items():
+        runs = []
+        for _ in range(3):
+            start = time.perf_counter()
+            step()
+            runs.append(time.perf_counter() - start)
+        seconds = sorted(runs)[1]
+        results.append({"benchmark": "docs", "case": "corpus " + name,
+                        "params": {"documents": documents},
+                        "seconds": round(seconds, 6),
+                        "runs": [round(_, 6) for _ in runs],
+                        "units": documents,
+                        "throughput": round(documents / seconds, 3)})
+    return results
+
+
+def scaling_inputs(directory, size):
+    """functions of one input of a given size, for each scaling case"""
+    # body with about size lines
+    path = write_document(directory, "body_" + str(size),
+                          paragraphs=size // 2, placeholders=0, support=0)
+    # content with size placeholders, and a context with size values
+    context = {"value_" + str(i): "text " + str(i) for i in range(size)}
+    content = " ".join("{value_" + str(i) + "}" for i in range(size))
+    # content with size links to support files
+    support = ["image_" + str(i) + ".png" for i in range(size)]
+    file_list = [{"file_name": _, "path": "x/" + _} for _ in support]
+    links = "\n".join("![figure](" + _ + ")" for _ in support)
+    notes = ["note " + str(i) for i in range(size)]
+    return {
+        "read_header_content body": lambda: read_header_content(path),
+        "prep_header_body_from_file body": lambda:
+            prep_header_body_from_file(path, "blog"),
+        "inject_context placeholders": lambda:
+            inject_context(content, context, dir=directory),
+        "inject_support support": lambda:
+            inject_support(links, support, file_list,
+                           "https://api.captest.io"),
+        "prep_notes notes": lambda: prep_notes(notes)
+    }
+
+
+def scaling_cases(directory, sizes):
+    """time each step with inputs of increasing size, and fit slopes"""
+    timings = dict()
+    for size in sizes:
+        subdir = join(directory, str(size))
+        os.makedirs(subdir)
+        for name, function in scaling_inputs(subdir, size).items():
+            timings.setdefault(name, []).append(per_call(function))
+    results = []
+    for name, seconds in timings.items():
+        fitted = slope(sizes, seconds)
+        results.append({"benchmark": "docs", "case": "scaling " + name,
+                        "params": {"sizes": list(sizes)},
+                        "seconds": round(sum(seconds), 6),
+                        "runs": [round(_, 9) for _ in seconds],
+                        "slope": round(fitted, 3), "max_slope": MAX_SLOPE,
+                        "passed": fitted <= MAX_SLOPE})
+    return results
+
+
+def run(scale="small"):
+    documents, sizes = SIZES[scale]
+    with tempfile.TemporaryDirectory() as directory:
+        corpus_dir = join(directory, "corpus")
+        os.makedirs(corpus_dir)
+        results = corpus_cases(corpus_dir, documents)
+        results += scaling_cases(join(directory, "scaling"), sizes)
+    return results
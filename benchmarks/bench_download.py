@@ -0,0 +1,46 @@
+"""
+downloading the data files of an assignment (Assignment.download)
+
+Throughput is in bytes per second.
+"""
+
+import shutil
+import tempfile
+from cap_client.assignments import Assignment
+from .common import client, measure
+from .mock_server import MockApi
+
+
+SIZES = {"small": (8, 1 << 18), "large": (32, 1 << 22)}
+
+
+def run(scale="small"):
+    files, file_size = SIZES[scale]
+    results = []
+    for latency, error_rate in [(0.005, 0), (0.005, 0.05)]:
+        with MockApi(files=files, file_size=file_size, latency=latency,
+                     error_rate=error_rate) as api:
+            for jobs in (1, 4):
+                assignment = client(api, Assignment)
+                data_dir = tempfile.mkdtemp()
+
+                def download():
+                    result = assignment.download("a0", data_dir=data_dir,
+                                                 jobs=jobs)
+                    failed = [_ for _ in result if "_exception" in _]
+                    if len(failed) > 0:
+                        raise RuntimeError(failed[0]["_exception"])
+                    return sum(_["_bytes"] for _ in result)
+
+                case = "jobs=" + str(jobs)
+                if error_rate > 0:
+                    case += " errors=" + str(error_rate)
+                try:
+                    results.append(measure(
+                        "download", case, download, api, files=files,
+                        file_size=file_size, jobs=jobs, latency=latency,
+                        error_rate=error_rate))
+                finally:
+                    assignment.session.close()
+                    shutil.rmtree(data_dir)
+    return results
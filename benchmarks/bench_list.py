@@ -0,0 +1,37 @@
+"""
+listing assignments page by page (list_assignments)
+
+Throughput is in assignments per second.
+"""
+
+from cap_client.assignments import Assignment
+from .common import client, measure
+from .mock_server import MockApi
+
+
+SIZES = {"small": 2000, "large": 50000}
+
+
+def run(scale="small"):
+    assignments = SIZES[scale]
+    results = []
+    for envelope in (True, False):
+        with MockApi(assignments=assignments, latency=0.002,
+                     envelope=envelope) as api:
+            assignment = client(api, Assignment)
+            for prefetch in (True, False):
+
+                def listing():
+                    pages = assignment.iter_pages("/assignment/bench",
+                                                  page_size=100,
+                                                  prefetch=prefetch)
+                    return sum(1 for _ in pages)
+
+                case = ("envelope" if envelope else "list") + \
+                    (" prefetch" if prefetch else "")
+                results.append(measure("list", case, listing, api,
+                                       assignments=assignments,
+                                       envelope=envelope,
+                                       prefetch=prefetch))
+            assignment.session.close()
+    return results
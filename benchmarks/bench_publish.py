@@ -0,0 +1,52 @@
+"""
+publishing a directory of documents (admin publish --dir)
+
+Documents are sent with the same function as cap_admin_client.py, with
+force (all documents sent) and without force (all documents unchanged).
+Throughput is in documents per second.
+"""
+
+import tempfile
+from cap_client.batch import map_files
+from cap_client.docs import Doc
+from .common import client, measure
+from .corpus import write_corpus
+from .mock_server import MockApi
+
+
+SIZES = {"small": 50, "large": 1000}
+
+
+def run(scale="small"):
+    documents = SIZES[scale]
+    results = []
+    with tempfile.TemporaryDirectory() as tempdir, \
+            MockApi(latency=0.002) as api:
+        paths = write_corpus(tempdir, documents)
+        for i in range(documents):
+            name = "doc_" + str(i)
+            api.add_document("blog", name, 1, files=[
+                name + "_0.png", name + "_1.png"])
+        for jobs in (1, 8):
+            for force in (True, False):
+                doc = client(api, Doc)
+
+                def publish():
+                    results = list(map_files(doc.update, paths, jobs=jobs,
+                                             collection="blog",
+                                             action="publish", force=force))
+                    doc.save_manifests()
+                    failed = [_ for _ in results if "_exception" in _]
+                    if len(failed) > 0:
+                        raise RuntimeError(failed[0]["_exception"])
+                    return len(results)
+
+                case = "jobs=" + str(jobs) + \
+                    (" force" if force else " unchanged")
+                try:
+                    results.append(measure("publish", case, publish, api,
+                                           documents=documents, jobs=jobs,
+                                           force=force))
+                finally:
+                    doc.session.close()
+    return results
@@ -0,0 +1,40 @@
+"""
+uploading response files (Datafile.upload)
+
+Throughput is in bytes per second.
+"""
+
+import os
+import tempfile
+from os.path import getsize, join
+from cap_client.datafiles import Datafile
+from .common import client, measure
+from .mock_server import MockApi
+
+
+SIZES = {"small": (1 << 16, 1 << 22), "large": (1 << 16, 1 << 22, 1 << 26)}
+
+
+def run(scale="small"):
+    results = []
+    with tempfile.TemporaryDirectory() as tempdir, \
+            MockApi(latency=0.005) as api:
+        datafile = client(api, Datafile)
+        try:
+            for size in SIZES[scale]:
+                path = join(tempdir, "response_" + str(size) + ".bin")
+                with open(path, "wb") as f:
+                    f.write(os.urandom(size))
+
+                def upload():
+                    datafile.upload(path, file_role="response",
+                                    parent_uuid="a0",
+                                    parent_type="assignment",
+                                    source="bench", license="CC BY 4.0")
+                    return getsize(path)
+
+                results.append(measure("upload", "size=" + str(size),
+                                       upload, api, size=size))
+        finally:
+            datafile.session.close()
+    return results
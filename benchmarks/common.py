@@ -0,0 +1,62 @@
+"""
+helpers shared by benchmarks: clients for the stand-in api, and timing
+"""
+
+import statistics
+import time
+from cap_client.credentials import CredentialsManager
+from cap_client.retry import RetryPolicy
+from cap_client.session import ApiSession
+
+
+# sizes of benchmarks, selected with --scale
+SCALES = ("small", "large")
+
+
+def client(api, cls, pool_size=10, retries=3):
+    """api interface of a class, connected to a stand-in api
+
+    :param api: MockApi object
+    :param cls: class derived from Api, e.g. Assignment
+    :param pool_size: integer, maximum number of pooled connections
+    :param retries: integer, maximum number of retries (with short delays)
+    :return: object of class cls
+    """
+    session = ApiSession(pool_size=pool_size,
+                         retry=RetryPolicy(retries=retries, backoff=0.01))
+    credentials = CredentialsManager("bench", "nonexistent.yaml",
+                                     token="bench", session=session)
+    return cls(api.url, credentials)
+
+
+def measure(benchmark, case, function, api, repeat=3, setup=None,
+            **params):
+    """time several runs of a function
+
+    :param benchmark: string, name of the benchmark
+    :param case: string, name of the case within the benchmark
+    :param function: function without arguments, returning the number of
+        bytes or records processed (or None)
+    :param api: MockApi object, used to count requests
+    :param repeat: integer, number of runs
+    :param setup: function called before each run (not timed), or None
+    :param params: parameters of the case, recorded in the result
+    :return: dictionary with the median time, all times, the number of
+        requests of one run, and the throughput (units per second)
+    """
+    runs, units = [], None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        api.reset()
+        start = time.perf_counter()
+        units = function()
+        runs.append(time.perf_counter() - start)
+    seconds = statistics.median(runs)
+    return {"benchmark": benchmark, "case": case, "params": params,
+            "seconds": round(seconds, 6),
+            "runs": [round(_, 6) for _ in runs],
+            "requests": sum(api.requests.values()),
+            "units": units,
+            "throughput": round(units / seconds, 3)
+            if units and seconds > 0 else None}
@@ -0,0 +1,62 @@
+"""
+generated markdown documents, in the format used by admin commands
+"""
+
+from os.path import join
+
+
+def write_document(directory, name, paragraphs=10, placeholders=2,
+                   support=2, collection="blog", version=1):
+    """write one document, with its context files
+
+    :param directory: string, directory for the document and its files
+    :param name: string, document name (the file name also holds the
+        version, as expected by validate_naming)
+    :param paragraphs: integer, number of paragraphs in the body
+    :param placeholders: integer, number of context placeholders, each used
+        once in the body and backed by a small text file
+    :param support: integer, number of support files (images) linked from
+        the body; the files themselves are not written
+    :param collection: string, collection of the document
+    :param version: document version
+    :return: string, path to the document
+    """
+    lines = ["---", "name: " + name, "version: " + str(version),
+             "collection: " + collection, "title: Document " + name,
+             "tags: bench generated", "notes: generated for benchmarks"]
+    if placeholders > 0:
+        lines.append("context:")
+    for i in range(placeholders):
+        key = "value_" + str(i)
+        lines.append("  " + key + ": " + name + "_" + key + ".txt")
+        with open(join(directory, name + "_" + key + ".txt"), "w") as f:
+            f.write("context value " + str(i))
+    if support > 0:
+        lines.append("support:")
+    lines += ["- " + name + "_" + str(i) + ".png" for i in range(support)]
+    lines += ["---", ""]
+    for i in range(paragraphs):
+        lines.append("Paragraph " + str(i) + " of " + name + ", with some "
+                     "text that describes the challenge in more detail.")
+        if i < placeholders:
+            lines.append("A value from context: {value_" + str(i) + "}.")
+        if i < support:
+            lines.append("![figure " + str(i) + "](" + name + "_" + str(i) +
+                         ".png)")
+        lines.append("")
+    path = join(directory, name + "_v" + str(version) + ".md")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def write_corpus(directory, documents, **kwargs):
+    """write several documents doc_0, doc_1, ... into a directory
+
+    :param directory: string, directory for the documents
+    :param documents: integer, number of documents
+    :param kwargs: arguments passed on to write_document
+    :return: list of paths to documents
+    """
+    return [write_document(directory, "doc_" + str(i), **kwargs)
+            for i in range(documents)]
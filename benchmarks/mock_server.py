@@ -0,0 +1,258 @@
+"""
+local stand-in for the captest api, with configurable latency, bandwidth
+and error rate
+
+Implemented endpoints:
+ - GET /assignment/<username> (paginated), GET /assignment/view/<uuid>,
+   POST /assignment/create/, POST /assignment/submit/<uuid>
+ - GET /data/list/<uuid>, POST /data/upload, POST /data/delete/
+ - GET /static/<path> (with byte ranges)
+ - GET /<collection>/list/ (paginated), GET /<collection>/update/<name>/
+   <version>, POST /<collection>/update/<uuid>, /<collection>/create/ and
+   /<collection>/delete/
+ - GET /search/summary/, POST /search/build
+
+Content is generated: assignments a0, a1, ... each have data files of a
+configured size, and documents are registered with add_document.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+# size of blocks written when the bandwidth is limited
+BLOCK_SIZE = 1 << 16
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """answers requests from the state held by a MockApi"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self):
+        """request body, with a Content-Length or chunked encoding"""
+        if "chunked" in self.headers.get("Transfer-Encoding", ""):
+            size, body = 0, bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return bytes(body)
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def send(self, status, body, headers=None):
+        api = self.server.api
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        for k, v in (headers or dict()).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if api.bandwidth <= 0:
+            self.wfile.write(body)
+            return
+        for start in range(0, len(body), BLOCK_SIZE):
+            block = body[start:start + BLOCK_SIZE]
+            self.wfile.write(block)
+            time.sleep(len(block) / api.bandwidth)
+
+    def handle_request(self, body=None):
+        api = self.server.api
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        path = [_ for _ in parts.path.split("/") if _ != ""]
+        api.count(self.command, path)
+        if api.latency > 0:
+            time.sleep(api.latency)
+        if api.fail():
+            self.send(503, {"detail": "busy"}, {"Retry-After": "0"})
+            return
+        if body is not None:
+            api.receive(len(body))
+        status, result, headers = api.route(self.command, path, query,
+                                            self.headers)
+        self.send(status, result, headers)
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request(self.read_body())
+
+
+def _page(records, query, envelope, path):
+    """one page of a listing, as an envelope or a plain list"""
+    page = int(query.get("page", ["1"])[0])
+    size = int(query.get("page_size", [str(len(records) or 1)])[0])
+    items = records[(page - 1) * size:page * size]
+    if not envelope:
+        return items
+    if page > 1 and len(items) == 0:
+        return {"detail": "Invalid page."}
+    more = page * size < len(records)
+    return {"count": len(records), "results": items,
+            "next": path + "?page=" + str(page + 1) if more else None}
+
+
+class MockApi:
+    """Stand-in api server running in a background thread"""
+
+    def __init__(self, assignments=10, files=2, file_size=1 << 16,
+                 latency=0, bandwidth=0, error_rate=0, envelope=True,
+                 seed=0):
+        """generates content and starts the server
+
+        :param assignments: integer, number of assignments of the user
+        :param files: integer, number of data files of each assignment
+        :param file_size: integer, size of each data file (bytes)
+        :param latency: number of seconds before each response
+        :param bandwidth: maximum bytes per second for each response body
+            (0: no limit)
+        :param error_rate: fraction of requests answered with status 503
+        :param envelope: logical, listings are pages with results and next
+            (otherwise plain lists)
+        :param seed: integer, seed for the errors
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.envelope = envelope
+        self.random = random.Random(seed)
+        self.assignments = [{"uuid": "a" + str(i), "status": "generated",
+                             "challenge_name": "bench",
+                             "challenge_version": "1"}
+                            for i in range(assignments)]
+        self.files = files
+        self.content = bytes(range(256)) * (file_size // 256) + \
+            bytes(file_size % 256)
+        self.documents = dict()
+        self.document_files = dict()
+        self.requests = Counter()
+        self.received = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+        self.server.daemon_threads = True
+        self.server.api = self
+        self.url = "http://127.0.0.1:" + str(self.server.server_port)
+        threading.Thread(target=self.server.serve_forever, args=(0.05,),
+                         daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def count(self, method, path):
+        """count requests by method and endpoint (first two segments)"""
+        with self._lock:
+            self.requests[method + " /" + "/".join(path[:2])] += 1
+
+    def fail(self):
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self.random.random() < self.error_rate
+
+    def receive(self, size):
+        """count bytes received in request bodies"""
+        with self._lock:
+            self.received += size
+
+    def reset(self):
+        """forget counts of requests and received bytes"""
+        with self._lock:
+            self.requests.clear()
+            self.received = 0
+
+    def add_document(self, collection, name, version, files=()):
+        """register a document, so that it can be updated
+
+        :param collection: string, collection of the document
+        :param name: string, document name
+        :param version: document version
+        :param files: list of names of data files of the document (e.g.
+            support files already uploaded)
+        :return: string, uuid of the document
+        """
+        uuid = "d" + str(len(self.documents))
+        self.documents[(collection, name, str(version))] = uuid
+        self.document_files[uuid] = list(files)
+        return uuid
+
+    def datafiles(self, uuid):
+        if uuid in self.document_files:
+            return [{"uuid": uuid + "-" + name, "file_role": "support",
+                     "file_name": name, "path": uuid + "/" + name}
+                    for name in self.document_files[uuid]]
+        return [{"uuid": uuid + "-f" + str(i), "file_role": "primary",
+                 "file_name": "file_" + str(i) + ".bin",
+                 "path": uuid + "/file_" + str(i) + ".bin"}
+                for i in range(self.files)]
+
+    def static(self, headers):
+        """content of a data file, or the range requested in headers"""
+        size = len(self.content)
+        value = headers.get("Range", "")
+        if not value.startswith("bytes="):
+            return 200, self.content, None
+        start = int(value[6:].split("-")[0])
+        if start >= size:
+            return 416, b"", {"Content-Range": "bytes */" + str(size)}
+        content_range = "bytes " + str(start) + "-" + str(size - 1) + \
+            "/" + str(size)
+        return 206, self.content[start:], {"Content-Range": content_range}
+
+    def route(self, method, path, query, headers):
+        """status, body and headers of the response to a request"""
+        if len(path) == 0:
+            return 404, {"detail": "not found"}, None
+        head, rest = path[0], path[1:]
+        if head == "static":
+            return self.static(headers)
+        if head == "assignment":
+            if method == "GET" and rest[:1] == ["view"]:
+                return 200, {"uuid": rest[1], "status": "complete",
+                             "score": 0.5}, None
+            if method == "GET" and len(rest) == 1:
+                return 200, _page(self.assignments, query, self.envelope,
+                                  "/assignment/" + rest[0]), None
+            if method == "POST" and rest[:1] in (["create"], ["submit"]):
+                return 200, {"uuid": "a0", "status": "submitted"}, None
+        if head == "data":
+            if rest[:1] == ["list"]:
+                return 200, self.datafiles(rest[1]), None
+            if method == "POST" and rest[:1] in (["upload"], ["delete"]):
+                return 200, {"uuid": "f-new", "bytes": self.received}, None
+        if head == "search":
+            return 200, {"documents": len(self.documents)}, None
+        if rest[:1] == ["list"]:
+            records = [{"uuid": v, "name": k[1], "version": k[2]}
+                       for k, v in self.documents.items() if k[0] == head]
+            return 200, _page(records, query, self.envelope,
+                              "/" + head + "/list/"), None
+        if rest[:1] == ["update"] and method == "GET":
+            uuid = self.documents.get((head, rest[1], "/".join(rest[2:])))
+            if uuid is None:
+                return 200, {"detail": "not found"}, None
+            return 200, {"uuid": uuid}, None
+        if method == "POST" and rest[:1] in (["update"], ["create"],
+                                              ["delete"]):
+            return 200, {"uuid": rest[1] if len(rest) > 1 else "d-new"}, None
+        return 404, {"detail": "not found"}, None
@@ -0,0 +1,122 @@
+"""
+run benchmarks against a local stand-in api and write results as json
+Usage: python -m benchmarks.run --help
+"""
+
+import argparse
+import cProfile
+import importlib
+import json
+import platform
+import pstats
+import sys
+import time
+from .common import SCALES
+
+
+BENCHMARKS = ("download", "upload", "publish", "list", "docs")
+
+
+def compare(results, baseline, tolerance=0.25, min_seconds=0.01):
+    """cases that are slower than in a baseline
+
+    :param results: list of benchmark results
+    :param baseline: list of benchmark results from an earlier run
+    :param tolerance: fraction by which a case may be slower
+    :param min_seconds: differences smaller than this are ignored
+    :return: list of dictionaries describing regressions
+    """
+    before = {(_["benchmark"], _["case"]): _["seconds"] for _ in baseline}
+    regressions = []
+    for result in results:
+        seconds = before.get((result["benchmark"], result["case"]))
+        if seconds is None:
+            continue
+        if result["seconds"] > seconds * (1 + tolerance) and \
+                result["seconds"] - seconds > min_seconds:
+            regressions.append({"benchmark": result["benchmark"],
+                                "case": result["case"],
+                                "baseline": seconds,
+                                "seconds": result["seconds"]})
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="benchmarks of the captest client, using a local "
+                    "stand-in api")
+    parser.add_argument("benchmarks", nargs="*", default=list(BENCHMARKS),
+                        metavar="BENCHMARK",
+                        help="benchmarks to run (default: all of " +
+                             ", ".join(BENCHMARKS) + ")")
+    parser.add_argument("--scale", action="store", default="small",
+                        choices=SCALES, help="size of the workloads")
+    parser.add_argument("--output", action="store", default=None,
+                        help="json file for the results (default: "
+                             "standard output)")
+    parser.add_argument("--baseline", action="store", default=None,
+                        help="json file with results of an earlier run; "
+                             "exit with status 1 if a case is slower")
+    parser.add_argument("--tolerance", action="store", type=float,
+                        default=0.25,
+                        help="fraction by which a case may be slower than "
+                             "the baseline")
+    parser.add_argument("--profile", action="store", default=None,
+                        help="file for profiling statistics (cProfile), "
+                             "e.g. for snakeviz; the functions with the "
+                             "largest cumulative times are also displayed")
+    config = parser.parse_args(args)
+    for name in config.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark: " + name)
+
+    results = []
+    profile = cProfile.Profile() if config.profile is not None else None
+    for name in config.benchmarks:
+        module = importlib.import_module("benchmarks.bench_" + name)
+        if profile is not None:
+            profile.enable()
+        for result in module.run(config.scale):
+            slope = " slope %.2f" % result["slope"] if "slope" in result \
+                else ""
+            print(result["benchmark"], result["case"],
+                  "%.4fs" % result["seconds"] + slope, file=sys.stderr)
+            results.append(result)
+        if profile is not None:
+            profile.disable()
+    if profile is not None:
+        profile.dump_stats(config.profile)
+        stats = pstats.Stats(config.profile, stream=sys.stderr)
+        stats.sort_stats("cumulative").print_stats("cap_client", 20)
+    report = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "scale": config.scale,
+              "results": results}
+    if config.baseline is not None:
+        with open(config.baseline) as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(results, baseline["results"],
+                                        tolerance=config.tolerance)
+    if config.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(config.output, "w") as f:
+            json.dump(report, f, indent=2)
+    for regression in report.get("regressions", []):
+        print("regression:", regression["benchmark"], regression["case"],
+              "%.4fs (baseline %.4fs)" % (regression["seconds"],
+                                          regression["baseline"]),
+              file=sys.stderr)
+    failed = [_ for _ in results if _.get("passed") is False]
+    for result in failed:
+        print("failed:", result["benchmark"], result["case"],
+              "slope %.2f above %.2f" % (result["slope"],
+                                         result["max_slope"]),
+              file=sys.stderr)
+    return 1 if report.get("regressions") or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,16 +3,15 @@ a command-line client for admin users of the captest.io api
 Usage: python cap_admin_client.py --help
 """
 
+import atexit
 import logging
-from json import dumps
+import sys
 from os import listdir
 from os.path import join, basename
 from cap_client.parser import parser, subparsers
 from cap_client.validations import validate_config, validate_credentials
-from cap_client.errors import ValidationError
-from cap_client.credentials import CredentialsManager
-from cap_client.docs import Doc
-from cap_client.search import Search
+from cap_client.errors import ClientError, ValidationError
+from cap_client.output import write_result
 
 
 # this is a command line utility
@@ -56,6 +55,10 @@ for sp in [sp_create, sp_publish, sp_upload,
     sp.add_argument("--checks", action="store", default="strict",
                     choices=["strict", "none"],
                     help="run non-obligatory consistency checks")
+    sp.add_argument("--jobs", action="store", type=int, default=1,
+                    help="number of files processed concurrently")
+sp_publish.add_argument("--force", action="store_true",
+                        help="publish documents even if they are unchanged")
 
 # build search
 sp_search = subparsers.add_parser("build_search")
@@ -63,15 +66,47 @@ sp_search = subparsers.add_parser("build_search")
 # summarize content
 sp_summarize = subparsers.add_parser("summarize")
 
+# run commands read from standard input
+sp_batch = subparsers.add_parser("batch",
+                                 help="run commands read from standard input, "
+                                      "one per line, sharing connections")
+
 
 # ############################################################################
 # validation of command-line arguments
 
 try:
     config = validate_config(parser.parse_args())
+    # modules for performing requests are imported only after arguments are
+    # parsed, so --help and invalid arguments return quickly
+    from cap_client.credentials import CredentialsManager
+    from cap_client.session import ApiSession
+    from cap_client.retry import RetryPolicy
+    from cap_client.responses import ResponseCache, parse_ttl
+    from cap_client.multipart import print_progress
+    from cap_client.logs import set_log_levels
+    set_log_levels(config.log_level)
+    tracer = None
+    if config.trace is not None:
+        from cap_client.tracing import open_tracer
+        tracer = open_tracer(config.trace, config.trace_format)
+        atexit.register(tracer.close)
+    responses = None
+    if not config.no_cache:
+        responses = ResponseCache(config.cache_dir,
+                                  ttl=parse_ttl(config.cache_ttl))
+    session = ApiSession(pool_size=config.pool_size,
+                         keep_alive=config.keep_alive,
+                         responses=responses,
+                         progress=print_progress if config.progress else None,
+                         rate=config.rate,
+                         retry=RetryPolicy(retries=config.retries,
+                                           backoff=config.backoff),
+                         tracer=tracer)
     credentials = CredentialsManager(username=config.username,
                                      path=config.secrets,
-                                     token=config.token)
+                                     token=config.token,
+                                     session=session)
     credentials = validate_credentials(credentials)
 except ValidationError as e:
     logging.error(e.message)
@@ -83,40 +118,78 @@ if config.verbose:
 # ############################################################################
 # distribute work to handling functions
 
-doc = Doc(config.api, credentials)
-search = Search(config.api, credentials)
-result = []
-
 # managing images, challenged, documentation pages, blog posts, etc.
+# (actions mapped to methods of Doc)
 doc_actions = {
-    "create": doc.create,
-    "publish": doc.update,
-    "upload_primary": doc.upload_primary,
-    "upload_support": doc.upload_support,
-    "upload": doc.upload
+    "create": "create",
+    "publish": "update",
+    "upload_primary": "upload_primary",
+    "upload_support": "upload_support",
+    "upload": "upload"
 }
-if config.action in doc_actions:
-    action = doc_actions[config.action]
+interfaces = dict()
+
+
+def get_doc():
+    """interface for documents, imported and created when first needed"""
+    if "doc" not in interfaces:
+        from cap_client.docs import Doc
+        interfaces["doc"] = Doc(config.api, credentials)
+    return interfaces["doc"]
+
+
+def get_search():
+    """interface for search, imported and created when first needed"""
+    if "search" not in interfaces:
+        from cap_client.search import Search
+        interfaces["search"] = Search(config.api, credentials)
+    return interfaces["search"]
+
+
+def handle_docs(config):
+    """results for each document, produced as documents are processed"""
+    from cap_client.batch import map_files
+    doc = get_doc()
+    action = getattr(doc, doc_actions[config.action])
     files = [config.file]
     if config.dir is not None:
-        files = [join(config.dir, _) for _ in listdir(config.dir)]
+        files = [join(config.dir, _) for _ in sorted(listdir(config.dir))]
     files = [_ for _ in files if _ is not None and _.endswith(".md")]
     files = [_ for _ in files if not basename(_).startswith("_")]
-    for f in files:
-        result.append(action(f, config.collection, action=config.action))
-
-# deleting challenges, resources, etc.
-if config.action == "delete":
-    result.append(doc.delete(config.file, config.collection))
-
-# managing search
-if config.action == "build_search":
-    result = search.build()
-if config.action == "summarize":
-    result = search.summary()
-
-# display output from the script
-print(dumps(result, indent=2))
+    try:
+        yield from map_files(action, files, jobs=config.jobs,
+                             collection=config.collection,
+                             action=config.action,
+                             force=getattr(config, "force", False))
+    finally:
+        doc.save_manifests()
+
+
+def handle(config):
+    """perform one action and return its output"""
+    if config.action in doc_actions:
+        return handle_docs(config)
+    # deleting challenges, resources, etc.
+    if config.action == "delete":
+        return [get_doc().delete(config.file, config.collection)]
+    # managing search
+    if config.action == "build_search":
+        return get_search().build()
+    if config.action == "summarize":
+        return get_search().summary()
+    return []
+
+
+if config.action == "batch":
+    from cap_client.commands import run_commands
+    if run_commands(parser, config, handle, sys.stdin) > 0:
+        exit(1)
+else:
+    try:
+        write_result(handle(config), config.output)
+    except (ClientError, ValidationError) as e:
+        logging.error(e.message)
+        exit()
 
 if config.save_secrets:
     credentials.save()
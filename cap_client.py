@@ -3,16 +3,16 @@ a command-line client for interacting with the captest.io api
 Usage: python cap_client.py --help
 """
 
+import atexit
 import logging
-import time
-from json import dumps
+import sys
+from os.path import join
+from cap_client.defaults import DEFAULT_CACHE_SIZE
 from cap_client.parser import parser, subparsers
 from cap_client.validations import validate_config, validate_credentials
-from cap_client.errors import ValidationError
-from cap_client.credentials import CredentialsManager
-from cap_client.datafiles import Datafile
-from cap_client.assignments import Assignment
-from cap_client.examples import ExampleDataset
+from cap_client.errors import ClientError, ValidationError
+from cap_client.output import write_result
+from cap_client.polling import Poller, STATUS_ORDER
 
 
 # this is a command line utility
@@ -29,13 +29,27 @@ logging.basicConfig(format='[%(asctime)s] %(levelname) -8s %(message)s',
 
 parser.description = "client for interfacing with www.captest.io"
 
+# cache of downloaded data files
+parser.add_argument("--cache_size", action="store", type=float,
+                    default=DEFAULT_CACHE_SIZE,
+                    help="maximum size of the cache of data files "
+                         "(megabytes)")
+parser.add_argument("--offline", action="store_true",
+                    help="serve data files only from the local cache, "
+                         "and reuse stored api responses (e.g. lists of "
+                         "data files) without revalidation")
+
 # list content for assignments, datafiles, etc.
-sp_list = subparsers.add_parser("list_assignments", help="list assignments")
+sp_list_assignments = subparsers.add_parser("list_assignments",
+                                            help="list assignments")
 
 sp_list = subparsers.add_parser("list_files", help="list data files")
 sp_list.add_argument("--uuid", action="store",
                      default=None, required=True,
                      help="uuid of parent object (e.g. assignment)")
+for sp in [sp_list_assignments, sp_list]:
+    sp.add_argument("--page_size", action="store", type=int, default=100,
+                    help="number of items requested at a time")
 
 # download the example dataset associated with a challenge
 sp_example = subparsers.add_parser("download_example",
@@ -52,10 +66,44 @@ for sp in [sp_example, sp_start]:
                     help="challenge identifier (overrides name and version)")
     sp.add_argument("--data_dir", action="store", default=".",
                     help="directory to store downloaded files")
+    sp.add_argument("--jobs", action="store", type=int, default=1,
+                    help="number of concurrent downloads")
 sp_start.add_argument("--download", action="store_true",
                       help="attempt automatic download of dataset files")
-sp_start.add_argument("--sleep", action="store", default=5,
-                      help="time interval before download attempt")
+sp_start.add_argument("--sleep", action="store", type=float, default=5,
+                      help="initial interval between status queries before "
+                           "download")
+
+# wait until an assignment reaches a status
+sp_wait = subparsers.add_parser("wait",
+                                help="wait for a status of an assignment")
+sp_wait.add_argument("--uuid", action="store", default=None, required=True,
+                     help="uuid of an assignment")
+sp_wait.add_argument("--status", action="store", default="generated",
+                     choices=STATUS_ORDER, help="status to wait for")
+sp_wait.add_argument("--interval", action="store", type=float, default=1,
+                     help="initial interval between status queries")
+
+# run many assignments from start to submission
+sp_run_batch = subparsers.add_parser("run_batch",
+                                     help="start, download, upload and "
+                                          "submit assignments from a manifest")
+sp_run_batch.add_argument("--manifest", action="store", default=None,
+                          required=True,
+                          help="yaml or json file listing assignments")
+sp_run_batch.add_argument("--data_dir", action="store", default=".",
+                          help="directory to store downloaded files "
+                               "(one subdirectory per assignment)")
+sp_run_batch.add_argument("--jobs", action="store", type=int, default=1,
+                          help="number of assignments processed at once")
+sp_run_batch.add_argument("--interval", action="store", type=float,
+                          default=1,
+                          help="initial interval between status queries")
+for sp in [sp_start, sp_wait, sp_run_batch]:
+    sp.add_argument("--max_interval", action="store", type=float, default=30,
+                    help="maximum interval between status queries")
+    sp.add_argument("--timeout", action="store", type=float, default=600,
+                    help="maximum time to wait for a status")
 
 
 # view/download/upload associated with an assignment
@@ -76,6 +124,8 @@ sp_upload_response.add_argument("--file", action="store",
                                 help="path to response data file")
 sp_download.add_argument("--data_dir", action="store", default=".",
                          help="directory to store downloaded files")
+sp_download.add_argument("--jobs", action="store", type=int, default=1,
+                         help="number of concurrent downloads")
 
 
 # submit an assignment
@@ -89,15 +139,76 @@ sp_submit.add_argument("--file", action="store",
 sp_submit.add_argument("--tags", action="store", default=None, required=True,
                        help="comma separated tags; use 'none' or '-' to skip")
 
+# local index of assignments
+sp_sync = subparsers.add_parser("sync",
+                                help="update the local index of assignments")
+sp_sync.add_argument("--full", action="store_true",
+                     help="refresh all assignments, even unchanged ones")
+sp_sync.add_argument("--jobs", action="store", type=int, default=1,
+                     help="number of assignments refreshed concurrently")
+sp_query = subparsers.add_parser("query",
+                                 help="query the local index of assignments")
+sp_query.add_argument("--status", action="store", default=None,
+                      help="only assignments with this status")
+sp_query.add_argument("--pending", action="store_true",
+                      help="only assignments that are not complete")
+sp_query.add_argument("--challenge", action="store", default=None,
+                      help="only assignments for this challenge")
+sp_query.add_argument("--datafiles", action="store_true",
+                      help="include data files of each assignment")
+sp_query.add_argument("--summary", action="store_true",
+                      help="number of assignments and best score for each "
+                           "challenge")
+sp_query.add_argument("--sql", action="store", default=None,
+                      help="read-only sql query on tables assignments and "
+                           "datafiles")
+for sp in [sp_sync, sp_query]:
+    sp.add_argument("--index", action="store", default=None,
+                    help="path to the index database (default: in the "
+                         "cache directory)")
+
+# run commands read from standard input
+sp_batch = subparsers.add_parser("batch",
+                                 help="run commands read from standard input, "
+                                      "one per line, sharing connections")
+
 
 # ############################################################################
 # validation of command-line arguments
 
 try:
     config = validate_config(parser.parse_args())
+    # modules for performing requests are imported only after arguments are
+    # parsed, so --help and invalid arguments return quickly
+    from cap_client.credentials import CredentialsManager
+    from cap_client.session import ApiSession
+    from cap_client.retry import RetryPolicy
+    from cap_client.responses import ResponseCache, parse_ttl
+    from cap_client.multipart import print_progress
+    from cap_client.logs import set_log_levels
+    set_log_levels(config.log_level)
+    tracer = None
+    if config.trace is not None:
+        from cap_client.tracing import open_tracer
+        tracer = open_tracer(config.trace, config.trace_format)
+        atexit.register(tracer.close)
+    responses = None
+    if not config.no_cache:
+        responses = ResponseCache(config.cache_dir,
+                                  ttl=parse_ttl(config.cache_ttl),
+                                  offline=config.offline)
+    session = ApiSession(pool_size=config.pool_size,
+                         keep_alive=config.keep_alive,
+                         responses=responses,
+                         progress=print_progress if config.progress else None,
+                         rate=config.rate,
+                         retry=RetryPolicy(retries=config.retries,
+                                           backoff=config.backoff),
+                         tracer=tracer)
     credentials = CredentialsManager(username=config.username,
                                      path=config.secrets,
-                                     token=config.token)
+                                     token=config.token,
+                                     session=session)
     credentials = validate_credentials(credentials)
 except ValidationError as e:
     logging.error(e.message)
@@ -109,49 +220,144 @@ if config.verbose:
 # ############################################################################
 # distribute work to handling functions
 
+from cap_client.cache import DownloadCache
+from cap_client.assignments import Assignment
+
 assignment = Assignment(config.api, credentials)
-datafile = Datafile(config.api, credentials)
-example = ExampleDataset(config.api, credentials)
+cache = None
+if not config.no_cache:
+    cache = DownloadCache(config.cache_dir, max_size=config.cache_size,
+                          offline=config.offline)
 
-result = []
 
-if config.action == "list_assignments":
-    result = assignment.list()
-if config.action == "list_files":
-    result = datafile.list(config.uuid)
+def log_status(previous, status, view):
+    """report transitions between assignment statuses"""
+    logging.info("assignment status: %s -> %s", previous, status)
 
-if config.action == "download_example":
-    result = example.download(uuid=config.uuid, data_dir=config.data_dir,
-                              name=config.name, version=config.version)
 
-if config.action == "start":
+def status_poller(config, interval):
+    """poller for assignment statuses, configured from arguments"""
+    return Poller(interval=interval, max_interval=config.max_interval,
+                  timeout=config.timeout, callback=log_status)
+
+
+def start(config):
     result = assignment.start(uuid=config.uuid,
                               name=config.name, version=config.version)
-    if config.download:
-        uuid = result["uuid"]
-        result = {"start": result}
-        time.sleep(config.sleep)
-        result["download"] = assignment.download(uuid=uuid,
-                                                 data_dir=config.data_dir)
-if config.action == "download":
-    result = assignment.download(uuid=config.uuid, data_dir=config.data_dir)
-if config.action == "upload_response":
-    result = assignment.upload(uuid=config.uuid, file_path=config.file)
-if config.action == "remove_response":
-    result = assignment.remove(uuid=config.uuid)
-if config.action == "submit":
-    if config.file is not None:
-        result = dict()
-        result["upload_response"] = assignment.upload(uuid=config.uuid,
-                                                      file_path=config.file)
-        result["submit"] = assignment.submit(uuid=config.uuid,
-                                             tags=config.tags)
-    else:
-        result = assignment.submit(uuid=config.uuid, tags=config.tags)
-if config.action == "view":
-    result = assignment.view(uuid=config.uuid)
-
-print(dumps(result, indent=2))
+    if not config.download:
+        return result
+    uuid = result["uuid"]
+    result = {"start": result}
+    result["wait"] = assignment.wait(uuid=uuid, status="generated",
+                                     poller=status_poller(config,
+                                                          config.sleep))
+    if "_exception" not in result["wait"]:
+        result["download"] = assignment.download(
+            uuid=uuid, data_dir=config.data_dir, jobs=config.jobs,
+            cache=cache)
+    return result
+
+
+def submit(config):
+    if config.file is None:
+        return assignment.submit(uuid=config.uuid, tags=config.tags)
+    result = dict()
+    result["upload_response"] = assignment.upload(uuid=config.uuid,
+                                                  file_path=config.file)
+    result["submit"] = assignment.submit(uuid=config.uuid, tags=config.tags)
+    return result
+
+
+def download_example(config):
+    from cap_client.examples import ExampleDataset
+    example = ExampleDataset(config.api, credentials)
+    return example.download(uuid=config.uuid, data_dir=config.data_dir,
+                            name=config.name, version=config.version,
+                            jobs=config.jobs, cache=cache)
+
+
+def run_batch(config):
+    from cap_client.lifecycle import LifecycleRunner, load_manifest
+    runner = LifecycleRunner(assignment, data_dir=config.data_dir,
+                             poller=status_poller(config, config.interval),
+                             cache=cache)
+    return runner.run_all(load_manifest(config.manifest), jobs=config.jobs)
+
+
+def open_index(config):
+    from cap_client.index import AssignmentIndex
+    path = config.index
+    if path is None:
+        path = join(config.cache_dir, "index.sqlite3")
+    return AssignmentIndex(path)
+
+
+def sync(config):
+    with open_index(config) as index:
+        return index.sync(assignment, full=config.full, jobs=config.jobs)
+
+
+def query(config):
+    with open_index(config) as index:
+        if config.sql is not None:
+            return index.execute(config.sql)
+        if config.summary:
+            return index.summary(username=credentials.username)
+        return index.query(username=credentials.username,
+                           status=config.status, pending=config.pending,
+                           challenge=config.challenge,
+                           datafiles=config.datafiles)
+
+
+actions = {
+    "list_assignments": lambda c: assignment.iter(page_size=c.page_size),
+    "list_files": lambda c: assignment.datafile.iter(c.uuid,
+                                                     page_size=c.page_size),
+    "download_example": download_example,
+    "start": start,
+    "download": lambda c: assignment.download(
+        uuid=c.uuid, data_dir=c.data_dir, jobs=c.jobs, cache=cache),
+    "upload_response": lambda c: assignment.upload(uuid=c.uuid,
+                                                   file_path=c.file),
+    "remove_response": lambda c: assignment.remove(uuid=c.uuid),
+    "submit": submit,
+    "view": lambda c: assignment.view(uuid=c.uuid),
+    "wait": lambda c: assignment.wait(
+        uuid=c.uuid, status=c.status,
+        poller=status_poller(c, c.interval)),
+    "run_batch": run_batch,
+    "sync": sync,
+    "query": query
+}
+
+
+def handle(config):
+    """perform one action and return its output"""
+    return actions[config.action](config)
+
+
+def wait_failed(result):
+    """whether waiting (by wait, or start --download) ended with an error"""
+    if type(result) is dict and type(result.get("wait")) is dict:
+        result = result["wait"]
+    return type(result) is dict and "_exception" in result
+
+
+status = 0
+if config.action == "batch":
+    from cap_client.commands import run_commands
+    if run_commands(parser, config, handle, sys.stdin) > 0:
+        status = 1
+else:
+    try:
+        result = handle(config)
+        write_result(result, config.output)
+    except (ClientError, ValidationError) as e:
+        logging.error(e.message)
+        exit()
+    if config.action in ("wait", "start") and wait_failed(result):
+        status = 1
 
 if config.save_secrets:
     credentials.save()
+exit(status)
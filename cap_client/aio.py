@@ -0,0 +1,613 @@
+"""
+asyncio counterparts of the api interfaces
+
+Classes in this module share endpoints and payload logic with the
+synchronous classes (Assignment, Datafile, Doc, etc.), but perform requests
+with coroutines. Methods that perform requests must be awaited, e.g.
+
+    async with AsyncApiSession(limit=50, limit_per_host=10) as session:
+        assignment = AsyncAssignment(api_url, credentials, session=session)
+        views = await asyncio.gather(*[assignment.view(_) for _ in uuids])
+
+These classes require the optional package aiohttp.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import time
+from os.path import getsize
+from .api import Api, JSON_ERROR, starts_slash, ends_slash
+from .assignments import Assignment
+from .datafiles import Datafile
+from .docs import Doc, prep_header_body, prep_output, doc_identifier, \
+    uuid_from_result, missing_primary, support_paths, inject_support, \
+    listing_uuids
+from .downloads import CHUNK_SIZE, PART_SUFFIX, _range_start, \
+    _range_total, _remove_validator, _resume_headers, _start_part
+from .errors import ClientError
+from .examples import ExampleDataset
+from .logs import Abbreviated
+from .multipart import MultipartEncoder
+from .pages import Paginator, DEFAULT_PAGE_SIZE
+from .polling import Poller
+from .retry import RetryPolicy, CircuitBreaker, parse_retry_after
+from .search import Search
+from .tracing import add_phase, content_length
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def _trace_config():
+    """aiohttp hooks adding phases to the span passed as trace_request_ctx"""
+
+    def phase(name, start, end=None):
+        async def on_start(session, context, params):
+            context.start = time.monotonic()
+
+        async def on_end(session, context, params):
+            add_phase(context.trace_request_ctx, name,
+                      time.monotonic() - context.start)
+        getattr(trace_config, start).append(on_start)
+        getattr(trace_config, end).append(on_end)
+
+    trace_config = aiohttp.TraceConfig()
+    phase("dns", "on_dns_resolvehost_start", "on_dns_resolvehost_end")
+    phase("connect", "on_connection_create_start",
+          "on_connection_create_end")
+    phase("ttfb", "on_request_start", "on_request_end")
+    return trace_config
+
+
+class AsyncApiSession:
+    """Pool of connections for coroutines, with overall and per-host limits"""
+
+    def __init__(self, limit=100, limit_per_host=10, responses=None,
+                 progress=None, retry=None, breaker=None, tracer=None):
+        """manages an aiohttp.ClientSession
+
+        :param limit: integer, maximum number of simultaneous connections
+        :param limit_per_host: integer, maximum number of simultaneous
+            connections to one host
+        :param responses: ResponseCache object for GET requests, or None
+        :param progress: function reporting the progress of file uploads
+            (called with bytes sent and total bytes), or None
+        :param retry: RetryPolicy object (if not specified, uses default
+            settings)
+        :param breaker: CircuitBreaker object (if not specified, uses
+            default settings)
+        :param tracer: Tracer object recording each request, or None
+        """
+        if aiohttp is None:
+            raise ClientError("asynchronous requests require package aiohttp")
+        self.limit = int(limit)
+        self.limit_per_host = int(limit_per_host)
+        self.responses = responses
+        self.progress = progress
+        self.retry = RetryPolicy() if retry is None else retry
+        self.breaker = CircuitBreaker() if breaker is None else breaker
+        self.tracer = tracer
+        self._session = None
+
+    def _client(self):
+        """aiohttp session, created within the running event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host)
+            trace_configs = None
+            if self.tracer is not None:
+                trace_configs = [_trace_config()]
+            self._session = aiohttp.ClientSession(
+                connector=connector, trace_configs=trace_configs)
+        return self._session
+
+    async def _send(self, method, url, **kwargs):
+        """perform one attempt of an http request"""
+        self.breaker.check()
+        try:
+            response = await self._client().request(method, url, **kwargs)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            self.breaker.record(False)
+            raise
+        self.breaker.record(response.status < 500)
+        return response
+
+    @contextlib.asynccontextmanager
+    async def request(self, method, url, **kwargs):
+        """perform an http request (use with async with)
+
+        Failed requests are repeated according to the retry policy.
+
+        :param method: string, http method, e.g. GET or POST
+        :param url: string, full url
+        :return: context manager yielding an aiohttp response
+        """
+        span = None
+        if self.tracer is not None:
+            span = self.tracer.start(method, url)
+            kwargs["trace_request_ctx"] = span
+        try:
+            response = await self._retry(method, url, span, **kwargs)
+        except Exception as e:
+            if span is not None:
+                self.tracer.finish(span, error=e)
+            raise
+        if span is not None:
+            span["status"] = response.status
+            span["bytes_out"] = content_length(
+                response.request_info.headers)
+            span["bytes_in"] = response.content_length
+        try:
+            yield response
+        finally:
+            response.release()
+            if span is not None:
+                self.tracer.finish(span)
+
+    async def _retry(self, method, url, span, **kwargs):
+        """perform attempts of an http request until one is final"""
+        attempt = 0
+        while True:
+            if span is not None:
+                span["retries"] = attempt
+            try:
+                response = await self._send(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                connect_error = isinstance(e, aiohttp.ClientConnectorError)
+                if not self.retry.retry_error(method, connect_error, attempt):
+                    raise
+                delay = self.retry.delay(attempt)
+            else:
+                delay = None
+                if self.retry.retry_status(method, response.status, attempt):
+                    retry_after = response.headers.get("Retry-After")
+                    delay = self.retry.delay(attempt,
+                                             parse_retry_after(retry_after))
+                if delay is None:
+                    return response
+                response.release()
+            logger.info("retrying %s %s", method, url)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def close(self):
+        """close all pooled connections"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+def _parse_json(data):
+    """parse a response body, signaling bodies that are not json"""
+    try:
+        return json.loads(data)
+    except ValueError:
+        return JSON_ERROR
+
+
+class _Chunks:
+    """asynchronous iterable over a multipart body, restarting on retries"""
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+
+    async def _iterate(self):
+        for chunk in self.encoder:
+            yield chunk
+
+    def __aiter__(self):
+        return self._iterate()
+
+
+class AsyncApi(Api):
+    """Base class for interfacing with captest API endpoints using asyncio"""
+
+    def __init__(self, api_url, credentials, session=None):
+        """base class for interfacing with API endpoints
+
+        :param api_url: base url for api
+        :param credentials: object with authorization token
+        :param session: AsyncApiSession object (if not specified, a new
+            session is created)
+        """
+        session = AsyncApiSession() if session is None else session
+        super().__init__(api_url, credentials, session=session)
+
+    def interface(self, cls):
+        """create another interface sharing credentials and session"""
+        return cls(self.api_url, self.credentials, session=self.session)
+
+    async def get(self, url, revalidate=False):
+        """perform a GET request
+
+        :param url: string, api endpoint
+        :param revalidate: logical, check cached responses with the api
+            even when they are fresh
+        :return: output object
+        """
+        headers = {"Authorization": "Bearer " + self.token}
+        endpoint = starts_slash(url)
+        full_url = self.api_url + endpoint
+        logger.info("GET url: %s", full_url)
+        responses = self.session.responses
+        key, entry = self.username + " " + full_url, None
+        if responses is not None:
+            entry = responses.lookup(key)
+        if entry is not None:
+            if not revalidate and responses.is_fresh(entry, endpoint):
+                return responses.result(entry)
+            headers.update(responses.conditional_headers(entry))
+        async with self.session.request("GET", full_url,
+                                        headers=headers) as response:
+            if entry is not None and response.status == 304:
+                responses.refresh(key, entry)
+                return responses.result(entry)
+            result = _parse_json(await response.read())
+            if responses is not None and response.status == 200 and \
+                    result != JSON_ERROR:
+                responses.store(key, endpoint, response, result)
+        logger.info("GET result: %s", Abbreviated(result))
+        return result
+
+    async def iter_pages(self, url, page_size=DEFAULT_PAGE_SIZE,
+                         prefetch=True):
+        """asynchronous iterator over the records of a paginated listing
+
+        :param url: string, api endpoint of the listing
+        :param page_size: integer, number of records requested per page
+        :param prefetch: logical, request the next page while the records of
+            the current page are consumed
+        """
+        pages = Paginator(url, page_size)
+        page, task = 1, None
+        result = await self.get(pages.url(1))
+        try:
+            while True:
+                records, more = pages.parse(result, page)
+                if more and prefetch:
+                    task = asyncio.ensure_future(self.get(pages.url(page + 1)))
+                for record in records:
+                    yield record
+                if not more:
+                    return
+                page += 1
+                if task is not None:
+                    result, task = await task, None
+                else:
+                    result = await self.get(pages.url(page))
+        finally:
+            if task is not None:
+                task.cancel()
+
+    async def post(self, url, body):
+        """perform a POST request
+
+        :param url: string, api endpoint
+        :param body: dictionary with post body
+        :return: output object
+        """
+        full_url = self.api_url + starts_slash(ends_slash(url))
+        headers = {"Authorization": "Bearer " + self.token}
+        logger.info("POST url: %s", full_url)
+        async with self.session.request("POST", full_url, headers=headers,
+                                        json=body) as response:
+            result = _parse_json(await response.read())
+        self.expire_responses()
+        logger.info("POST result: %s", Abbreviated(result))
+        return result
+
+    async def post_upload(self, url, file_path, metadata, progress=None):
+        """perform a post request for a file upload
+
+        :param url: string, api endpoint
+        :param file_path: string, path to file
+        :param metadata: dictionary with metadata
+        :param progress: function called with bytes sent and total bytes
+            (if not specified, uses the progress function of the session)
+        :return: output object
+        """
+        full_url = self.api_url + starts_slash(ends_slash(url))
+        headers = {"Authorization": "Bearer " + self.token}
+        body = {"metadata": json.dumps(metadata)}
+        logger.info("POST url: %s", full_url)
+        if progress is None:
+            progress = self.session.progress
+        if os.path.isfile(file_path):
+            with MultipartEncoder(body, "filedata", file_path,
+                                  progress=progress) as encoder:
+                headers["Content-Type"] = encoder.content_type
+                headers["Content-Length"] = str(len(encoder))
+                async with self.session.request(
+                        "POST", full_url, headers=headers,
+                        data=_Chunks(encoder)) as response:
+                    result = _parse_json(await response.read())
+        else:
+            async with self.session.request("POST", full_url,
+                                            headers=headers,
+                                            data=body) as response:
+                result = _parse_json(await response.read())
+        self.expire_responses()
+        logger.info("POST result: %s", Abbreviated(result))
+        return result
+
+
+# ############################################################################
+# downloads
+
+
+async def _fetch_part(session, url, part_path):
+    """transfer (the rest of) a file into a partial file
+
+    :return: number of bytes already present before this transfer
+    """
+    offset, headers = _resume_headers(part_path)
+    async with session.request("GET", url, headers=headers) as response:
+        if response.status == 416 and offset > 0:
+            if _range_total(response) == offset:
+                return offset
+            os.remove(part_path)
+            _remove_validator(part_path)
+            return await _fetch_part(session, url, part_path)
+        response.raise_for_status()
+        offset = _start_part(part_path, response.headers, offset,
+                             response.status, _range_start(response))
+        with open(part_path, "ab" if offset else "wb") as f:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                f.write(chunk)
+    return offset
+
+
+async def download_file(session, url, local_path, attempts=3):
+    """download one file into a local path (see downloads.download_file)"""
+    start = time.monotonic()
+    part_path = local_path + PART_SUFFIX
+    for attempt in range(attempts):
+        try:
+            offset = await _fetch_part(session, url, part_path)
+            break
+        except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError):
+            if attempt == attempts - 1:
+                raise
+    os.replace(part_path, local_path)
+    _remove_validator(part_path)
+    result = {"_bytes": getsize(local_path),
+              "_seconds": time.monotonic() - start}
+    if offset > 0:
+        result["_resumed"] = offset
+    return result
+
+
+async def download_files(session, items, jobs=1, cache=None):
+    """download several files concurrently (see downloads.download_files)"""
+    semaphore = asyncio.Semaphore(max(1, int(jobs)))
+
+    async def download_item(item):
+        url, local_path = item
+        start = time.monotonic()
+        async with semaphore:
+            try:
+                if cache is not None and cache.fetch(url, local_path):
+                    return {"_bytes": getsize(local_path),
+                            "_seconds": time.monotonic() - start,
+                            "_cached": True}
+                if cache is not None and cache.offline:
+                    raise FileNotFoundError("file not in cache: " + url)
+                result = await download_file(session, url, local_path)
+                if cache is not None:
+                    cache.store(url, local_path)
+                return result
+            except Exception as e:
+                return {"_bytes": 0, "_seconds": 0.0, "_exception": str(e)}
+
+    return list(await asyncio.gather(*[download_item(_) for _ in items]))
+
+
+# ############################################################################
+# interfaces for api endpoints
+
+
+class AsyncDatafile(Datafile, AsyncApi):
+    """interface for /data/ API endpoints using asyncio"""
+
+
+class AsyncSearch(Search, AsyncApi):
+    """interface for /search/ API endpoints using asyncio"""
+
+
+class AsyncAssignment(Assignment, AsyncApi):
+    """interface for /assignment/ API endpoints using asyncio"""
+
+    datafile_class = AsyncDatafile
+
+    async def download(self, uuid, data_dir=".", jobs=1, cache=None):
+        """download data files from the server for one assignment"""
+        datafiles = await self.get("/data/list/" + uuid)
+        items = self._download_items(datafiles, data_dir)
+        summaries = await download_files(self.session, items, jobs=jobs,
+                                         cache=cache)
+        for f, f_summary in zip(datafiles, summaries):
+            f.update(f_summary)
+        return datafiles
+
+    async def wait(self, uuid, status="generated", poller=None):
+        """wait until an assignment reaches a status"""
+        poller = Poller() if poller is None else poller
+        start = time.monotonic()
+        view, reached = await poller.wait_async(
+            *self._wait_args(uuid, status))
+        return self._wait_result(view, reached, status, start)
+
+    async def remove(self, uuid):
+        """remove a response file for one assignment"""
+        datafiles = await self.get("/data/list/"+uuid)
+        for df in datafiles:
+            if df["file_role"] != "response":
+                continue
+            return await self.datafile.delete(df["uuid"])
+
+
+class AsyncExampleDataset(ExampleDataset, AsyncApi):
+    """downloading example datasets using asyncio"""
+
+    async def download(self, uuid=None, name=None, version=None,
+                       data_dir=".", jobs=1, cache=None):
+        """download all example files associated with a challenge"""
+        identifier = uuid if uuid is not None else name + "/" + version
+        doc_data = await self.get("/challenge/view/" + identifier)
+        if "name" not in doc_data:
+            raise ClientError(str(doc_data))
+        assignment_uuid = doc_data["demo_assignment_uuid"]
+        datafiles = await self.get("/data/list/" + assignment_uuid)
+        result, items = self._download_items(doc_data, datafiles, data_dir)
+        summaries = await download_files(self.session, items, jobs=jobs,
+                                         cache=cache)
+        for f, f_summary in zip(result, summaries):
+            f.update(f_summary)
+        return result
+
+
+class AsyncDoc(Doc, AsyncApi):
+    """interface for API endpoints for documents using asyncio"""
+
+    datafile_class = AsyncDatafile
+
+    async def _list_uuids(self, collection):
+        """uuids of documents in a collection listing (empty if none)"""
+        try:
+            return listing_uuids([_ async for _ in self.iter_pages(
+                "/" + collection + "/list/")])
+        except ClientError:
+            return dict()
+
+    async def _collection_uuids(self, collection):
+        """uuids of documents in a collection, listed once per run"""
+        if collection not in self._doc_uuids:
+            self._doc_uuids[collection] = asyncio.ensure_future(
+                self._list_uuids(collection))
+        return await self._doc_uuids[collection]
+
+    async def doc_uuid(self, collection="blog", identifier=""):
+        """use the api to convert a name+version into a uuid identifier"""
+        uuids = await self._collection_uuids(collection)
+        if identifier not in uuids:
+            uuids[identifier] = uuid_from_result(
+                await self.get("/"+collection + "/update/" + identifier))
+        return uuids[identifier]
+
+    async def doc_files(self, doc_uuid):
+        """data files of a document, requested once per run"""
+        if doc_uuid not in self._file_lists:
+            file_list = await self.get("/data/list/"+doc_uuid)
+            if type(file_list) is not list:
+                return file_list
+            self._file_lists[doc_uuid] = file_list
+        return self._file_lists[doc_uuid]
+
+    @prep_header_body
+    async def _create(self, file_path, collection, header=None, body=None):
+        result = await self.post("/"+collection + "/create/", body)
+        return prep_output(result, file_path)
+
+    @prep_header_body
+    async def _update(self, file_path, collection, action=None, force=False,
+                      header=None, body=None):
+        digest = self._prep_update(file_path, collection, action, header, body)
+        manifest = self.manifest(file_path)
+        if not force and manifest.unchanged(os.path.basename(file_path),
+                                            digest):
+            return {"_file": file_path, "detail": "unchanged"}
+        identifier = doc_identifier(header, optional_version=True)
+        try:
+            doc_uuid = await self.doc_uuid(collection, identifier)
+        except ClientError as e:
+            return {"_file": file_path, "_exception": e.message}
+        file_list = await self.doc_files(doc_uuid)
+        body["content"] = inject_support(body["content"],
+                                         header.get("support", []),
+                                         file_list, self.api_url)
+        result = await self.post("/" + collection + "/update/" + doc_uuid,
+                                 body)
+        self._record_update(file_path, header, digest, file_list, result)
+        return prep_output(result, file_path)
+
+    @prep_header_body
+    async def _upload_primary(self, file_path, collection="blog",
+                              doc_uuid=None, header=None, body=None):
+        missing = missing_primary(header)
+        if missing is not None:
+            return {"_file": file_path, "_exception": "missing "+missing}
+        datafile_path = os.path.join(os.path.dirname(file_path),
+                                     header["datafile"])
+        if doc_uuid is None:
+            doc_uuid = await self.doc_uuid(collection, doc_identifier(header))
+        result = await self.datafile.upload(
+            datafile_path, file_role="primary", parent_uuid=doc_uuid,
+            parent_type=collection, source=header["datafile_source"],
+            license=header["datafile_license"])
+        self._file_lists.pop(doc_uuid, None)
+        return prep_output(result, datafile_path)
+
+    @prep_header_body
+    async def _upload_support(self, file_path, collection="blog",
+                              doc_uuid=None, header=None, body=None):
+        if "support" not in header:
+            return {"_file": file_path, "_support": []}
+        if doc_uuid is None:
+            doc_uuid = await self.doc_uuid(collection, doc_identifier(header))
+        file_list = await self.doc_files(doc_uuid)
+        result = []
+        for support_path, available in support_paths(file_path, header,
+                                                     file_list):
+            if available:
+                result.append({"_file": support_path, "detail": "exists"})
+                continue
+            file_result = await self.datafile.upload(
+                support_path, file_role="support", parent_uuid=doc_uuid,
+                parent_type=collection, source=self.username,
+                license="CC BY 4.0")
+            result.append(prep_output(file_result, support_path))
+            self._file_lists.pop(doc_uuid, None)
+        return {"_file": file_path, "uuid": doc_uuid, "_support": result}
+
+    @prep_header_body
+    async def _upload(self, file_path, collection="blog", header=None,
+                      body=None):
+        doc_uuid = await self.doc_uuid(collection, doc_identifier(header))
+        primary = await self._upload_primary(file_path, collection,
+                                             doc_uuid=doc_uuid)
+        support = await self._upload_support(file_path, collection,
+                                             doc_uuid=doc_uuid)
+        return {
+            "_file": file_path,
+            "uuid": doc_uuid,
+            "_primary": primary,
+            "_support": support["_support"]
+        }
+
+    @prep_header_body
+    async def _delete(self, file_path, collection="blog", header=None,
+                      body=None):
+        identifier = doc_identifier(header)
+        try:
+            await self.doc_uuid(collection, identifier)
+        except ClientError as e:
+            return {"_file": file_path, "_exception": e.message}
+        body = {"identifier": header["name"],
+                "version": str(header["version"])}
+        result = await self.post("/"+collection+"/delete/", body)
+        (await self._collection_uuids(collection)).pop(identifier, None)
+        return prep_output(result, file_path)
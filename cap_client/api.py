@@ -2,10 +2,18 @@
 perform get and post requests
 """
 
-import requests
 import logging
 import json
+import requests
+from concurrent.futures import ThreadPoolExecutor
 from os.path import isfile
+from .errors import ClientError
+from .logs import Abbreviated
+from .multipart import MultipartEncoder
+from .pages import Paginator, DEFAULT_PAGE_SIZE
+
+
+logger = logging.getLogger(__name__)
 
 
 def starts_slash(url):
@@ -18,14 +26,32 @@ def ends_slash(url):
     return url if url.endswith("/") else url + "/"
 
 
+# result signaling a response body that is not json
+JSON_ERROR = "error parsing JSON response"
+
+
+def parse_json(response):
+    """parse the body of a response, signaling bodies that are not json"""
+    try:
+        return response.json()
+    except json.decoder.JSONDecodeError:
+        return JSON_ERROR
+
+
 class Api:
     """Base class for interfacing with captest API endpoints"""
 
-    def __init__(self, api_url, credentials):
+    # interface for /data/ endpoints (default: datafiles.Datafile)
+    datafile_class = None
+
+    def __init__(self, api_url, credentials, session=None):
         """base class for interfacing with API endpoints
 
         :param api_url: base url for api
-        :param credentials: object with authorization token
+        :param credentials: object with authorization token and a pooled
+            http session
+        :param session: session to use instead of the one held by the
+            credentials
         """
         self.api_url = api_url
         while self.api_url.endswith("/"):
@@ -33,24 +59,106 @@ class Api:
         self.credentials = credentials
         self.username = credentials.username
         self.token = credentials.token
+        self.session = credentials.session if session is None else session
+
+    @property
+    def datafile(self):
+        """interface for /data/ endpoints sharing credentials and session"""
+        if getattr(self, "_datafile", None) is None:
+            cls = self.datafile_class
+            if cls is None:
+                # imported here, since Datafile is itself an Api
+                from .datafiles import Datafile as cls
+            self._datafile = cls(self.api_url, self.credentials,
+                                 session=self.session)
+        return self._datafile
+
+    def expire_responses(self):
+        """signal that content has changed and cached responses are stale"""
+        if self.session.responses is not None:
+            self.session.responses.expire()
+
+    def _request(self, method, full_url, **kwargs):
+        """perform a request through the session, signaling failures
 
-    def get(self, url):
+        :param method: string, http method
+        :param full_url: string, full url
+        :return: requests.Response object
+        """
+        try:
+            return self.session.request(method, full_url, **kwargs)
+        except requests.RequestException as e:
+            raise ClientError(method + " request failed: " + str(e))
+
+    def get(self, url, revalidate=False):
         """perform a GET request
 
+        Responses may be served from, or revalidated against, the response
+        cache attached to the session.
+
         :param url: string, api endpoint
+        :param revalidate: logical, check cached responses with the api
+            even when they are fresh
         :return: output object
         """
         headers = {"Authorization": "Bearer " + self.token}
-        full_url = self.api_url + starts_slash(url)
-        logging.info("GET url: " + str(full_url))
-        logging.info("GET header: " + str(headers))
-        try:
-            result = requests.get(full_url, headers=headers).json()
-        except json.decoder.JSONDecodeError:
-            result = "error parsing JSON response"
-        logging.info("GET result: " + str(result))
+        endpoint = starts_slash(url)
+        full_url = self.api_url + endpoint
+        logger.info("GET url: %s", full_url)
+        logger.info("GET header: %s", Abbreviated(headers))
+        responses = self.session.responses
+        key, entry = self.username + " " + full_url, None
+        if responses is not None:
+            entry = responses.lookup(key)
+        if entry is not None:
+            if not revalidate and responses.is_fresh(entry, endpoint):
+                logger.info("GET result from cache")
+                return responses.result(entry)
+            headers.update(responses.conditional_headers(entry))
+        response = self._request("GET", full_url, headers=headers)
+        if entry is not None and response.status_code == 304:
+            logger.info("GET result not modified")
+            responses.refresh(key, entry)
+            return responses.result(entry)
+        result = parse_json(response)
+        if responses is not None and response.status_code == 200 and \
+                result != JSON_ERROR:
+            responses.store(key, endpoint, response, result)
+        logger.info("GET result: %s", Abbreviated(result))
         return result
 
+    def iter_pages(self, url, page_size=DEFAULT_PAGE_SIZE, prefetch=True):
+        """iterate over the records of a paginated listing
+
+        At most two pages are held in memory. The next page is requested
+        in the background while the records of the current page are
+        consumed.
+
+        :param url: string, api endpoint of the listing
+        :param page_size: integer, number of records requested per page
+        :param prefetch: logical, request the next page in the background
+        :return: iterator over records
+        """
+        pages = Paginator(url, page_size)
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            page, result = 1, self.get(pages.url(1))
+            while True:
+                records, more = pages.parse(result, page)
+                if more and executor is not None:
+                    future = executor.submit(self.get, pages.url(page + 1))
+                yield from records
+                if not more:
+                    return
+                page += 1
+                if executor is not None:
+                    result = future.result()
+                else:
+                    result = self.get(pages.url(page))
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
     def post(self, url, body):
         """perform a POST request
 
@@ -60,32 +168,46 @@ class Api:
         """
         full_url = self.api_url + starts_slash(ends_slash(url))
         headers = {"Authorization": "Bearer " + self.token}
-        logging.info("POST url: " + str(full_url))
-        logging.info("POST header: " + str(headers))
-        logging.info("POST body " + str(body))
-        result = requests.post(url=full_url, headers=headers,
-                               json=body).json()
-        logging.info("POST result: " + str(result))
+        logger.info("POST url: %s", full_url)
+        logger.info("POST header: %s", Abbreviated(headers))
+        logger.info("POST body: %s", Abbreviated(body))
+        result = parse_json(self._request("POST", full_url, headers=headers,
+                                          json=body))
+        self.expire_responses()
+        logger.info("POST result: %s", Abbreviated(result))
         return result
 
-    def post_upload(self, url, file_path, metadata):
+    def post_upload(self, url, file_path, metadata, progress=None):
         """perform a post request for a file upload
 
+        The file is streamed from disk, so memory use does not depend on
+        the file size.
+
         :param url: string, api endpoint
         :param file_path: string, path to file
         :param metadata: dictionary with metadata
+        :param progress: function called with bytes sent and total bytes
+            (if not specified, uses the progress function of the session)
         :return: output object
         """
         full_url = self.api_url + starts_slash(ends_slash(url))
         headers = {"Authorization": "Bearer " + self.token}
         body = {"metadata": json.dumps(metadata)}
-        logging.info("POST url: " + str(full_url))
-        logging.info("POST header: " + str(headers))
-        logging.info("POST body: " + str(body))
-        filedata = None
+        logger.info("POST url: %s", full_url)
+        logger.info("POST header: %s", Abbreviated(headers))
+        logger.info("POST body: %s", Abbreviated(body))
+        if progress is None:
+            progress = self.session.progress
         if isfile(file_path):
-            filedata = {"filedata": open(file_path, "rb")}
-        result = requests.post(url=full_url, headers=headers,
-                               files=filedata, data=body).json()
-        logging.info("POST result: "+str(result))
+            with MultipartEncoder(body, "filedata", file_path,
+                                  progress=progress) as encoder:
+                headers["Content-Type"] = encoder.content_type
+                result = parse_json(self._request("POST", full_url,
+                                                  headers=headers,
+                                                  data=encoder))
+        else:
+            result = parse_json(self._request("POST", full_url,
+                                              headers=headers, data=body))
+        self.expire_responses()
+        logger.info("POST result: %s", Abbreviated(result))
         return result
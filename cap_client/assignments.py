@@ -2,10 +2,12 @@
 handling api requests for assignments
 """
 
+import time
 from os.path import join
-from urllib.request import urlretrieve
 from .api import Api
-from .datafiles import Datafile
+from .downloads import download_files
+from .pages import DEFAULT_PAGE_SIZE
+from .polling import Poller, status_rank
 
 
 class Assignment(Api):
@@ -16,6 +18,13 @@ class Assignment(Api):
             username = self.credentials.username
         return self.get("/assignment/"+username)
 
+    def iter(self, username=None, page_size=DEFAULT_PAGE_SIZE):
+        """iterate over assignments, requesting them page by page"""
+        if username is None:
+            username = self.credentials.username
+        return self.iter_pages("/assignment/" + username,
+                               page_size=page_size)
+
     def submit(self, uuid, tags=None):
         tags = "" if tags is None else tags
         tags = "" if tags in ("-", "none") else tags
@@ -28,34 +37,96 @@ class Assignment(Api):
             body = {"uuid": uuid}
         return self.post("/assignment/create/", body)
 
-    def download(self, uuid, data_dir="."):
-        """download data files from the server for one assignment"""
+    def download(self, uuid, data_dir=".", jobs=1, cache=None):
+        """download data files from the server for one assignment
+
+        :param uuid: string, assignment identifier
+        :param data_dir: string, directory to store downloaded files
+        :param jobs: integer, maximum number of concurrent downloads
+        :param cache: DownloadCache object, or None to bypass the cache
+        :return: list with data file summaries, including the number of
+            bytes and the time taken to download each file
+        """
         datafiles = self.get("/data/list/" + uuid)
+        items = self._download_items(datafiles, data_dir)
+        summaries = download_files(self.session, items, jobs=jobs,
+                                   cache=cache)
+        for f, f_summary in zip(datafiles, summaries):
+            f.update(f_summary)
+        return datafiles
+
+    def _download_items(self, datafiles, data_dir):
+        """urls and local paths for data files"""
+        items = []
         for f in datafiles:
             f_url = self.api_url + "/static/" + f["path"]
             f_basename = f_url.split("/")[-1]
-            urlretrieve(f_url, join(data_dir, f_basename))
-        return datafiles
+            items.append((f_url, join(data_dir, f_basename)))
+        return items
 
     def upload(self, uuid, file_path):
         """upload a response file for one assignment"""
-        datafile = Datafile(self.api_url, self.credentials)
-        return datafile.upload(file_path,
-                               file_role="response",
-                               parent_type="assignment",
-                               parent_uuid=uuid,
-                               source=self.username,
-                               license="CC BY 4.0")
+        return self.datafile.upload(file_path,
+                                    file_role="response",
+                                    parent_type="assignment",
+                                    parent_uuid=uuid,
+                                    source=self.username,
+                                    license="CC BY 4.0")
 
     def remove(self, uuid):
         """remove a response file for one assignment"""
         datafiles = self.get("/data/list/"+uuid)
-        datafile = Datafile(self.api_url, self.credentials)
         for df in datafiles:
             if df["file_role"] != "response":
                 continue
-            return datafile.delete(df["uuid"])
+            return self.datafile.delete(df["uuid"])
 
-    def view(self, uuid):
+    def view(self, uuid, revalidate=False):
         """view the status (including score) of an assignment"""
-        return self.get("/assignment/view/" + uuid)
+        return self.get("/assignment/view/" + uuid, revalidate=revalidate)
+
+    def _wait_args(self, uuid, status):
+        """query and completion criterion for waiting on a status"""
+        target = status_rank(status)
+
+        def reached(view):
+            # results without a status (errors) are final, see _wait_result
+            if type(view) is not dict or "status" not in view:
+                return True
+            return status_rank(view["status"]) >= target
+
+        def query():
+            return self.view(uuid, revalidate=True)
+
+        def state(view):
+            return view.get("status") if type(view) is dict else None
+
+        return query, reached, state
+
+    def _wait_result(self, view, reached, status, start):
+        """annotate the last view with the waiting time and any error"""
+        if type(view) is not dict:
+            view = {"detail": view}
+        view["_seconds"] = round(time.monotonic() - start, 3)
+        if "status" not in view:
+            view["_exception"] = "could not view assignment: " + \
+                str(view.get("detail", view))
+        elif not reached:
+            view["_exception"] = "timeout waiting for status: " + status
+        return view
+
+    def wait(self, uuid, status="generated", poller=None):
+        """wait until an assignment reaches a status
+
+        :param uuid: string, assignment identifier
+        :param status: string, generated, submitted or complete
+        :param poller: Poller object with intervals, timeout and a callback
+            for status transitions (if not specified, uses default settings)
+        :return: last view of the assignment, including the time waited
+            (_seconds), and a message (_exception) after a timeout or when
+            the view has no status
+        """
+        poller = Poller() if poller is None else poller
+        start = time.monotonic()
+        view, reached = poller.wait(*self._wait_args(uuid, status))
+        return self._wait_result(view, reached, status, start)
@@ -0,0 +1,42 @@
+"""
+run one action over many files using a pool of workers
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .errors import ClientError, ValidationError
+
+
+logger = logging.getLogger(__name__)
+
+
+def _run_one(function, file_path, **kwargs):
+    """apply a function to one file, capturing errors into the output"""
+    try:
+        return function(file_path, **kwargs)
+    except (ClientError, ValidationError) as e:
+        return {"_file": file_path, "_exception": e.message}
+    except Exception as e:
+        logger.exception("unexpected error for file: %s", file_path)
+        return {"_file": file_path, "_exception": str(e)}
+
+
+def map_files(function, files, jobs=1, **kwargs):
+    """apply a function to several files, possibly concurrently
+
+    :param function: function accepting a file path and keyword arguments
+    :param files: list of file paths
+    :param jobs: integer, maximum number of files processed at once
+    :param kwargs: keyword arguments passed on to the function
+    :return: iterator over outputs, in the same order as the files
+    """
+    jobs = max(1, min(int(jobs), len(files)))
+    if jobs == 1:
+        for f in files:
+            yield _run_one(function, f, **kwargs)
+        return
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(_run_one, function, f, **kwargs)
+                   for f in files]
+        for future in futures:
+            yield future.result()
@@ -0,0 +1,133 @@
+"""
+on-disk cache for downloaded data files
+
+Cached files are stored under names derived from their static url, so
+repeated downloads of the same dataset can be served locally. The cache
+and the destination directory hold separate copies, so that changes to a
+downloaded file never alter the cached content (or its time of last use).
+The least recently used files are evicted when the cache exceeds its size.
+"""
+
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from os.path import exists, getsize, join
+from .defaults import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE
+
+
+def _copy_range(source, target):
+    """copy a file with copy_file_range, which shares blocks on file systems
+    that support it (reflinks, e.g. btrfs or xfs)"""
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        size = os.fstat(src.fileno()).st_size
+        copied = 0
+        while copied < size:
+            n = os.copy_file_range(src.fileno(), dst.fileno(), size - copied)
+            if n == 0:
+                break
+            copied += n
+    if copied < size:
+        raise OSError("incomplete copy of " + source)
+
+
+def _place(source, target):
+    """put a private copy of a file at a target path"""
+    if exists(target):
+        os.remove(target)
+    if hasattr(os, "copy_file_range"):
+        try:
+            _copy_range(source, target)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(source, target)
+
+
+class DownloadCache:
+    """Cache of data files keyed by their static url"""
+
+    def __init__(self, path=DEFAULT_CACHE_DIR, max_size=DEFAULT_CACHE_SIZE,
+                 offline=False):
+        """manages a directory with cached data files
+
+        :param path: string, directory holding cached files
+        :param max_size: number, maximum size of the cache in megabytes
+        :param offline: logical, set True to signal that files should only
+            be served from the cache
+        """
+        self.path = join(path, "files")
+        self.max_size = int(max_size * 1024 * 1024)
+        self.offline = offline
+        self._lock = threading.Lock()
+
+    def key_path(self, key):
+        """path to the cached copy of a file"""
+        return join(self.path, hashlib.sha256(key.encode()).hexdigest())
+
+    def fetch(self, key, local_path):
+        """place a cached file at a local path
+
+        :param key: string, identifier for the file (its static url)
+        :param local_path: string, destination path
+        :return: logical, True if the file was available in the cache
+        """
+        cached = self.key_path(key)
+        try:
+            _place(cached, local_path)
+        except FileNotFoundError:
+            return False
+        # mark the file as recently used
+        os.utime(cached)
+        return True
+
+    def store(self, key, local_path):
+        """record a downloaded file in the cache
+
+        :param key: string, identifier for the file (its static url)
+        :param local_path: string, path to a complete downloaded file
+        """
+        cached = self.key_path(key)
+        os.makedirs(self.path, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        os.close(fd)
+        try:
+            _place(local_path, temp_path)
+            os.chmod(temp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(temp_path, cached)
+        finally:
+            if exists(temp_path):
+                os.remove(temp_path)
+        os.utime(cached)
+        self.evict()
+
+    def size(self):
+        """total size of cached files, in bytes"""
+        if not exists(self.path):
+            return 0
+        return sum(getsize(join(self.path, _)) for _ in os.listdir(self.path))
+
+    def evict(self):
+        """remove least recently used files until the cache fits its size"""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.path):
+                try:
+                    info = os.stat(join(self.path, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, name))
+            total = sum(_[1] for _ in entries)
+            for mtime, size, name in sorted(entries):
+                if total <= self.max_size:
+                    break
+                if name.endswith(".tmp") and mtime > time.time() - 3600:
+                    continue
+                try:
+                    os.remove(join(self.path, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
@@ -0,0 +1,84 @@
+"""
+run many commands in one process, reading one command per line
+
+Commands use the same syntax as the command line, e.g.
+
+    view --uuid 1a2b3c4d-...
+    download --uuid 1a2b3c4d-... --jobs 4
+
+Credentials, connections and caches are created once and shared by all
+commands, so global options (given before the action) are rejected in
+commands. The output of each command is written as one line of json.
+"""
+
+import copy
+import logging
+import shlex
+import sys
+from .errors import ClientError, ValidationError
+from .output import is_stream, write_result
+from .validations import validate_config
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_command(parser, line, config):
+    """parse one command, using global options from an existing config
+
+    :param parser: argparse.ArgumentParser with subparsers for actions
+    :param line: string, command with arguments
+    :param config: argparse.Namespace with global options
+    :return: argparse.Namespace
+    :raises ValidationError: for invalid commands, or commands setting
+        global options
+    """
+    try:
+        args = shlex.split(line)
+    except ValueError as e:
+        raise ValidationError("invalid command: " + str(e))
+    if len(args) > 0 and args[0] == config.action:
+        raise ValidationError("invalid command: nested " + config.action)
+    try:
+        # attributes already in the namespace are not reset to defaults
+        command = parser.parse_args(args, namespace=copy.copy(config))
+    except SystemExit:
+        raise ValidationError("invalid command: " + line)
+    # options before the action are global options
+    options = [_ for _ in args[:args.index(command.action)]
+               if _.startswith("-")]
+    if len(options) > 0:
+        raise ValidationError("global options cannot be set in commands: " +
+                              " ".join(options))
+    return validate_config(command)
+
+
+def run_commands(parser, config, handle, lines, output=None):
+    """perform commands, writing the output of each as a line of json
+
+    :param parser: argparse.ArgumentParser with subparsers for actions
+    :param config: argparse.Namespace with global options
+    :param handle: function performing one command, given its arguments
+    :param lines: iterable over commands, e.g. sys.stdin
+    :param output: file-like object for output (default: sys.stdout)
+    :return: integer, number of commands that failed
+    """
+    output = sys.stdout if output is None else output
+    failed = 0
+    for line in lines:
+        line = line.strip()
+        if line == "" or line.startswith("#"):
+            continue
+        try:
+            result = handle(parse_command(parser, line, config))
+            if is_stream(result):
+                result = list(result)
+        except (ClientError, ValidationError) as e:
+            result = {"_command": line, "_exception": e.message}
+        except Exception as e:
+            logger.exception("unexpected error for command: %s", line)
+            result = {"_command": line, "_exception": str(e)}
+        if type(result) is dict and "_exception" in result:
+            failed += 1
+        write_result(result, "compact", output)
+    return failed
@@ -7,26 +7,31 @@ Features:
  - saves tokens and passwords into a local disk file
  - fetches new oauth token from an api
  - does not save passwords into local disk file unless already present
+ - holds a pooled http session shared by api objects
 """
 
 from os.path import exists
-from yaml import safe_load, safe_dump
 from .errors import ValidationError
 
 
 class CredentialsManager:
     """Manages username, password, tokens using a disk file"""
 
-    def __init__(self, username, path, token=None):
+    def __init__(self, username, path, token=None, session=None):
         """manages credentials for one username
 
         :param username: string, username
         :param path: string, path to local file with secrets
         :param token: set a token for the username
+        :param session: ApiSession object with a pool of http connections
+            (if not specified, a default session is created when needed)
         """
         self.path = path
+        self._session = session
         self.data = None
         if exists(path):
+            # yaml is imported only when there is a secrets file to read
+            from yaml import safe_load
             with open(path, "r") as f:
                 self.data = safe_load(f)
         if self.data is None:
@@ -61,7 +66,19 @@ class CredentialsManager:
     def token(self, token):
         self.data[self.username]["token"] = token
 
+    @property
+    def session(self):
+        if self._session is None:
+            from .session import ApiSession
+            self._session = ApiSession()
+        return self._session
+
+    @session.setter
+    def session(self, session):
+        self._session = session
+
     def save(self):
         """write secrets into a yaml file"""
+        from yaml import safe_dump
         with open(self.path, "w") as f:
             safe_dump(self.data, f)
@@ -4,6 +4,7 @@ handling api requests for assignments
 
 from os.path import basename
 from .api import Api
+from .pages import DEFAULT_PAGE_SIZE
 
 
 class Datafile(Api):
@@ -13,8 +14,13 @@ class Datafile(Api):
         """fetch all datafiles associated with a given parent object"""
         return self.get("/data/list/" + parent_uuid)
 
+    def iter(self, parent_uuid, page_size=DEFAULT_PAGE_SIZE):
+        """iterate over datafiles of a parent object, page by page"""
+        return self.iter_pages("/data/list/" + parent_uuid,
+                               page_size=page_size)
+
     def upload(self, file_path, file_role,
-               parent_uuid, parent_type, source, license):
+               parent_uuid, parent_type, source, license, progress=None):
         """upload a file"""
         metadata = {
             "file_role": file_role,
@@ -24,7 +30,8 @@ class Datafile(Api):
             "source": source,
             "license": license
         }
-        return self.post_upload("/data/upload", file_path, metadata)
+        return self.post_upload("/data/upload", file_path, metadata,
+                                progress=progress)
 
     def delete(self, uuid):
         """send a request to remove a datafile"""
@@ -0,0 +1,11 @@
+"""
+default locations and sizes, in a module without dependencies so that
+parsing arguments stays cheap
+"""
+
+from os.path import expanduser, join
+
+
+DEFAULT_CACHE_DIR = join(expanduser("~"), ".cache", "cap-client")
+# default maximum cache size, in megabytes
+DEFAULT_CACHE_SIZE = 2048
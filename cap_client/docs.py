@@ -3,37 +3,88 @@ handling api requests for blog or documentation pages
 """
 
 import functools
-from os.path import join, exists, dirname
+import inspect
+import locale
+import mmap
+import os
+import re
+import stat
+import threading
+from os.path import join, dirname, basename
 from yaml import safe_load
 from .api import Api
-from .datafiles import Datafile
 from .errors import ClientError, ValidationError
+from .manifest import Manifest, content_digest, manifest_path
 from .validations import validate_collection, validate_notes, validate_naming
 
 
+# documents larger than this (bytes) are memory-mapped rather than read
+MMAP_THRESHOLD = 1 << 16
+NEWLINE = re.compile(rb"\r\n|\r|\n")
+NON_SPACE = re.compile(rb"\S")
+
+
+def _decode(buffer, start, end, encoding):
+    """decode a slice of a buffer without copying it, with universal
+    newlines"""
+    with memoryview(buffer) as view, view[start:end] as part:
+        text = str(part, encoding)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _split_header(buffer, encoding):
+    """text of the header and offset of the body in a buffer"""
+    state, _header, pos, size = None, [], 0, len(buffer)
+    while pos < size:
+        match = NEWLINE.search(buffer, pos)
+        end, next_pos = (size, size) if match is None else match.span()
+        line = _decode(buffer, pos, end, encoding)
+        pos = next_pos
+        if state is None:
+            if not line.startswith("---"):
+                raise ClientError("first line should start with ---")
+            state = "header"
+        elif line.startswith("---"):
+            return "\n".join(_header), pos
+        elif line.rstrip() == "":
+            raise ClientError("empty line in header")
+        else:
+            _header.append(line)
+    raise ClientError("no content")
+
+
+def _parse_header_content(buffer, encoding):
+    """header and body of a document held in a buffer (bytes or mmap)"""
+    _header, pos = _split_header(buffer, encoding)
+    start = NON_SPACE.search(buffer, pos)
+    if start is None:
+        return safe_load(_header), ""
+    start, end = start.start(), len(buffer)
+    while buffer[end - 1:end].isspace():
+        end -= 1
+    _content = _decode(buffer, start, end, encoding)
+    # whitespace that is not ascii
+    if _content[0].isspace() or _content[-1].isspace():
+        _content = _content.strip()
+    return safe_load(_header), _content
+
+
 def read_header_content(path):
-    """read all content from a file and separate a header from the body"""
-
-    state, _header, _content = None, [], []
-    with open(path, "r") as f:
-        for line in f:
-            if state is None:
-                if not line.startswith("---"):
-                    raise ClientError("first line should start with ---")
-                state = "header"
-            elif state == "header":
-                if line.startswith("---"):
-                    state = "content"
-                elif line.rstrip() == "":
-                    raise ClientError("empty line in header")
-                else:
-                    _header.append(line.rstrip("\n"))
-            elif state == "content":
-                _content.append(line.rstrip("\n"))
-    if state != "content":
-        raise ClientError("no content")
-    _header, _content = "\n".join(_header), "\n".join(_content)
-    return safe_load(_header), _content.lstrip().rstrip()
+    """read all content from a file and separate a header from the body
+
+    Large files are memory-mapped: lines are scanned only up to the end of
+    the header, and the body is decoded once, directly from the mapping.
+    """
+    encoding = locale.getpreferredencoding(False)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        # (empty files cannot be mapped)
+        if size < MMAP_THRESHOLD or size == 0:
+            return _parse_header_content(f.read(), encoding)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return _parse_header_content(buffer, encoding)
 
 
 def prep_header_body_from_file(file_path, collection):
@@ -54,17 +105,41 @@ def prep_header_body_from_file(file_path, collection):
 
 
 def prep_header_body(f):
-    """decorator to fill header and body objects"""
+    """decorator to fill header and body objects
 
-    @functools.wraps(f)
-    def wrapper_f(cls, file_path, collection, header=None, body=None, **kwargs):
-        """ensures that function f is called with non-empty header and body"""
+    The decorator can be applied to regular functions and to coroutines.
+    """
+
+    def prep(file_path, collection, header, body):
+        """fill header and body, or describe why that is not possible"""
         if header is None or body is None:
             try:
-                header, body = prep_header_body_from_file(file_path, collection)
+                header, body = prep_header_body_from_file(file_path,
+                                                          collection)
             except (ClientError, ValidationError) as e:
-                return {"_file": file_path, "_exception": e.message}
+                error = {"_file": file_path, "_exception": e.message}
+                return None, None, error
         header = validate_naming(header, file_path)
+        return header, body, None
+
+    if inspect.iscoroutinefunction(f):
+        @functools.wraps(f)
+        async def async_wrapper_f(cls, file_path, collection, header=None,
+                                  body=None, **kwargs):
+            """ensures that coroutine f is awaited with header and body"""
+            header, body, error = prep(file_path, collection, header, body)
+            if error is not None:
+                return error
+            return await f(cls, file_path, collection, header=header,
+                           body=body, **kwargs)
+        return async_wrapper_f
+
+    @functools.wraps(f)
+    def wrapper_f(cls, file_path, collection, header=None, body=None, **kwargs):
+        """ensures that function f is called with non-empty header and body"""
+        header, body, error = prep(file_path, collection, header, body)
+        if error is not None:
+            return error
         return f(cls, file_path, collection, header=header, body=body, **kwargs)
 
     return wrapper_f
@@ -89,61 +164,214 @@ def prep_output(data, file_path):
     return data
 
 
-def inject_support(content, support_files, file_list, api_url):
-    """replace simple file names by paths to support files"""
-    result = content
-    for file in file_list:
-        if file["file_name"] not in support_files:
+def doc_identifier(header, optional_version=False):
+    """construct a name/version identifier for a document
+
+    :param header: dictionary with document name and version
+    :param optional_version: logical, set True to omit an empty version
+    :return: string, identifier for api endpoints
+    """
+    if optional_version and header["version"] in (None, ""):
+        return str(header["name"])
+    return str(header["name"]) + "/" + str(header["version"])
+
+
+def uuid_from_result(result):
+    """extract a document uuid from an api response"""
+    try:
+        return result["uuid"]
+    except KeyError:
+        raise ClientError(result["detail"])
+    except TypeError:
+        raise ClientError(result)
+
+
+def listing_uuids(records):
+    """map identifiers of documents in a collection listing to uuids
+
+    :param records: list of dictionaries with name, version and uuid
+    :return: dictionary with identifiers (as in doc_identifier) and uuids
+    """
+    result = dict()
+    for record in records:
+        if type(record) is not dict or "uuid" not in record or \
+                "name" not in record:
             continue
-        result = result.replace(file["file_name"],
-                                api_url + "/static/" + file["path"])
+        header = {"name": record["name"], "version": record.get("version")}
+        result[doc_identifier(header, optional_version=True)] = record["uuid"]
     return result
 
 
-def context_text(v, dir):
+def missing_primary(header):
+    """name of a header field required for a primary datafile, if missing"""
+    for k in ("datafile", "datafile_source", "datafile_license"):
+        if k not in header:
+            return k
+    return None
+
+
+def support_paths(file_path, header, file_list):
+    """identify support files that are already available
+
+    :param file_path: string, path to md file with header and body
+    :param header: dictionary with a list of support files
+    :param file_list: list with data files for the document
+    :return: list of tuples with a support file path and a logical that is
+        True if the file is already available
+    """
+    existing_filenames = set(_["file_name"] for _ in file_list)
+    return [(join(dirname(file_path), _), _ in existing_filenames)
+            for _ in header["support"]]
+
+
+# targets of links and images: markdown inline links, markdown reference
+# definitions, and html src or href attributes
+LINK_TARGET = re.compile(
+    r"(?P<prefix>\]\(\s*<?"
+    r"|^[ ]{0,3}\[[^\]\n]+\]:[ \t]*<?"
+    r"|\b(?:src|href)\s*=\s*[\"']?)"
+    r"(?P<target>[^\s\"'<>()]+)",
+    re.MULTILINE | re.IGNORECASE)
+
+
+def inject_support(content, support_files, file_list, api_url):
+    """replace simple file names by paths to support files
+
+    Only targets of links and images are replaced, in a single pass.
+
+    :param content: string, markdown or html content
+    :param support_files: list of file names declared as support files
+    :param file_list: list of dictionaries describing uploaded files
+    :param api_url: string, base url for api
+    :return: string
+    """
+    support_files = set(support_files)
+    urls = dict()
+    for file in file_list:
+        if file["file_name"] in support_files:
+            urls.setdefault(file["file_name"],
+                            api_url + "/static/" + file["path"])
+    if len(urls) == 0:
+        return content
+
+    def replace(match):
+        target = match.group("target")
+        url = urls.get(target[2:] if target.startswith("./") else target)
+        if url is None:
+            return match.group(0)
+        return match.group("prefix") + url
+
+    return LINK_TARGET.sub(replace, content)
+
+
+# placeholders for context values in templates, e.g. {intro}
+PLACEHOLDER = re.compile(r"\{([^{}]+)\}")
+
+
+def context_text(v, dir, memo=None):
     """get text value for a context variable
 
     :param v: string, raw value, or filename pointing to more text
     :param dir: string, directory where to search for the data
+    :param memo: dictionary holding the text of files read previously
     :return: content within a data file if a file exists, otherwise
         the raw value v
     """
-    v_file = join(dir, v)
-    if not exists(v_file):
-        return v.strip()
+    v_file = join(dir or "", str(v))
+    try:
+        v_stat = os.stat(v_file)
+    except OSError:
+        return str(v).strip()
+    if not stat.S_ISREG(v_stat.st_mode):
+        return str(v).strip()
+    key = (v_file, v_stat.st_mtime_ns, v_stat.st_size)
+    if memo is not None and key in memo:
+        return memo[key]
     with open(v_file, "rt") as f:
-        result = "".join(f.readlines())
-    return result.strip()
+        result = f.read().strip()
+    if memo is not None:
+        memo[key] = result
+    return result
+
 
+def inject_context(content, context, dir=None, memo=None):
+    """replace placeholders by values from a context dictionary
 
-def inject_context(content, context, dir=None):
-    """replace placeholders by values from a context dictionary"""
+    Placeholders are replaced in a single pass, so text inserted from the
+    context is not searched for more placeholders.
+
+    :param content: string, or list of strings
+    :param context: dictionary mapping placeholder names to values, or to
+        names of files holding the values
+    :param dir: string, directory with files named in the context
+    :param memo: dictionary holding the text of files read previously
+    :return: string, or list of strings
+    """
     if type(content) is list:
-        return [inject_context(_, context, dir=dir) for _ in content]
-    result = content
-    for k, v in context.items():
-        k_placeholder = "{" + k + "}"
-        if k_placeholder in content:
-            v_text = context_text(v, dir=dir)
-            result = result.replace(k_placeholder, v_text)
-        if k == content.strip():
-            v_text = context_text(v, dir=dir)
-            result = result.replace(k, v_text)
-    return result.strip()
+        return [inject_context(_, context, dir=dir, memo=memo)
+                for _ in content]
+    memo = dict() if memo is None else memo
+    # content consisting of a context key only is replaced entirely
+    if content.strip() in context:
+        return context_text(context[content.strip()], dir, memo)
+
+    def replace(match):
+        if match.group(1) not in context:
+            return match.group(0)
+        return context_text(context[match.group(1)], dir, memo)
+
+    return PLACEHOLDER.sub(replace, content).strip()
 
 
 class Doc(Api):
     """interface for API endpoints for documents"""
 
+    def __init__(self, api_url, credentials, session=None):
+        super().__init__(api_url, credentials, session=session)
+        self._manifests = dict()
+        self._manifests_lock = threading.Lock()
+        # text of context files, shared by documents during a run
+        self._context_texts = dict()
+        # uuids of documents (by collection) and data files of documents,
+        # shared by documents during a run
+        self._doc_uuids = dict()
+        self._doc_uuids_lock = threading.Lock()
+        self._file_lists = dict()
+
+    def _collection_uuids(self, collection):
+        """uuids of documents in a collection, listed once per run"""
+        with self._doc_uuids_lock:
+            if collection not in self._doc_uuids:
+                try:
+                    records = list(self.iter_pages("/" + collection +
+                                                   "/list/"))
+                    self._doc_uuids[collection] = listing_uuids(records)
+                except ClientError:
+                    # no listing, documents are looked up one by one
+                    self._doc_uuids[collection] = dict()
+            return self._doc_uuids[collection]
+
     def doc_uuid(self, collection="blog", identifier=""):
-        """use the api to convert a name+version into a uuid identifier"""
-        result = self.get("/"+collection + "/update/" + identifier)
-        try:
-            return result["uuid"]
-        except KeyError:
-            raise ClientError(result["detail"])
-        except TypeError:
-            raise ClientError(result)
+        """use the api to convert a name+version into a uuid identifier
+
+        Identifiers are first looked up in a listing of the collection,
+        requested once and shared by all documents. Documents missing from
+        the listing are requested individually.
+        """
+        uuids = self._collection_uuids(collection)
+        if identifier not in uuids:
+            uuids[identifier] = uuid_from_result(
+                self.get("/"+collection + "/update/" + identifier))
+        return uuids[identifier]
+
+    def doc_files(self, doc_uuid):
+        """data files of a document, requested once per run"""
+        if doc_uuid not in self._file_lists:
+            file_list = self.get("/data/list/"+doc_uuid)
+            if type(file_list) is not list:
+                return file_list
+            self._file_lists[doc_uuid] = file_list
+        return self._file_lists[doc_uuid]
 
     @prep_header_body
     def _create(self, file_path, collection, header=None, body=None):
@@ -154,57 +382,98 @@ class Doc(Api):
         """create a new document"""
         return self._create(file_path, collection)
 
+    def manifest(self, file_path):
+        """manifest for the directory holding a document"""
+        path = manifest_path(file_path)
+        with self._manifests_lock:
+            if path not in self._manifests:
+                self._manifests[path] = Manifest(path)
+            return self._manifests[path]
+
+    def save_manifests(self):
+        """write manifests recording documents sent to the api"""
+        for manifest in self._manifests.values():
+            manifest.save()
+
+    def _prep_update(self, file_path, collection, action, header, body):
+        """adjust the payload using local content (templates)
+
+        :return: string, digest of the payload and of local files
+        """
+        _context = header.get("context", {})
+        _dir = dirname(file_path)
+        body["action"] = action
+        memo = self._context_texts
+        body["content"] = inject_context(body["content"], _context, dir=_dir,
+                                         memo=memo)
+        body["notes"] = inject_context(header["notes"], _context, dir=_dir,
+                                       memo=memo)
+        body["notes"] = prep_notes(body["notes"])
+        local_files = [join(_dir, str(_)) for _ in _context.values()]
+        local_files += [join(_dir, _) for _ in header.get("support", [])]
+        return content_digest([self.api_url, collection, header, body],
+                              files=local_files)
+
+    def _record_update(self, file_path, header, digest, file_list, result):
+        """record a document if the content is final and accepted"""
+        uploaded = set(_["file_name"] for _ in file_list)
+        if type(result) is dict and "detail" not in result and \
+                all(_ in uploaded for _ in header.get("support", [])):
+            self.manifest(file_path).record(basename(file_path), digest)
+
     @prep_header_body
-    def _update(self, file_path, collection, action=None,
+    def _update(self, file_path, collection, action=None, force=False,
                 header=None, body=None):
+        # round 0 - prepare the payload, skip if unchanged since last update
+        digest = self._prep_update(file_path, collection, action, header, body)
+        manifest = self.manifest(file_path)
+        if not force and manifest.unchanged(basename(file_path), digest):
+            return {"_file": file_path, "detail": "unchanged"}
         # round 1 - get uuid for the document
-        identifier = header["name"]
-        if header["version"] is not None and header["version"] != "":
-            identifier += "/" + str(header["version"])
+        identifier = doc_identifier(header, optional_version=True)
         try:
             doc_uuid = self.doc_uuid(collection, identifier)
         except ClientError as e:
             return {"_file": file_path, "_exception": e.message}
         # round 2 - identify available support files
-        file_list = self.get("/data/list/"+doc_uuid)
-        _context = header.get("context", {})
-        _dir = dirname(file_path)
-        # round 3 - adjust the payload
-        # (construct urls for support images, use content from templates)
-        body["action"] = action
-        body["content"] = inject_context(body["content"], _context, dir=_dir)
+        file_list = self.doc_files(doc_uuid)
+        # round 3 - construct urls for support images
         body["content"] = inject_support(body["content"],
                                          header.get("support", []),
                                          file_list, self.api_url)
-        body["notes"] = inject_context(header["notes"], _context, dir=_dir)
-        body["notes"] = prep_notes(body["notes"])
         # send the content to the api
         result = self.post("/" + collection + "/update/" + doc_uuid, body)
+        self._record_update(file_path, header, digest, file_list, result)
         return prep_output(result, file_path)
 
-    def update(self, file_path, collection="blog", action="publish", **kwargs):
-        """send document content/description to the server"""
-        return self._update(file_path, collection, action=action)
+    def update(self, file_path, collection="blog", action="publish",
+               force=False, **kwargs):
+        """send document content/description to the server
+
+        Documents that have not changed since a previous update (according
+        to a manifest file next to the document) are skipped, unless
+        force is True.
+        """
+        return self._update(file_path, collection, action=action, force=force)
 
     @prep_header_body
     def _upload_primary(self, file_path, collection="blog", doc_uuid=None,
                        header=None, body=None):
-        for k in ("datafile", "datafile_source", "datafile_license"):
-            if k not in header:
-                return {"_file": file_path, "_exception": "missing "+k}
+        missing = missing_primary(header)
+        if missing is not None:
+            return {"_file": file_path, "_exception": "missing "+missing}
         datafile_path = join(dirname(file_path), header["datafile"])
         # round 1 - fetch the latest information about the document
         if doc_uuid is None:
-            identifier = str(header["name"]) + "/" + str(header["version"])
-            doc_uuid = self.doc_uuid(collection, identifier)
+            doc_uuid = self.doc_uuid(collection, doc_identifier(header))
         # round 2 - upload the datafile specified in the doc header
-        datafile = Datafile(self.api_url, self.credentials)
-        result = datafile.upload(datafile_path,
-                                 file_role="primary",
-                                 parent_uuid=doc_uuid,
-                                 parent_type=collection,
-                                 source=header["datafile_source"],
-                                 license=header["datafile_license"])
+        result = self.datafile.upload(datafile_path,
+                                      file_role="primary",
+                                      parent_uuid=doc_uuid,
+                                      parent_type=collection,
+                                      source=header["datafile_source"],
+                                      license=header["datafile_license"])
+        self._file_lists.pop(doc_uuid, None)
         return prep_output(result, datafile_path)
 
     def upload_primary(self, file_path, collection="blog", doc_uuid=None,
@@ -217,7 +486,7 @@ class Doc(Api):
             be obtained from api)
         :return: dictionary with a summary of the api request
         """
-        return self._upload_primary(file_path, collection, doc_uuid)
+        return self._upload_primary(file_path, collection, doc_uuid=doc_uuid)
 
     @prep_header_body
     def _upload_support(self, file_path, collection="blog", doc_uuid=None,
@@ -226,26 +495,24 @@ class Doc(Api):
             return {"_file": file_path, "_support": []}
         # round 1 - fetch the latest information about the document
         if doc_uuid is None:
-            identifier = str(header["name"]) + "/" + str(header["version"])
-            doc_uuid = self.doc_uuid(collection, identifier)
+            doc_uuid = self.doc_uuid(collection, doc_identifier(header))
         # round 2 - fetch available support files
-        file_list = self.get("/data/list/"+doc_uuid)
-        existing_filenames = [_["file_name"] for _ in file_list]
+        file_list = self.doc_files(doc_uuid)
         # round 3 - upload missing support files
         result = []
-        datafile = Datafile(self.api_url, self.credentials)
-        for filename in header["support"]:
-            support_path = join(dirname(file_path), filename)
-            if filename in existing_filenames:
+        for support_path, available in support_paths(file_path, header,
+                                                     file_list):
+            if available:
                 result.append({"_file": support_path, "detail": "exists"})
                 continue
-            file_result = datafile.upload(support_path,
-                                          file_role="support",
-                                          parent_uuid=doc_uuid,
-                                          parent_type=collection,
-                                          source=self.username,
-                                          license="CC BY 4.0")
+            file_result = self.datafile.upload(support_path,
+                                               file_role="support",
+                                               parent_uuid=doc_uuid,
+                                               parent_type=collection,
+                                               source=self.username,
+                                               license="CC BY 4.0")
             result.append(prep_output(file_result, support_path))
+            self._file_lists.pop(doc_uuid, None)
         return {"_file": file_path, "uuid": doc_uuid, "_support": result}
 
     def upload_support(self, file_path, collection="blog", doc_uuid=None,
@@ -259,15 +526,16 @@ class Doc(Api):
         :return: dictionary with a summary of the api request, including an
             array summarizing api requests for individual support files
         """
-        return self._upload_support(file_path, collection, doc_uuid)
+        return self._upload_support(file_path, collection, doc_uuid=doc_uuid)
 
     @prep_header_body
     def _upload(self, file_path, collection="blog", header=None, body=None):
         """upload both primary and support data files"""
-        identifier = str(header["name"]) + "/" + str(header["version"])
-        doc_uuid = self.doc_uuid(collection, identifier)
-        primary = self._upload_primary(file_path, collection, doc_uuid)
-        support = self._upload_support(file_path, collection, doc_uuid)
+        doc_uuid = self.doc_uuid(collection, doc_identifier(header))
+        primary = self._upload_primary(file_path, collection,
+                                       doc_uuid=doc_uuid)
+        support = self._upload_support(file_path, collection,
+                                       doc_uuid=doc_uuid)
         return {
             "_file": file_path,
             "uuid": doc_uuid,
@@ -282,14 +550,16 @@ class Doc(Api):
     @prep_header_body
     def _delete(self, file_path, collection="blog", header=None, body=None):
         # round 1 - get uuid for the document
-        identifier, version = header["name"], header["version"]
+        identifier = doc_identifier(header)
         try:
-            self.doc_uuid(collection, identifier+"/"+str(version))
+            self.doc_uuid(collection, identifier)
         except ClientError as e:
             return {"_file": file_path, "_exception": e.message}
         # round 2 - send command to delete
-        body = {"identifier": header["name"], "version": str(version)}
+        body = {"identifier": header["name"],
+                "version": str(header["version"])}
         result = self.post("/"+collection+"/delete/", body)
+        self._collection_uuids(collection).pop(identifier, None)
         return prep_output(result, file_path)
 
     def delete(self, file_path, collection="blog", **kwargs):
@@ -0,0 +1,190 @@
+"""
+download data files from the server using a pool of workers
+
+Files are streamed into a partial file next to the destination and are
+moved into place only when complete. If a transfer is interrupted, the
+partial file is kept, with the validator (ETag or Last-Modified) of the
+response next to it, and the download resumes using an http Range request
+conditional on that validator (If-Range), so that a file changed on the
+server is downloaded again rather than completed with new content.
+When a DownloadCache is provided, files are served from the cache if
+possible and newly downloaded files are added to it.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os.path import exists, getsize
+import requests
+
+
+# size of blocks read from a streamed response
+CHUNK_SIZE = 1 << 16
+# suffix for files that are still being downloaded
+PART_SUFFIX = ".part"
+# suffix (after PART_SUFFIX) for the validator of a partial file
+VALIDATOR_SUFFIX = ".validator"
+
+
+def _range_start(response):
+    """get the first byte position from a Content-Range header"""
+    content_range = response.headers.get("Content-Range", "")
+    try:
+        return int(content_range.split(" ")[1].split("-")[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def _range_total(response):
+    """get the total size from a Content-Range header, e.g. bytes */1234"""
+    content_range = response.headers.get("Content-Range", "")
+    try:
+        return int(content_range.split("/")[-1])
+    except ValueError:
+        return None
+
+
+def _validator(headers):
+    """strong validator of a response, usable in If-Range (or None)"""
+    etag = headers.get("ETag")
+    if etag is not None and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def _resume_headers(part_path):
+    """offset and headers for resuming a partial file
+
+    Partial files without a validator are not resumed, since they may hold
+    the start of another version of the file.
+
+    :return: tuple with the number of bytes to keep and a dictionary of
+        request headers
+    """
+    try:
+        with open(part_path + VALIDATOR_SUFFIX, "r") as f:
+            validator = f.read().strip()
+    except OSError:
+        return 0, dict()
+    offset = getsize(part_path) if exists(part_path) else 0
+    if offset == 0 or validator == "":
+        return 0, dict()
+    return offset, {"Range": "bytes=" + str(offset) + "-",
+                    "If-Range": validator}
+
+
+def _start_part(part_path, headers, offset, status, range_start):
+    """check that a response continues a partial file, and record the
+    validator of a new transfer
+
+    :param headers: response headers
+    :param offset: number of bytes in the partial file
+    :param status: integer, response status
+    :param range_start: first byte position of a partial response
+    :return: number of bytes of the partial file to keep
+    """
+    if offset > 0 and status == 206 and range_start == offset:
+        return offset
+    # a new transfer: server ignored the range, or the file changed
+    validator = _validator(headers)
+    if validator is None:
+        _remove_validator(part_path)
+    else:
+        with open(part_path + VALIDATOR_SUFFIX, "w") as f:
+            f.write(validator)
+    return 0
+
+
+def _remove_validator(part_path):
+    if exists(part_path + VALIDATOR_SUFFIX):
+        os.remove(part_path + VALIDATOR_SUFFIX)
+
+
+def _fetch_part(session, url, part_path):
+    """transfer (the rest of) a file into a partial file
+
+    :return: number of bytes already present before this transfer
+    """
+    offset, headers = _resume_headers(part_path)
+    response = session.get(url, stream=True, headers=headers)
+    with response:
+        if response.status_code == 416 and offset > 0:
+            # partial file may already hold the entire content
+            if _range_total(response) == offset:
+                return offset
+            os.remove(part_path)
+            _remove_validator(part_path)
+            return _fetch_part(session, url, part_path)
+        response.raise_for_status()
+        offset = _start_part(part_path, response.headers, offset,
+                             response.status_code, _range_start(response))
+        with open(part_path, "ab" if offset else "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+    return offset
+
+
+def download_file(session, url, local_path, attempts=3):
+    """download one file into a local path
+
+    :param session: ApiSession object used to perform the request
+    :param url: string, full url of the file
+    :param local_path: string, path where to store the file
+    :param attempts: integer, number of times to resume an interrupted
+        transfer before giving up
+    :return: dictionary with the number of bytes and time taken
+    """
+    start = time.monotonic()
+    part_path = local_path + PART_SUFFIX
+    for attempt in range(attempts):
+        try:
+            offset = _fetch_part(session, url, part_path)
+            break
+        except (requests.ConnectionError,
+                requests.exceptions.ChunkedEncodingError):
+            if attempt == attempts - 1:
+                raise
+    os.replace(part_path, local_path)
+    _remove_validator(part_path)
+    result = {"_bytes": getsize(local_path),
+              "_seconds": time.monotonic() - start}
+    if offset > 0:
+        result["_resumed"] = offset
+    return result
+
+
+def _download_item(session, item, cache=None):
+    """download one file, capturing errors into the summary"""
+    url, local_path = item
+    start = time.monotonic()
+    try:
+        if cache is not None and cache.fetch(url, local_path):
+            return {"_bytes": getsize(local_path),
+                    "_seconds": time.monotonic() - start,
+                    "_cached": True}
+        if cache is not None and cache.offline:
+            raise FileNotFoundError("file not in cache: " + url)
+        result = download_file(session, url, local_path)
+        if cache is not None:
+            cache.store(url, local_path)
+        return result
+    except Exception as e:
+        return {"_bytes": 0, "_seconds": 0.0, "_exception": str(e)}
+
+
+def download_files(session, items, jobs=1, cache=None):
+    """download several files concurrently
+
+    :param session: ApiSession object used to perform the requests
+    :param items: list of tuples with a url and a local path
+    :param jobs: integer, maximum number of concurrent downloads
+    :param cache: DownloadCache object, or None to always download
+    :return: list of dictionaries summarizing each download, in the same
+        order as the items
+    """
+    jobs = max(1, min(int(jobs), len(items)))
+    if jobs == 1:
+        return [_download_item(session, _, cache) for _ in items]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(
+            lambda _: _download_item(session, _, cache), items))
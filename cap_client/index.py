@@ -0,0 +1,252 @@
+"""
+local sqlite index of assignments, scores and data files
+
+The index mirrors /assignment/<username>, /assignment/view/<uuid> and
+/data/list/<uuid>. Syncing compares each listed assignment with the stored
+copy, and requests views and data files only for assignments that are new
+or have changed. Queries are answered from the index without requests.
+
+Records are stored as json, together with columns extracted for filtering
+(status, score, challenge name and version), so that any field can also be
+queried with sqlite json functions, e.g. json_extract(view, '$.score').
+"""
+
+import hashlib
+import json
+import pathlib
+import sqlite3
+import time
+from os import makedirs
+from os.path import dirname, join
+from .batch import map_files
+from .defaults import DEFAULT_CACHE_DIR
+from .errors import ClientError
+from .polling import STATUS_ORDER
+
+
+DEFAULT_INDEX_PATH = join(DEFAULT_CACHE_DIR, "index.sqlite3")
+# status of assignments that will not change anymore
+FINAL_STATUS = STATUS_ORDER[-1]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assignments (
+    uuid TEXT PRIMARY KEY,
+    username TEXT,
+    challenge TEXT,
+    version TEXT,
+    status TEXT,
+    score REAL,
+    digest TEXT,
+    record TEXT,
+    view TEXT,
+    synced REAL
+);
+CREATE INDEX IF NOT EXISTS assignments_user
+    ON assignments (username, challenge);
+CREATE TABLE IF NOT EXISTS datafiles (
+    uuid TEXT,
+    assignment_uuid TEXT,
+    file_role TEXT,
+    file_name TEXT,
+    path TEXT,
+    record TEXT
+);
+CREATE INDEX IF NOT EXISTS datafiles_assignment
+    ON datafiles (assignment_uuid);
+"""
+
+
+def _digest(record):
+    return hashlib.sha256(json.dumps(record, sort_keys=True,
+                                     default=str).encode()).hexdigest()
+
+
+def _first(records, keys):
+    """first value found under one of several keys, in several records"""
+    for record in records:
+        if type(record) is not dict:
+            continue
+        for key in keys:
+            value = record.get(key)
+            if isinstance(value, dict):
+                value = value.get("name")
+            if value is not None:
+                return str(value)
+    return None
+
+
+def _score(view):
+    try:
+        return float(view["score"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class AssignmentIndex:
+    """Mirror of assignments and data files in a sqlite database"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        """opens (or creates) the index
+
+        :param path: string, path to the sqlite database
+        """
+        self.path = path
+        if dirname(path) != "":
+            makedirs(dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _fetch(self, uuid, assignment):
+        """view and data files for one assignment
+
+        :raises ClientError: when the api answers with an error, so that
+            the assignment is refreshed again by the next sync
+        """
+        view = assignment.view(uuid, revalidate=True)
+        if type(view) is not dict or "status" not in view:
+            raise ClientError("could not view assignment: " + str(view))
+        datafiles = assignment.datafile.list(uuid)
+        if type(datafiles) is not list:
+            raise ClientError("could not list data files: " +
+                              str(datafiles))
+        return uuid, view, datafiles
+
+    def sync(self, assignment, username=None, full=False, jobs=1):
+        """mirror assignments of a user into the index
+
+        :param assignment: Assignment object
+        :param username: string, username (default: user of assignment)
+        :param full: logical, refresh all assignments, even unchanged ones
+        :param jobs: integer, maximum number of assignments refreshed at once
+        :return: dictionary with numbers of listed, refreshed, failed and
+            removed assignments, and the uuid and message (_exception) of
+            each failed refresh
+        """
+        start = time.monotonic()
+        if username is None:
+            username = assignment.credentials.username
+        stored = {row["uuid"]: row["digest"] for row in self.db.execute(
+            "SELECT uuid, digest FROM assignments WHERE username = ?",
+            (username,))}
+        listed, changed = dict(), []
+        for record in assignment.iter(username):
+            if type(record) is not dict or "uuid" not in record:
+                raise ClientError("unexpected assignment: " + str(record))
+            digest = _digest(record)
+            listed[record["uuid"]] = (record, digest)
+            if full or stored.get(record["uuid"]) != digest:
+                changed.append(record["uuid"])
+        removed = [_ for _ in stored if _ not in listed]
+        now = time.time()
+        refreshed, errors = 0, []
+        with self.db:
+            for item in map_files(self._fetch, changed, jobs=jobs,
+                                  assignment=assignment):
+                if type(item) is dict:
+                    # error captured by map_files
+                    errors.append({"uuid": item["_file"],
+                                   "_exception": item["_exception"]})
+                    continue
+                uuid, view, datafiles = item
+                record, digest = listed[uuid]
+                self._store(username, record, digest, view, datafiles, now)
+                refreshed += 1
+            for uuid in removed:
+                self.db.execute("DELETE FROM assignments WHERE uuid = ?",
+                                (uuid,))
+                self.db.execute("DELETE FROM datafiles "
+                                "WHERE assignment_uuid = ?", (uuid,))
+        return {"assignments": len(listed), "refreshed": refreshed,
+                "failed": len(errors), "removed": len(removed),
+                "errors": errors,
+                "_seconds": round(time.monotonic() - start, 3)}
+
+    def _store(self, username, record, digest, view, datafiles, now):
+        """replace one assignment and its data files"""
+        uuid = record["uuid"]
+        view = view if type(view) is dict else dict()
+        challenge = _first([view, record], ["challenge_name", "challenge",
+                                            "name"])
+        version = _first([view, record], ["challenge_version", "version"])
+        status = _first([view, record], ["status"])
+        self.db.execute(
+            "INSERT OR REPLACE INTO assignments VALUES "
+            "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (uuid, username, challenge, version, status, _score(view),
+             digest, json.dumps(record), json.dumps(view), now))
+        self.db.execute("DELETE FROM datafiles WHERE assignment_uuid = ?",
+                        (uuid,))
+        self.db.executemany(
+            "INSERT INTO datafiles VALUES (?, ?, ?, ?, ?, ?)",
+            [(f.get("uuid"), uuid, f.get("file_role"), f.get("file_name"),
+              f.get("path"), json.dumps(f))
+             for f in datafiles if type(f) is dict])
+
+    def query(self, username=None, status=None, pending=False,
+              challenge=None, datafiles=False):
+        """assignments matching all specified criteria
+
+        :param username: string, owner of assignments
+        :param status: string, status of assignments
+        :param pending: logical, only assignments that are not complete
+        :param challenge: string, challenge name
+        :param datafiles: logical, include data files of each assignment
+        :return: list of dictionaries
+        """
+        conditions, values = [], []
+        for column, value in [("username", username), ("status", status),
+                              ("challenge", challenge)]:
+            if value is not None:
+                conditions.append(column + " = ?")
+                values.append(value)
+        if pending:
+            conditions.append("(status IS NULL OR status != ?)")
+            values.append(FINAL_STATUS)
+        sql = "SELECT uuid, username, challenge, version, status, score, " \
+              "synced FROM assignments"
+        if len(conditions) > 0:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY challenge, version, uuid"
+        result = [dict(row) for row in self.db.execute(sql, values)]
+        if datafiles:
+            for item in result:
+                item["datafiles"] = [json.loads(row["record"]) for row in
+                                     self.db.execute(
+                                         "SELECT record FROM datafiles "
+                                         "WHERE assignment_uuid = ?",
+                                         (item["uuid"],))]
+        return result
+
+    def summary(self, username=None):
+        """number of assignments and best score for each challenge"""
+        sql = "SELECT challenge, version, COUNT(*) AS assignments, " \
+              "SUM(status = ?) AS complete, MAX(score) AS best_score " \
+              "FROM assignments"
+        values = [FINAL_STATUS]
+        if username is not None:
+            sql += " WHERE username = ?"
+            values.append(username)
+        sql += " GROUP BY challenge, version ORDER BY challenge, version"
+        return [dict(row) for row in self.db.execute(sql, values)]
+
+    def execute(self, sql):
+        """run a read-only sql query on the index"""
+        uri = pathlib.Path(self.path).resolve().as_uri() + "?mode=ro"
+        db = sqlite3.connect(uri, uri=True)
+        db.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in db.execute(sql)]
+        except sqlite3.Error as e:
+            raise ClientError("invalid query: " + str(e))
+        finally:
+            db.close()
@@ -0,0 +1,206 @@
+"""
+run the lifecycle of many assignments: start, wait, download, upload, submit
+
+Assignments are listed in a manifest file (yaml or json), e.g.
+
+    - name: trivial
+      version: "0.1"
+      response: responses/trivial.txt
+      tags: baseline
+    - uuid: 1a2b3c4d-...
+      response: responses/other.txt
+
+Each entry identifies a challenge (uuid, or name and version) and may
+specify a response file, tags, a directory for data files (data_dir), and
+submit: false to stop before submitting. Relative paths are interpreted
+relative to the manifest file.
+"""
+
+import json
+import logging
+import os
+import time
+import yaml
+from os.path import dirname, isfile, join
+from .batch import map_files
+from .errors import ClientError, ValidationError
+from .polling import Poller
+
+
+logger = logging.getLogger(__name__)
+
+
+# stages of the lifecycle, in order
+STAGES = ("start", "wait", "download", "upload", "submit")
+
+
+def load_manifest(path):
+    """read assignment entries from a manifest file
+
+    :param path: string, path to a yaml or json file holding a list of
+        entries, or a mapping with the list under key "assignments"
+    :return: list of dictionaries
+    """
+    try:
+        with open(path, "r") as f:
+            if path.endswith(".json"):
+                data = json.load(f)
+            else:
+                data = yaml.safe_load(f)
+    except OSError as e:
+        raise ValidationError("could not read manifest: " + str(e))
+    except (ValueError, yaml.YAMLError) as e:
+        raise ValidationError("invalid manifest: " + str(e))
+    if type(data) is dict:
+        data = data.get("assignments")
+    if type(data) is not list:
+        raise ValidationError("manifest should hold a list of assignments")
+    entries = []
+    for i, item in enumerate(data):
+        if type(item) is not dict or \
+                ("uuid" not in item and "name" not in item):
+            raise ValidationError("manifest entry " + str(i) +
+                                  " should specify a challenge uuid or name")
+        entry = dict(item)
+        for key in ["response", "data_dir"]:
+            if entry.get(key) is not None:
+                entry[key] = join(dirname(path), str(entry[key]))
+        if entry.get("response") is not None and \
+                not isfile(entry["response"]):
+            raise ValidationError("manifest entry " + str(i) +
+                                  ": file does not exist: " +
+                                  entry["response"])
+        entries.append(entry)
+    return entries
+
+
+def _stage_error(stage, result):
+    """message for a stage result that prevents the next stages"""
+    if stage == "start" and \
+            (type(result) is not dict or "uuid" not in result):
+        return "no assignment uuid: " + str(result)
+    if stage == "wait":
+        if type(result) is not dict or "status" not in result:
+            return "no assignment status: " + str(result)
+        return result.get("_exception")
+    if stage == "download":
+        failed = [_ for _ in result if "_exception" in _]
+        if len(failed) > 0:
+            return failed[0]["_exception"]
+    if stage == "upload":
+        # an assignment is never submitted without its response
+        if type(result) is not dict:
+            return "upload failed: " + str(result)
+        for key in ["_exception", "detail"]:
+            if key in result:
+                return "upload failed: " + str(result[key])
+    return None
+
+
+class LifecycleRunner:
+    """Takes assignments from start to submission"""
+
+    def __init__(self, assignment, data_dir=".", poller=None, cache=None):
+        """prepares a runner
+
+        :param assignment: Assignment object
+        :param data_dir: string, directory for data files; files for each
+            assignment are stored in a subdirectory named by its uuid
+        :param poller: Poller object used while waiting for assignments to
+            be generated
+        :param cache: DownloadCache object, or None to bypass the cache
+        """
+        self.assignment = assignment
+        self.data_dir = data_dir
+        self.poller = Poller() if poller is None else poller
+        self.cache = cache
+
+    def _stage(self, report, stage, function, **kwargs):
+        """perform one stage, recording its result and latency
+
+        :return: logical, True if the next stages can proceed
+        """
+        start = time.monotonic()
+        try:
+            result = function(**kwargs)
+            error = _stage_error(stage, result)
+        except (ClientError, ValidationError) as e:
+            result, error = None, e.message
+        except Exception as e:
+            logger.exception("unexpected error in stage: %s", stage)
+            result, error = None, str(e)
+        report["_latency"][stage] = round(time.monotonic() - start, 3)
+        report[stage] = result
+        if error is not None:
+            report["_exception"] = stage + ": " + error
+            return False
+        return True
+
+    def _download(self, uuid, data_dir, cache):
+        """download data files into a directory, creating it if needed"""
+        os.makedirs(data_dir, exist_ok=True)
+        return self.assignment.download(uuid=uuid, data_dir=data_dir,
+                                        cache=cache)
+
+    def run(self, entry):
+        """take one assignment through all stages
+
+        :param entry: dictionary from a manifest
+        :return: dictionary with the result and latency of each stage
+        """
+        report = {"entry": entry, "_latency": dict()}
+        assignment = self.assignment
+        start = time.monotonic()
+        if self._stage(report, "start", assignment.start,
+                       uuid=entry.get("uuid"), name=entry.get("name"),
+                       version=entry.get("version")):
+            uuid = report["start"]["uuid"]
+            report["uuid"] = uuid
+            data_dir = entry.get("data_dir") or join(self.data_dir, uuid)
+            stages = [
+                ("wait", assignment.wait,
+                 {"uuid": uuid, "status": "generated",
+                  "poller": self.poller}),
+                ("download", self._download,
+                 {"uuid": uuid, "data_dir": data_dir, "cache": self.cache})]
+            if entry.get("response") is not None:
+                stages.append(("upload", assignment.upload,
+                               {"uuid": uuid,
+                                "file_path": entry["response"]}))
+            if entry.get("submit", True):
+                stages.append(("submit", assignment.submit,
+                               {"uuid": uuid, "tags": entry.get("tags")}))
+            for stage, function, kwargs in stages:
+                if not self._stage(report, stage, function, **kwargs):
+                    break
+        report["_seconds"] = round(time.monotonic() - start, 3)
+        return report
+
+    def run_all(self, entries, jobs=1):
+        """take several assignments through all stages concurrently
+
+        :param entries: list of dictionaries from a manifest
+        :param jobs: integer, maximum number of assignments processed at once
+        :return: dictionary with a report for each assignment, and a summary
+            of latencies for each stage
+        """
+        start = time.monotonic()
+        reports = list(map_files(self.run, entries, jobs=jobs))
+        return {"assignments": reports,
+                "stages": summarize_latency(reports),
+                "failed": len([_ for _ in reports if "_exception" in _]),
+                "_seconds": round(time.monotonic() - start, 3)}
+
+
+def summarize_latency(reports):
+    """count, mean and maximum latency (seconds) for each stage"""
+    result = dict()
+    for stage in STAGES:
+        values = [_["_latency"][stage] for _ in reports
+                  if stage in _.get("_latency", dict())]
+        if len(values) == 0:
+            continue
+        result[stage] = {"count": len(values),
+                         "mean": round(sum(values) / len(values), 3),
+                         "max": max(values)}
+    return result
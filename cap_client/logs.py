@@ -0,0 +1,72 @@
+"""
+logging of api requests: levels for each subsystem, and abbreviated values
+
+Each module logs through its own logger (cap_client.api,
+cap_client.session, ...), so that levels can be set for each subsystem,
+e.g. --log_level session=INFO.
+
+Headers and bodies are logged as Abbreviated objects: they are formatted
+only when a message is emitted, values of secret fields (authorization
+headers, tokens, passwords) are masked, and long values are truncated.
+"""
+
+import logging
+import reprlib
+from .errors import ValidationError
+
+
+# fields whose values are never logged (compared in lower case)
+SECRET_FIELDS = frozenset(["authorization", "proxy-authorization", "cookie",
+                           "set-cookie", "token", "password", "secret"])
+# maximum number of characters logged for one value
+MAX_LENGTH = 500
+
+_repr = reprlib.Repr()
+_repr.maxlevel = 4
+_repr.maxdict = 20
+_repr.maxlist = 10
+_repr.maxstring = MAX_LENGTH
+_repr.maxother = MAX_LENGTH
+
+
+def _masked(value):
+    """copy of a dictionary with values of secret fields masked"""
+    if not isinstance(value, dict):
+        return value
+    return {k: "***" if str(k).lower() in SECRET_FIELDS else v
+            for k, v in value.items()}
+
+
+class Abbreviated:
+    """Value formatted for a log message only when the message is emitted"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        text = _repr.repr(_masked(self.value))
+        if len(text) > MAX_LENGTH:
+            text = text[:MAX_LENGTH] + "... (" + \
+                str(len(text) - MAX_LENGTH) + " more characters)"
+        return text
+
+
+def set_log_levels(values):
+    """set logging levels of subsystems
+
+    :param values: list of strings SUBSYSTEM=LEVEL, e.g. api=DEBUG, where
+        SUBSYSTEM is a module of cap_client
+    """
+    for value in values or []:
+        name, _, level = value.partition("=")
+        level = level.strip().upper()
+        if name.strip() == "" or \
+                not isinstance(logging.getLevelName(level), int):
+            raise ValidationError("invalid log level: " + value +
+                                  " (expected SUBSYSTEM=LEVEL)")
+        name = name.strip()
+        if not name.startswith("cap_client"):
+            name = "cap_client." + name
+        logging.getLogger(name).setLevel(level)
@@ -0,0 +1,84 @@
+"""
+local record of content that has already been sent to the api
+
+A manifest file in a directory of documents maps each document to a
+digest of its content. Documents with an unchanged digest can be skipped.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from os.path import dirname, isfile, join
+
+
+# name of the manifest file within a directory of documents
+MANIFEST_NAME = ".captest_manifest.json"
+
+
+def content_digest(data, files=()):
+    """compute a digest for structured data and the content of files
+
+    :param data: object that can be serialized into json
+    :param files: list of paths to files (missing files are ignored)
+    :return: string, hexadecimal digest
+    """
+    result = hashlib.sha256()
+    result.update(json.dumps(data, sort_keys=True, default=str).encode())
+    for file_path in files:
+        result.update(b"\0" + file_path.encode() + b"\0")
+        if not isfile(file_path):
+            continue
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                result.update(chunk)
+    return result.hexdigest()
+
+
+class Manifest:
+    """Digests of documents, stored in a json file"""
+
+    def __init__(self, path):
+        """manages a manifest file
+
+        :param path: string, path to the manifest file
+        """
+        self.path = path
+        self.data = dict()
+        self.modified = False
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r") as f:
+                self.data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            pass
+        if type(self.data) is not dict:
+            self.data = dict()
+
+    def unchanged(self, key, digest):
+        """determine if an item has the same digest as in the manifest"""
+        return self.data.get(key) == digest
+
+    def record(self, key, digest):
+        """store the digest for an item"""
+        with self._lock:
+            self.data[key] = digest
+            self.modified = True
+
+    def save(self):
+        """write the manifest file, if there are new records"""
+        with self._lock:
+            if not self.modified:
+                return
+            fd, temp_path = tempfile.mkstemp(dir=dirname(self.path) or ".",
+                                             suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.data, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+            self.modified = False
+
+
+def manifest_path(file_path):
+    """path to the manifest for the directory holding a document"""
+    return join(dirname(file_path), MANIFEST_NAME)
@@ -0,0 +1,105 @@
+"""
+streaming encoder for multipart/form-data request bodies
+
+The body is produced in chunks while it is sent, so uploading a large file
+uses a constant amount of memory.
+"""
+
+import sys
+import uuid
+from os.path import basename, getsize
+
+
+# size of blocks read from an uploaded file
+CHUNK_SIZE = 1 << 16
+
+
+def _quote(value):
+    """escape a value for use in a Content-Disposition header"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+class MultipartEncoder:
+    """Iterable multipart/form-data body with text fields and one file"""
+
+    def __init__(self, fields, file_field, file_path, progress=None,
+                 chunk_size=CHUNK_SIZE):
+        """prepares a multipart body
+
+        :param fields: dictionary with text fields
+        :param file_field: string, name of the field holding the file
+        :param file_path: string, path to the file to upload
+        :param progress: function called with the number of bytes sent and
+            the total number of bytes, or None
+        :param chunk_size: integer, number of bytes read from the file at once
+        """
+        self.boundary = uuid.uuid4().hex
+        self.content_type = "multipart/form-data; boundary=" + self.boundary
+        self.file_path = file_path
+        self.progress = progress
+        self.chunk_size = chunk_size
+        dash_boundary = "--" + self.boundary + "\r\n"
+        head = []
+        for k, v in fields.items():
+            head.append(dash_boundary)
+            head.append('Content-Disposition: form-data; name="' +
+                        _quote(k) + '"\r\n\r\n')
+            head.append(str(v) + "\r\n")
+        head.append(dash_boundary)
+        head.append('Content-Disposition: form-data; name="' +
+                    _quote(file_field) + '"; filename="' +
+                    _quote(basename(file_path)) + '"\r\n')
+        head.append("Content-Type: application/octet-stream\r\n\r\n")
+        self.head = "".join(head).encode("utf-8")
+        self.tail = ("\r\n--" + self.boundary + "--\r\n").encode("utf-8")
+        self.file_size = getsize(file_path)
+        self._chunks = None
+
+    def __len__(self):
+        return len(self.head) + self.file_size + len(self.tail)
+
+    def _generate(self):
+        total, sent = len(self), 0
+        yield self.head
+        sent += len(self.head)
+        with open(self.file_path, "rb") as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+                sent += len(chunk)
+                if self.progress is not None:
+                    self.progress(sent, total)
+        yield self.tail
+        if self.progress is not None:
+            self.progress(total, total)
+
+    def __iter__(self):
+        """iterate over the body; each iteration reads the file afresh"""
+        self.close()
+        self._chunks = self._generate()
+        return self._chunks
+
+    def close(self):
+        """release the file handle of an unfinished iteration"""
+        if self._chunks is not None:
+            self._chunks.close()
+            self._chunks = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def print_progress(sent, total, stream=None):
+    """display upload progress on a single terminal line"""
+    stream = sys.stderr if stream is None else stream
+    percent = 100 * sent / total if total > 0 else 100
+    stream.write("\rupload: " + str(sent) + " / " + str(total) +
+                 " bytes (" + str(int(percent)) + "%)")
+    if sent >= total:
+        stream.write("\n")
+    stream.flush()
@@ -0,0 +1,45 @@
+"""
+writing the output of actions as json
+
+Formats:
+ - json: indented json document
+ - compact: json document on one line
+ - ndjson: one line of json per record, written as records become available
+"""
+
+import sys
+from json import dumps
+
+
+OUTPUT_FORMATS = ("json", "compact", "ndjson")
+
+
+def is_stream(result):
+    """determine if a result is an iterator producing records over time"""
+    return hasattr(result, "__next__")
+
+
+def write_result(result, output="json", stream=None):
+    """write the output of an action
+
+    :param result: object that can be serialized into json, or an iterator
+        over such objects (e.g. results for several files)
+    :param output: string, one of OUTPUT_FORMATS
+    :param stream: file-like object (default: sys.stdout)
+    """
+    stream = sys.stdout if stream is None else stream
+    if output == "ndjson":
+        flush = is_stream(result)
+        records = result if flush or type(result) is list else [result]
+        for record in records:
+            stream.write(dumps(record, separators=(",", ":")) + "\n")
+            if flush:
+                stream.flush()
+        return
+    if is_stream(result):
+        result = list(result)
+    if output == "compact":
+        stream.write(dumps(result, separators=(",", ":")) + "\n")
+    else:
+        stream.write(dumps(result, indent=2) + "\n")
+    stream.flush()
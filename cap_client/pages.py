@@ -0,0 +1,61 @@
+"""
+pagination of api listings
+
+Listings are requested with page and page_size query parameters. Pages
+may be envelopes with the records under "results" and a link to the "next"
+page, or plain lists of records. Iteration stops after an envelope without
+a next page, after a plain list shorter than the page size (or empty), or
+when a page repeats the previous one (servers that ignore pagination
+parameters). Pages that are neither envelopes nor lists are errors.
+"""
+
+import json
+from .errors import ClientError
+
+
+DEFAULT_PAGE_SIZE = 100
+
+
+class Paginator:
+    """Builds page urls and interprets pages of one listing"""
+
+    def __init__(self, endpoint, page_size=DEFAULT_PAGE_SIZE):
+        """prepares pagination
+
+        :param endpoint: string, api endpoint of the listing
+        :param page_size: integer, number of records requested per page
+        """
+        self.endpoint = endpoint
+        self.page_size = int(page_size)
+        self.first = None
+
+    def url(self, page):
+        """endpoint with pagination parameters for a page (starting at 1)"""
+        separator = "&" if "?" in self.endpoint else "?"
+        return self.endpoint + separator + "page=" + str(page) + \
+            "&page_size=" + str(self.page_size)
+
+    def parse(self, result, page):
+        """records in a page, and whether more pages follow
+
+        :param result: output of a GET request for the page
+        :param page: integer, page number
+        :return: tuple with a list of records and a logical
+        :raises ClientError: when the page is neither an envelope nor a list
+        """
+        if type(result) is dict and "results" in result:
+            records, more = result["results"], bool(result.get("next"))
+        elif type(result) is list:
+            records = result
+            more = len(records) >= self.page_size
+        else:
+            # errors are signaled on any page, so a listing is never cut
+            # short without notice
+            raise ClientError(str(result))
+        if len(records) == 0:
+            return [], False
+        first = json.dumps(records[0], sort_keys=True)
+        if first == self.first:
+            return [], False
+        self.first = first
+        return records, more
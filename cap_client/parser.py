@@ -3,6 +3,7 @@ argparse object with common arguments for user-level and admin-level clients
 """
 
 import argparse
+from .defaults import DEFAULT_CACHE_DIR
 
 parser = argparse.ArgumentParser(
     description="client for interfacing with www.captest.io"
@@ -20,9 +21,50 @@ parser.add_argument("--save_secrets", action="store_true",
 # url for api
 parser.add_argument("--api", action="store", default="https://api.captest.io",
                     help="url to the api server")
+# connection pool
+parser.add_argument("--pool_size", action="store", type=int, default=10,
+                    help="maximum number of pooled connections to the api")
+parser.add_argument("--keep_alive", action="store", type=float, default=60,
+                    help="seconds to keep idle connections open (0: disable)")
+parser.add_argument("--rate", action="store", type=float, default=0,
+                    help="maximum number of requests per second (0: no limit)")
+# retries
+parser.add_argument("--retries", action="store", type=int, default=3,
+                    help="maximum number of retries for failed requests")
+parser.add_argument("--backoff", action="store", type=float, default=0.5,
+                    help="seconds before the first retry (doubles each time)")
+# local cache
+parser.add_argument("--cache_dir", action="store", default=DEFAULT_CACHE_DIR,
+                    help="directory for cached responses and data files")
+parser.add_argument("--cache_ttl", action="append", default=None,
+                    metavar="ENDPOINT=SECONDS",
+                    help="reuse cached responses for an endpoint without "
+                         "revalidation, e.g. /data/list/=30")
+parser.add_argument("--no_cache", action="store_true",
+                    help="do not use the local cache")
+# progress of file uploads
+parser.add_argument("--progress", action="store_true",
+                    help="display progress of file uploads")
+# format of output
+parser.add_argument("--output", action="store", default="json",
+                    choices=["json", "compact", "ndjson"],
+                    help="output format; ndjson writes one record per line "
+                         "as results arrive")
+# tracing of requests
+parser.add_argument("--trace", action="store", default=None, metavar="FILE",
+                    help="record method, endpoint, status, size and timing "
+                         "of each request into a file")
+parser.add_argument("--trace_format", action="store", default="jsonl",
+                    choices=["jsonl", "otlp"],
+                    help="format of the trace file: one json record per "
+                         "line, or OpenTelemetry json")
 # verbosity level
 parser.add_argument("--verbose", action="store_true",
                     help="output INFO logging messages")
+parser.add_argument("--log_level", action="append", default=None,
+                    metavar="SUBSYSTEM=LEVEL",
+                    help="logging level for one subsystem, e.g. "
+                         "session=INFO or api=DEBUG")
 
 # subparsers
 subparsers = parser.add_subparsers(help="action", dest="action", required=True)
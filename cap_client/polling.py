@@ -0,0 +1,105 @@
+"""
+repeated queries until an object reaches a desired state
+
+The interval between queries grows while the state does not change, and
+returns to the initial interval after each transition, so a sequence of
+quick transitions is followed closely while long waits use few requests.
+"""
+
+import time
+
+
+# assignment statuses, in the order in which they are reached
+STATUS_ORDER = ("generated", "submitted", "complete")
+
+
+def status_rank(status):
+    """position of a status in STATUS_ORDER (-1 for earlier statuses)"""
+    try:
+        return STATUS_ORDER.index(status)
+    except ValueError:
+        return -1
+
+
+class Poller:
+    """Repeats a query with adaptive intervals and an overall timeout"""
+
+    def __init__(self, interval=1, max_interval=30, factor=2, timeout=600,
+                 callback=None):
+        """configures polling
+
+        :param interval: number, seconds before the second query (0: the
+            second query follows at once, and later ones after
+            max_interval)
+        :param max_interval: number, maximum seconds between queries
+        :param factor: number, growth of the interval while the state is
+            unchanged
+        :param timeout: number, maximum seconds spent waiting
+        :param callback: function called on each change of state, with the
+            previous state, the new state and the query result
+        """
+        self.interval = float(interval)
+        self.max_interval = max(float(max_interval), self.interval)
+        self.factor = max(1.0, float(factor))
+        self.timeout = float(timeout)
+        self.callback = callback
+
+    def _step(self, state, result, previous, interval, start):
+        """signal a transition and compute the next interval
+
+        :return: number of seconds to wait, or None after the timeout
+        """
+        if state != previous[0]:
+            if self.callback is not None:
+                self.callback(previous[0], state, result)
+            previous[0] = state
+            interval = self.interval
+        elif interval > 0:
+            interval = min(self.max_interval, interval * self.factor)
+        else:
+            interval = self.max_interval
+        remaining = self.timeout - (time.monotonic() - start)
+        if remaining <= 0:
+            return None
+        return min(interval, remaining)
+
+    def wait(self, query, done, state=None):
+        """repeat a query until its result is done
+
+        :param query: function without arguments returning a result
+        :param done: function determining if a result is final
+        :param state: function extracting the state from a result (used to
+            detect transitions); by default, the result itself
+        :return: tuple with the last result and a logical, True if the
+            result is final (False after the timeout)
+        """
+        state = (lambda _: _) if state is None else state
+        start, previous = time.monotonic(), [None]
+        interval = self.interval / self.factor
+        while True:
+            result = query()
+            if done(result):
+                self._step(state(result), result, previous, interval, start)
+                return result, True
+            interval = self._step(state(result), result, previous,
+                                  interval, start)
+            if interval is None:
+                return result, False
+            time.sleep(interval)
+
+    async def wait_async(self, query, done, state=None):
+        """counterpart of wait for a query returning an awaitable"""
+        import asyncio
+        state = (lambda _: _) if state is None else state
+        start, previous = time.monotonic(), [None]
+        interval = self.interval / self.factor
+        while True:
+            result = await query()
+            if done(result):
+                self._step(state(result), result, previous, interval, start)
+                return result, True
+            interval = self._step(state(result), result, previous,
+                                  interval, start)
+            if interval is None:
+                return result, False
+            await asyncio.sleep(interval)
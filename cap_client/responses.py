@@ -0,0 +1,156 @@
+"""
+persistent cache for responses to GET requests
+
+Stored responses are used without contacting the api for a number of
+seconds that depends on the endpoint (time-to-live). Afterwards, they are
+revalidated with If-None-Match/If-Modified-Since headers, so unchanged
+content costs a single 304 round-trip. Any POST request marks all stored
+responses as stale (they are then always revalidated), also for other
+processes sharing the same cache directory.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import time
+from os.path import exists, join
+from .defaults import DEFAULT_CACHE_DIR
+
+
+# seconds during which stored responses are used without revalidation
+DEFAULT_TTL = {
+    "/challenge/view/": 600,
+    "/search/summary/": 60
+}
+
+
+def parse_ttl(items, ttl=None):
+    """build a time-to-live policy from strings such as /data/list/=30
+
+    :param items: list of strings with an endpoint prefix and seconds
+    :param ttl: dictionary with a policy to extend (default: DEFAULT_TTL)
+    :return: dictionary mapping endpoint prefixes to seconds
+    """
+    result = dict(DEFAULT_TTL if ttl is None else ttl)
+    for item in items or []:
+        prefix, _, seconds = item.rpartition("=")
+        result[prefix] = float(seconds)
+    return result
+
+
+class ResponseCache:
+    """Cache of api responses with a time-to-live policy per endpoint"""
+
+    def __init__(self, path=DEFAULT_CACHE_DIR, ttl=None, offline=False):
+        """manages stored responses in memory and on disk
+
+        :param path: string, cache directory
+        :param ttl: dictionary mapping endpoint prefixes (e.g. /data/list/)
+            to a number of seconds; endpoints without a prefix in the
+            dictionary are always revalidated
+        :param offline: logical, set True to use stored responses without
+            revalidation, whatever their age
+        """
+        self.path = join(path, "responses")
+        self.ttl = dict(DEFAULT_TTL if ttl is None else ttl)
+        self.offline = offline
+        self._memory = dict()
+        self._marker = join(self.path, "_stale")
+
+    def ttl_for(self, endpoint):
+        """time-to-live for an endpoint, using the longest matching prefix"""
+        prefixes = [_ for _ in self.ttl if endpoint.startswith(_)]
+        if len(prefixes) == 0:
+            return 0
+        return self.ttl[max(prefixes, key=len)]
+
+    def _key_path(self, key):
+        return join(self.path, hashlib.sha256(key.encode()).hexdigest())
+
+    def _stale_before(self):
+        """time of the most recent request that modified content"""
+        try:
+            return os.stat(self._marker).st_mtime
+        except FileNotFoundError:
+            return 0
+
+    def lookup(self, key):
+        """fetch a stored response
+
+        :param key: string, identifier for a request (user and url)
+        :return: dictionary with response data, or None
+        """
+        entry = self._memory.get(key)
+        if entry is None:
+            try:
+                with open(self._key_path(key), "r") as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, ValueError):
+                return None
+            self._memory[key] = entry
+        return entry
+
+    def is_fresh(self, entry, endpoint):
+        """determine if a stored response can be used without the api"""
+        if self.offline:
+            return True
+        if entry["stored"] <= self._stale_before():
+            return False
+        return time.time() - entry["stored"] < self.ttl_for(endpoint)
+
+    @staticmethod
+    def conditional_headers(entry):
+        """headers that ask the api to confirm a stored response is current"""
+        headers = dict()
+        if entry.get("etag") is not None:
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified") is not None:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def result(entry):
+        """copy of the result object within a stored response"""
+        return copy.deepcopy(entry["result"])
+
+    def _write(self, key, entry):
+        self._memory[key] = entry
+        os.makedirs(self.path, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp_path, self._key_path(key))
+
+    def store(self, key, endpoint, response, result):
+        """record a response that can be reused or revalidated later
+
+        :param key: string, identifier for a request (user and url)
+        :param endpoint: string, api endpoint
+        :param response: requests.Response object
+        :param result: object parsed from the response body
+        """
+        entry = {
+            "stored": time.time(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "result": result
+        }
+        if entry["etag"] is None and entry["last_modified"] is None \
+                and self.ttl_for(endpoint) <= 0:
+            return
+        self._write(key, copy.deepcopy(entry))
+
+    def refresh(self, key, entry):
+        """mark a stored response as confirmed by the api"""
+        entry = dict(entry)
+        entry["stored"] = time.time()
+        self._write(key, entry)
+
+    def expire(self):
+        """mark all stored responses as stale"""
+        os.makedirs(self.path, exist_ok=True)
+        if not exists(self._marker):
+            open(self._marker, "w").close()
+        os.utime(self._marker)
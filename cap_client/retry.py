@@ -0,0 +1,150 @@
+"""
+retry policy and circuit breaker for api requests
+
+Requests that fail with a connection error or with a transient status code
+(429, 502, 503, 504) are repeated after an exponentially increasing delay
+with random jitter, or after the delay requested by a Retry-After header.
+Requests that are not idempotent (POST) are repeated only when the server
+cannot have processed them: failed connections, 429 and 503 responses.
+
+A circuit breaker stops sending requests for a while after several
+consecutive failures, so a batch of requests against an unavailable api
+fails fast instead of waiting for every retry.
+"""
+
+import email.utils
+import random
+import threading
+import time
+import requests
+import urllib3
+from .errors import ClientError
+
+
+# status codes signaling transient failures
+RETRY_STATUSES = (429, 502, 503, 504)
+# status codes signaling that a request was not processed
+REJECTED_STATUSES = (429, 503)
+# http methods that can be repeated safely
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+def parse_retry_after(value):
+    """convert a Retry-After header (seconds or http date) into seconds"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def is_connect_error(error):
+    """determine if an error occurred before a request was sent"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError):
+        return False
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+class RetryPolicy:
+    """Decides whether and when to repeat a failed request"""
+
+    def __init__(self, retries=3, backoff=0.5, max_backoff=30,
+                 max_retry_after=120, statuses=RETRY_STATUSES):
+        """configures retries
+
+        :param retries: integer, maximum number of repeated attempts
+        :param backoff: number, delay (seconds) before the first retry;
+            the delay doubles with each attempt
+        :param max_backoff: number, maximum delay computed from backoff
+        :param max_retry_after: number, maximum delay requested by a server
+            that is honored (longer delays are not retried)
+        :param statuses: list of status codes that trigger a retry
+        """
+        self.retries = int(retries)
+        self.backoff = float(backoff)
+        self.max_backoff = float(max_backoff)
+        self.max_retry_after = float(max_retry_after)
+        self.statuses = tuple(statuses)
+
+    def retry_status(self, method, status, attempt):
+        """determine if a response status warrants another attempt"""
+        if attempt >= self.retries or status not in self.statuses:
+            return False
+        return method.upper() in IDEMPOTENT_METHODS or \
+            status in REJECTED_STATUSES
+
+    def retry_error(self, method, connect_error, attempt):
+        """determine if a connection error warrants another attempt
+
+        :param method: string, http method
+        :param connect_error: logical, True if the request was not sent
+        :param attempt: integer, number of attempts made so far, minus one
+        """
+        if attempt >= self.retries:
+            return False
+        return method.upper() in IDEMPOTENT_METHODS or connect_error
+
+    def delay(self, attempt, retry_after=None):
+        """number of seconds to wait before the next attempt
+
+        :param attempt: integer, number of retries made so far
+        :param retry_after: number of seconds requested by the server
+        :return: number of seconds, or None if the server asks for a delay
+            that is too long
+        """
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            return retry_after
+        limit = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return random.uniform(limit / 2, limit)
+
+
+class CircuitBreaker:
+    """Stops requests for a while after consecutive failures"""
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        """configures the breaker
+
+        :param threshold: integer, number of consecutive failures that open
+            the circuit (0: never open)
+        :param reset_timeout: number of seconds before a trial request is
+            allowed through an open circuit
+        """
+        self.threshold = int(threshold)
+        self.reset_timeout = float(reset_timeout)
+        self.failures = 0
+        self.open_until = None
+        self._lock = threading.Lock()
+
+    def check(self):
+        """raise an error if requests are currently not allowed"""
+        with self._lock:
+            if self.open_until is None:
+                return
+            if time.monotonic() < self.open_until:
+                raise ClientError("api unavailable after " +
+                                  str(self.failures) + " failed requests")
+            # half-open: let one trial request through
+            self.open_until = time.monotonic() + self.reset_timeout
+
+    def record(self, success):
+        """record the outcome of a request"""
+        with self._lock:
+            if success:
+                self.failures = 0
+                self.open_until = None
+                return
+            self.failures += 1
+            if 0 < self.threshold <= self.failures:
+                self.open_until = time.monotonic() + self.reset_timeout
@@ -0,0 +1,200 @@
+"""
+pooled http session shared by all objects that interface with the api
+"""
+
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from .retry import RetryPolicy, CircuitBreaker, parse_retry_after, \
+    is_connect_error
+from .tracing import add_phase, content_length, current_span
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Limits the rate of requests across all threads"""
+
+    def __init__(self, rate=0):
+        """spaces out requests evenly
+
+        :param rate: maximum number of requests per second (0: no limit)
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.next_time = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """block until the next request is allowed"""
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_time)
+            self.next_time = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class TimedConnectMixin:
+    """adds the duration of new connections to the span of the request"""
+
+    def connect(self):
+        start = time.monotonic()
+        try:
+            super().connect()
+        finally:
+            add_phase(current_span(), "connect", time.monotonic() - start)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = type("TimedHTTPConnection",
+                         (TimedConnectMixin, HTTPConnection), {})
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = type("TimedHTTPSConnection",
+                         (TimedConnectMixin, HTTPSConnection), {})
+
+
+class ApiSession:
+    """Pool of keep-alive connections shared by Api objects"""
+
+    def __init__(self, pool_size=10, keep_alive=60, responses=None,
+                 progress=None, rate=0, retry=None, breaker=None,
+                 tracer=None):
+        """manages a requests.Session with a bounded connection pool
+
+        :param pool_size: integer, maximum number of connections kept open
+            per host
+        :param keep_alive: number of seconds an idle connection may be kept
+            open and reused; use 0 to disable keep-alive
+        :param responses: ResponseCache object for GET requests, or None
+        :param progress: function reporting the progress of file uploads
+            (called with bytes sent and total bytes), or None
+        :param rate: maximum number of requests per second, shared by all
+            threads using the session (0: no limit)
+        :param retry: RetryPolicy object (if not specified, uses default
+            settings)
+        :param breaker: CircuitBreaker object (if not specified, uses
+            default settings)
+        :param tracer: Tracer object recording each request, or None
+        """
+        self.pool_size = int(pool_size)
+        self.keep_alive = float(keep_alive)
+        self.responses = responses
+        self.progress = progress
+        self.rate_limiter = RateLimiter(rate)
+        self.retry = RetryPolicy() if retry is None else retry
+        self.breaker = CircuitBreaker() if breaker is None else breaker
+        self.tracer = tracer
+        self.last_used = None
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size,
+                              pool_maxsize=self.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if tracer is not None:
+            adapter.poolmanager.pool_classes_by_scheme = {
+                "http": TimedHTTPConnectionPool,
+                "https": TimedHTTPSConnectionPool}
+        if self.keep_alive <= 0:
+            self.session.headers["Connection"] = "close"
+
+    def _expire_idle(self):
+        """drop pooled connections that have been idle for too long"""
+        now = time.monotonic()
+        with self._lock:
+            idle = self.last_used is not None and \
+                now - self.last_used > self.keep_alive
+            self.last_used = now
+        if idle and self.keep_alive > 0:
+            for adapter in self.session.adapters.values():
+                adapter.poolmanager.clear()
+
+    def _send(self, method, url, **kwargs):
+        """perform one attempt of an http request"""
+        self.breaker.check()
+        self.rate_limiter.wait()
+        self._expire_idle()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            self.breaker.record(False)
+            raise
+        self.breaker.record(response.status_code < 500)
+        return response
+
+    def request(self, method, url, **kwargs):
+        """perform an http request using a pooled connection
+
+        Failed requests are repeated according to the retry policy.
+
+        :param method: string, http method, e.g. GET or POST
+        :param url: string, full url
+        :return: requests.Response object, with the number of retries in
+            attribute retries
+        """
+        if self.tracer is None:
+            return self._retry(method, url, None, **kwargs)
+        span = self.tracer.start(method, url)
+        try:
+            response = self._retry(method, url, span, **kwargs)
+        except Exception as e:
+            self.tracer.finish(span, error=e)
+            raise
+        span["status"] = response.status_code
+        span["bytes_out"] = content_length(response.request.headers)
+        if kwargs.get("stream"):
+            span["bytes_in"] = content_length(response.headers)
+        else:
+            span["bytes_in"] = len(response.content)
+        self.tracer.finish(span)
+        return response
+
+    def _retry(self, method, url, span, **kwargs):
+        """perform attempts of an http request until one is final"""
+        attempt = 0
+        while True:
+            if span is not None:
+                span["retries"] = attempt
+            try:
+                response = self._send(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not self.retry.retry_error(method, is_connect_error(e),
+                                              attempt):
+                    raise
+                delay = self.retry.delay(attempt)
+                logger.info("retrying %s after error: %s", method, e)
+            else:
+                response.retries = attempt
+                add_phase(span, "ttfb", response.elapsed.total_seconds())
+                if not self.retry.retry_status(method, response.status_code,
+                                               attempt):
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                delay = self.retry.delay(attempt,
+                                         parse_retry_after(retry_after))
+                if delay is None:
+                    return response
+                logger.info("retrying %s after status %d", method,
+                            response.status_code)
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        """close all pooled connections"""
+        self.session.close()
@@ -0,0 +1,240 @@
+"""
+tracing of http requests performed through a session
+
+A Tracer creates one span per request (including its retries) and passes
+finished spans to sinks. Spans are dictionaries with:
+ - method, host, and endpoint (url path with identifiers replaced by {id})
+ - status, bytes_out and bytes_in (None when not known), retries, error
+ - start (seconds since the epoch)
+ - seconds: durations of phases, summed over attempts, i.e. dns and
+   connect (only for requests opening new connections), ttfb (until
+   response headers) and total
+
+Sinks:
+ - JsonLinesSink: one line of json per span, written as spans finish
+ - StatsSink: statistics for each method and endpoint
+ - OtlpJsonSink: spans in the OpenTelemetry protocol json format
+"""
+
+import json
+import logging
+import re
+import secrets
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+logger = logging.getLogger(__name__)
+
+
+TRACE_FORMATS = ("jsonl", "otlp")
+
+# path segments that identify objects: uuids, numbers and hex digests
+IDENTIFIER = re.compile(r"^(?:[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}"
+                        r"|[0-9]+(?:\.[0-9]+)*|[0-9a-f]{16,})$",
+                        re.IGNORECASE)
+
+# spans of requests performed by each thread (used by connection classes)
+_local = threading.local()
+
+
+def endpoint_template(url):
+    """path of a url, with segments identifying objects replaced by {id}"""
+    path = urlsplit(url).path
+    return "/".join("{id}" if IDENTIFIER.match(_) else _
+                    for _ in path.split("/"))
+
+
+def add_phase(span, phase, seconds):
+    """add the duration of a phase to a span"""
+    if span is not None:
+        span["seconds"][phase] = round(span["seconds"].get(phase, 0) +
+                                       seconds, 6)
+
+
+def content_length(headers):
+    """value of a Content-Length header, or None"""
+    try:
+        return int(headers["Content-Length"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def current_span():
+    """span of the request being performed by the current thread, if any"""
+    return getattr(_local, "span", None)
+
+
+class Tracer:
+    """Collects spans of http requests and passes them to sinks"""
+
+    def __init__(self, sinks=None):
+        """
+        :param sinks: list of objects with methods emit(span) and close()
+        """
+        self.sinks = [] if sinks is None else list(sinks)
+
+    def start(self, method, url):
+        """begin the span of a request, performed by the current thread"""
+        span = {"method": method, "host": urlsplit(url).netloc,
+                "endpoint": endpoint_template(url), "status": None,
+                "bytes_out": None, "bytes_in": None, "retries": 0,
+                "error": None, "start": time.time(), "seconds": dict(),
+                "_monotonic": time.monotonic()}
+        _local.span = span
+        return span
+
+    def finish(self, span, error=None):
+        """complete a span and pass it to the sinks
+
+        :param span: dictionary created by start
+        :param error: exception that ended the request, or None
+        """
+        if current_span() is span:
+            _local.span = None
+        if error is not None:
+            span["error"] = type(error).__name__ + ": " + str(error)
+        add_phase(span, "total", time.monotonic() - span.pop("_monotonic"))
+        for sink in self.sinks:
+            sink.emit(span)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class JsonLinesSink:
+    """Writes spans to a file, one line of json per span"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def emit(self, span):
+        line = json.dumps(span, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class StatsSink:
+    """Aggregates spans for each method and endpoint
+
+    A summary is logged (INFO) when the sink is closed.
+    """
+
+    def __init__(self):
+        self.stats = dict()
+        self._lock = threading.Lock()
+
+    def emit(self, span):
+        key = (span["method"], span["endpoint"])
+        with self._lock:
+            if key not in self.stats:
+                self.stats[key] = {"method": key[0], "endpoint": key[1],
+                                   "requests": 0, "errors": 0, "retries": 0,
+                                   "seconds": 0, "max_seconds": 0,
+                                   "bytes_out": 0, "bytes_in": 0}
+            stats = self.stats[key]
+            seconds = span["seconds"]["total"]
+            stats["requests"] += 1
+            stats["errors"] += span["error"] is not None or \
+                (span["status"] or 0) >= 500
+            stats["retries"] += span["retries"]
+            stats["seconds"] = round(stats["seconds"] + seconds, 6)
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["bytes_out"] += span["bytes_out"] or 0
+            stats["bytes_in"] += span["bytes_in"] or 0
+
+    def summary(self):
+        """statistics for each method and endpoint, by decreasing time"""
+        with self._lock:
+            stats = [dict(_) for _ in self.stats.values()]
+        return sorted(stats, key=lambda _: -_["seconds"])
+
+    def close(self):
+        for stats in self.summary():
+            logger.info("trace: %s %s requests=%d errors=%d retries=%d "
+                        "seconds=%.3f max_seconds=%.3f", stats["method"],
+                        stats["endpoint"], stats["requests"],
+                        stats["errors"], stats["retries"], stats["seconds"],
+                        stats["max_seconds"])
+
+
+def _attribute(key, value):
+    """attribute in the OpenTelemetry json format"""
+    if type(value) is int:
+        return {"key": key, "value": {"intValue": str(value)}}
+    if type(value) is float:
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class OtlpJsonSink:
+    """Writes spans as OpenTelemetry trace data (OTLP/JSON) when closed
+
+    All spans belong to one trace, and the file can be sent as is to the
+    /v1/traces endpoint of an OpenTelemetry collector.
+    """
+
+    def __init__(self, path, service="cap_client"):
+        self.path = path
+        self.service = service
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def emit(self, span):
+        start = int(span["start"] * 1e9)
+        end = start + int(span["seconds"]["total"] * 1e9)
+        attributes = [("http.request.method", span["method"]),
+                      ("server.address", span["host"]),
+                      ("url.template", span["endpoint"]),
+                      ("http.response.status_code", span["status"]),
+                      ("http.request.body.size", span["bytes_out"]),
+                      ("http.response.body.size", span["bytes_in"]),
+                      ("http.request.resend_count", span["retries"])]
+        attributes += [("cap_client.seconds." + k, float(v))
+                       for k, v in span["seconds"].items()]
+        failed = span["error"] is not None or (span["status"] or 0) >= 400
+        otlp_span = {
+            "traceId": self.trace_id,
+            "spanId": secrets.token_hex(8),
+            "name": span["method"] + " " + span["endpoint"],
+            "kind": 3,
+            "startTimeUnixNano": str(start),
+            "endTimeUnixNano": str(end),
+            "attributes": [_attribute(k, v) for k, v in attributes
+                           if v is not None],
+            "status": {"code": 2, "message": span["error"] or ""}
+            if failed else {"code": 0}
+        }
+        with self._lock:
+            self.spans.append(otlp_span)
+
+    def close(self):
+        data = {"resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name",
+                                                   self.service)]},
+            "scopeSpans": [{"scope": {"name": "cap_client.tracing"},
+                            "spans": self.spans}]
+        }]}
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+
+
+def open_tracer(path, trace_format="jsonl"):
+    """tracer writing spans into a file and logging statistics
+
+    :param path: string, path to the trace file
+    :param trace_format: string, one of TRACE_FORMATS
+    :return: Tracer object
+    """
+    sink = OtlpJsonSink(path) if trace_format == "otlp" \
+        else JsonLinesSink(path)
+    return Tracer([sink, StatsSink()])
@@ -4,17 +4,58 @@ validation of command-line arguments
 
 import getpass
 import logging
-from os.path import isdir, isfile, basename
+from os.path import abspath, dirname, isdir, isfile, basename
 from .errors import ValidationError
 
 
+logger = logging.getLogger(__name__)
+
+
 def validate_config(config):
     if "file" in config and config.file is not None:
         if not isfile(config.file):
             raise ValidationError("file does not exist: "+str(config.file))
+    if "manifest" in config and config.manifest is not None:
+        if not isfile(config.manifest):
+            raise ValidationError("manifest does not exist: " +
+                                  str(config.manifest))
+    if "trace" in config and config.trace is not None:
+        if not isdir(dirname(abspath(config.trace))):
+            raise ValidationError("directory for trace file does not exist: "
+                                  + str(config.trace))
     if "dir" in config and config.dir is not None:
         if not isdir(config.dir):
             raise ValidationError("directory does not exist: "+str(config.dir))
+    if "pool_size" in config and config.pool_size < 1:
+        raise ValidationError("pool size must be positive")
+    if "jobs" in config and config.jobs < 1:
+        raise ValidationError("number of jobs must be positive")
+    if "jobs" in config and "pool_size" in config:
+        # one pooled connection for each concurrent job
+        config.pool_size = max(config.pool_size, config.jobs)
+    if "page_size" in config and config.page_size < 1:
+        raise ValidationError("page size must be positive")
+    if "rate" in config and config.rate < 0:
+        raise ValidationError("rate must not be negative")
+    if "retries" in config and config.retries < 0:
+        raise ValidationError("retries must not be negative")
+    if "backoff" in config and config.backoff < 0:
+        raise ValidationError("backoff must not be negative")
+    if "sleep" in config and config.sleep < 0:
+        raise ValidationError("sleep must not be negative")
+    for name in ["interval", "max_interval"]:
+        if name in config and getattr(config, name) <= 0:
+            raise ValidationError(name + " must be positive")
+    if "timeout" in config and config.timeout < 0:
+        raise ValidationError("timeout must not be negative")
+    if "offline" in config and config.offline and config.no_cache:
+        raise ValidationError("offline mode requires the cache")
+    if "cache_ttl" in config and config.cache_ttl is not None:
+        for item in config.cache_ttl:
+            try:
+                float(item.rpartition("=")[2])
+            except ValueError:
+                raise ValidationError("invalid cache ttl: " + str(item))
     if not config.api.endswith("/"):
         config.api += "/"
     if not config.api.startswith("http"):
@@ -62,11 +103,11 @@ def validate_naming(header, file_path):
     """
     file_basename = basename(file_path)
     if header["name"].replace(".", "-") not in file_basename.replace(".", "-"):
-        logging.warning("file name and document name do not overlap:")
-        logging.warning("file name: " + file_path)
-        logging.warning("document name: " + header["name"])
+        logger.warning("file name and document name do not overlap:")
+        logger.warning("file name: %s", file_path)
+        logger.warning("document name: %s", header["name"])
     if str(header["version"]) not in file_basename:
-        logging.warning("file name and document version do not overlap:")
-        logging.warning("file name: " + file_path)
-        logging.warning("document version: " + str(header["version"]))
+        logger.warning("file name and document version do not overlap:")
+        logger.warning("file name: %s", file_path)
+        logger.warning("document version: %s", header["version"])
     return header
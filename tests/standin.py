@@ -0,0 +1,62 @@
+"""
+Local stand-in servers for tests performing requests to the api
+"""
+
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cap_client.credentials import CredentialsManager
+from cap_client.session import ApiSession
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """base for request handlers of stand-in servers"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def send_body(self, status, body, headers=None):
+        """send a response with a body (bytes, or data encoded as json)"""
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        for k, v in (headers or dict()).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInTestCase(unittest.TestCase):
+    """runs a stand-in server during each test
+
+    Subclasses set handler to a request handler class. Attributes used by
+    the handler are set on self.server after StandInTestCase.setUp.
+    """
+
+    handler = StandInHandler
+
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self.url = "http://127.0.0.1:" + str(self.server.server_port)
+        threading.Thread(target=self.server.serve_forever, args=(0.05,),
+                         daemon=True).start()
+        # cleanups run in reverse order
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def make_credentials(self, session=None):
+        """credentials of user abc with a session (by default a new
+        ApiSession), which is closed after the test"""
+        session = ApiSession() if session is None else session
+        self.addCleanup(session.close)
+        return CredentialsManager("abc", "nonexistent.yaml", token="abc",
+                                  session=session)
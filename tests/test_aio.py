@@ -0,0 +1,151 @@
+"""
+Tests for the asyncio api interfaces, using a local stand-in server
+"""
+
+import asyncio
+import json
+import tempfile
+import threading
+import time
+import unittest
+from os.path import join
+from cap_client.tracing import StatsSink, Tracer
+from tests.standin import StandInHandler, StandInTestCase
+
+try:
+    import aiohttp
+    from cap_client.aio import AsyncApiSession, AsyncAssignment, AsyncDoc
+except ImportError:
+    aiohttp = None
+
+
+class AsyncStandInHandler(StandInHandler):
+    """minimal stand-in for assignment, data and document endpoints"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+        if self.path.startswith("/static/"):
+            self.send_body(200, server.static[self.path[8:]])
+            return
+        if self.path.startswith("/data/list/"):
+            data = server.datafiles
+        elif self.path.startswith("/assignment/view/"):
+            data = {"uuid": self.path.split("/")[-1], "status": "generated"}
+        elif self.path.startswith("/blog/update/"):
+            data = {"uuid": "doc-uuid"}
+        else:
+            data = {"detail": "not found"}
+        self.send_body(200, data)
+
+    def do_POST(self):
+        body = self.read_body()
+        server = self.server
+        server.posts.append((self.path, self.headers["Content-Type"], body))
+        self.send_body(200, {"uuid": "new-uuid", "length": len(body)})
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class AsyncApiTests(StandInTestCase, unittest.IsolatedAsyncioTestCase):
+    """awaitable interfaces sharing endpoint logic with the sync classes"""
+
+    handler = AsyncStandInHandler
+
+    def setUp(self):
+        super().setUp()
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.server.lock = threading.Lock()
+        self.server.active, self.server.max_active = 0, 0
+        self.server.delay = 0
+        self.server.posts = []
+        self.server.static = {"a/x_1.txt": b"one" * 1000,
+                              "a/x_2.txt": b"two" * 1000}
+        self.server.datafiles = [
+            {"uuid": "f1", "file_role": "primary", "path": "a/x_1.txt",
+             "file_name": "x_1.txt"},
+            {"uuid": "f2", "file_role": "response", "path": "a/x_2.txt",
+             "file_name": "x_2.txt"}]
+        self.credentials = self.make_credentials()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    async def test_view_many(self):
+        """concurrent requests should respect the per-host limit"""
+        self.server.delay = 0.05
+        async with AsyncApiSession(limit_per_host=3) as session:
+            assignment = AsyncAssignment(self.url, self.credentials,
+                                         session=session)
+            uuids = ["a" + str(i) for i in range(9)]
+            result = await asyncio.gather(*[assignment.view(_)
+                                            for _ in uuids])
+        self.assertEqual([_["uuid"] for _ in result], uuids)
+        self.assertLessEqual(self.server.max_active, 3)
+        self.assertGreater(self.server.max_active, 1)
+
+    async def test_download(self):
+        async with AsyncApiSession() as session:
+            assignment = AsyncAssignment(self.url, self.credentials,
+                                         session=session)
+            result = await assignment.download("abc",
+                                               data_dir=self.tempdir.name,
+                                               jobs=2)
+        self.assertEqual([_["_bytes"] for _ in result], [3000, 3000])
+        with open(join(self.tempdir.name, "x_2.txt"), "rb") as f:
+            self.assertEqual(f.read(), b"two" * 1000)
+
+    async def test_upload_and_remove(self):
+        """shared methods should return awaitable results"""
+        file_path = join(self.tempdir.name, "response.txt")
+        with open(file_path, "w") as f:
+            f.write("response content")
+        async with AsyncApiSession() as session:
+            assignment = AsyncAssignment(self.url, self.credentials,
+                                         session=session)
+            upload = await assignment.upload("abc", file_path)
+            remove = await assignment.remove("abc")
+        self.assertEqual(upload["uuid"], "new-uuid")
+        self.assertTrue(b"response content" in self.server.posts[0][2])
+        self.assertTrue("multipart" in self.server.posts[0][1])
+        self.assertEqual(self.server.posts[1][0], "/data/delete/")
+        self.assertEqual(remove["uuid"], "new-uuid")
+
+    async def test_doc_update(self):
+        doc_path = join(self.tempdir.name, "intro_v1.md")
+        with open(doc_path, "w") as f:
+            f.write("---\nname: intro\nversion: 1\ncollection: blog\n")
+            f.write("support:\n- x_1.txt\n---\n\n![image](x_1.txt)\n")
+        async with AsyncApiSession() as session:
+            doc = AsyncDoc(self.url, self.credentials, session=session)
+            result = await doc.update(doc_path, "blog")
+            invalid = await doc.update(join("tests", "testdata",
+                                            "doc_no_header.md"), "blog")
+        self.assertEqual(result["_file"], doc_path)
+        path, content_type, body = self.server.posts[0]
+        self.assertEqual(path, "/blog/update/doc-uuid/")
+        self.assertTrue("/static/a/x_1.txt" in json.loads(body)["content"])
+        self.assertTrue("_exception" in invalid)
+
+    async def test_trace(self):
+        stats = StatsSink()
+        async with AsyncApiSession(tracer=Tracer([stats])) as session:
+            assignment = AsyncAssignment(self.url, self.credentials,
+                                         session=session)
+            await assignment.view("abc")
+            await assignment.view("def")
+        self.assertEqual(sorted((_["endpoint"], _["requests"], _["errors"])
+                                for _ in stats.summary()),
+                         [("/assignment/view/abc", 1, 0),
+                          ("/assignment/view/def", 1, 0)])
+
+    async def test_iter_pages(self):
+        async with AsyncApiSession() as session:
+            assignment = AsyncAssignment(self.url, self.credentials,
+                                         session=session)
+            result = [_ async for _ in assignment.datafile.iter("abc")]
+        self.assertEqual([_["uuid"] for _ in result], ["f1", "f2"])
@@ -0,0 +1,65 @@
+"""
+Tests for running an action over many files
+"""
+
+import time
+import unittest
+from cap_client.batch import map_files
+from cap_client.errors import ClientError
+from cap_client.session import RateLimiter
+
+
+def slow_action(file_path, collection=None, action=None):
+    """action that takes longer for files early in the list"""
+    time.sleep(0.05 / (1 + int(file_path[-4])))
+    if file_path.startswith("bad"):
+        raise ClientError("bad file")
+    if file_path.startswith("broken"):
+        raise KeyError("uuid")
+    return {"_file": file_path, "collection": collection, "action": action}
+
+
+class MapFilesTests(unittest.TestCase):
+    """ordering and error handling when processing many files"""
+
+    def test_order_is_preserved(self):
+        files = ["doc_" + str(i) + ".md" for i in range(8)]
+        result = list(map_files(slow_action, files, jobs=4,
+                                collection="blog", action="publish"))
+        self.assertEqual([_["_file"] for _ in result], files)
+        self.assertEqual(result[0]["collection"], "blog")
+        self.assertEqual(result[0]["action"], "publish")
+
+    def test_sequential_and_parallel_agree(self):
+        files = ["doc_" + str(i) + ".md" for i in range(5)]
+        sequential = list(map_files(slow_action, files, jobs=1))
+        parallel = list(map_files(slow_action, files, jobs=5))
+        self.assertEqual(sequential, parallel)
+
+    def test_errors_are_captured(self):
+        """errors for one file should not stop processing other files"""
+        files = ["doc_1.md", "bad_2.md", "broken_3.md", "doc_4.md"]
+        with self.assertLogs(level="ERROR"):
+            result = list(map_files(slow_action, files, jobs=2))
+        self.assertEqual(result[1], {"_file": "bad_2.md",
+                                     "_exception": "bad file"})
+        self.assertTrue("uuid" in result[2]["_exception"])
+        self.assertEqual(result[3]["_file"], "doc_4.md")
+
+
+class RateLimiterTests(unittest.TestCase):
+    """spacing out requests"""
+
+    def test_rate(self):
+        limiter = RateLimiter(rate=100)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_no_limit(self):
+        limiter = RateLimiter(rate=0)
+        start = time.monotonic()
+        for _ in range(1000):
+            limiter.wait()
+        self.assertLess(time.monotonic() - start, 0.05)
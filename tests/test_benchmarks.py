@@ -0,0 +1,47 @@
+"""
+Tests for the benchmark harness (stand-in api and comparison of results)
+"""
+
+import tempfile
+import unittest
+from benchmarks.bench_docs import slope
+from benchmarks.common import client
+from benchmarks.mock_server import MockApi
+from benchmarks.run import compare
+from cap_client.assignments import Assignment
+
+
+class MockApiTests(unittest.TestCase):
+
+    def test_download(self):
+        """data files should be served, also after transient errors"""
+        with MockApi(files=3, file_size=1000, error_rate=0.2) as api, \
+                tempfile.TemporaryDirectory() as tempdir:
+            assignment = client(api, Assignment, retries=10)
+            result = assignment.download("a0", data_dir=tempdir, jobs=2)
+            assignment.session.close()
+        self.assertEqual([_["_bytes"] for _ in result], [1000] * 3)
+        self.assertTrue(api.requests["GET /static/a0"] >= 3)
+
+
+class CompareTests(unittest.TestCase):
+
+    def test_regressions(self):
+        baseline = [{"benchmark": "list", "case": "a", "seconds": 1.0},
+                    {"benchmark": "list", "case": "b", "seconds": 1.0},
+                    {"benchmark": "list", "case": "c", "seconds": 0.001}]
+        results = [{"benchmark": "list", "case": "a", "seconds": 1.2},
+                   {"benchmark": "list", "case": "b", "seconds": 1.5},
+                   {"benchmark": "list", "case": "c", "seconds": 0.005},
+                   {"benchmark": "list", "case": "d", "seconds": 9.0}]
+        regressions = compare(results, baseline, tolerance=0.25)
+        self.assertEqual([_["case"] for _ in regressions], ["b"])
+
+
+class SlopeTests(unittest.TestCase):
+
+    def test_slope(self):
+        sizes = [100, 200, 400, 800]
+        self.assertAlmostEqual(slope(sizes, [_ * 1e-6 for _ in sizes]), 1)
+        self.assertAlmostEqual(slope(sizes, [_ ** 2 * 1e-9 for _ in sizes]),
+                               2)
@@ -0,0 +1,70 @@
+"""
+Tests for running many commands in one process
+"""
+
+import argparse
+import io
+import json
+import unittest
+from cap_client.commands import parse_command, run_commands
+from cap_client.errors import ClientError, ValidationError
+
+
+def make_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--api", action="store", default="https://a.b")
+    parser.add_argument("--token", action="store", default=None)
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    sp_view = subparsers.add_parser("view")
+    sp_view.add_argument("--uuid", action="store", required=True)
+    sp_view.add_argument("--jobs", action="store", type=int, default=1)
+    subparsers.add_parser("batch")
+    return parser
+
+
+class CommandTests(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = make_parser()
+        self.config = self.parser.parse_args(["--token", "abc", "batch"])
+
+    def test_parse_command(self):
+        """global options should be kept, action options parsed"""
+        command = parse_command(self.parser, "view --uuid 'a b' --jobs 2",
+                                self.config)
+        self.assertEqual(command.token, "abc")
+        self.assertEqual(command.uuid, "a b")
+        self.assertEqual(command.jobs, 2)
+        self.assertEqual(self.config.action, "batch")
+        self.assertFalse("uuid" in self.config)
+
+    def test_invalid_commands(self):
+        for line in ["view", "other", "view --uuid 'a", "batch"]:
+            with self.assertRaises(ValidationError):
+                parse_command(self.parser, line, self.config)
+
+    def test_global_options(self):
+        """global options apply to all commands and cannot be changed"""
+        for line in ["--token def view --uuid a", "--tok=def view --uuid a"]:
+            with self.assertRaises(ValidationError) as cm:
+                parse_command(self.parser, line, self.config)
+            self.assertTrue("global options" in cm.exception.message)
+
+    def test_run_commands(self):
+        """each command should produce one line of output"""
+        def handle(command):
+            if command.uuid == "missing":
+                raise ClientError("not found")
+            return {"uuid": command.uuid}
+
+        lines = ["view --uuid a\n", "\n", "# comment\n",
+                 "view --uuid missing\n", "view --uuid b\n"]
+        output = io.StringIO()
+        failed = run_commands(self.parser, self.config, handle, lines,
+                              output=output)
+        results = [json.loads(_) for _ in output.getvalue().splitlines()]
+        self.assertEqual(failed, 1)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0], {"uuid": "a"})
+        self.assertEqual(results[1]["_exception"], "not found")
+        self.assertEqual(results[2], {"uuid": "b"})
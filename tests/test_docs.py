@@ -2,9 +2,15 @@
 Tests for reading files in formats used by the client
 """
 
+import tempfile
 import unittest
-from os.path import join
-from cap_client.docs import read_header_content as read_hc
+from os.path import exists, join
+from cap_client.credentials import CredentialsManager
+from unittest import mock
+from cap_client import docs
+from cap_client.docs import Doc, inject_context, inject_support, \
+    read_header_content as read_hc
+from cap_client.manifest import MANIFEST_NAME
 
 
 # directory with test data files
@@ -38,3 +44,273 @@ class HeaderContentTests(unittest.TestCase):
 
         with self.assertRaises(Exception):
             read_hc(join(data_dir, "doc_empty_line.md"))
+
+    def read_text(self, text):
+        """header and content of a file written with some text"""
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = join(tempdir, "doc.md")
+            with open(path, "wb") as f:
+                f.write(text.encode())
+            return read_hc(path)
+
+    def test_newlines(self):
+        """windows and old mac line endings are read as newlines"""
+
+        for newline in ("\r\n", "\r"):
+            text = newline.join(["---", "title: a", "---", "", "b", "c", ""])
+            header, content = self.read_text(text)
+            self.assertEqual(header, {"title": "a"})
+            self.assertEqual(content, "b\nc")
+
+    def test_separator_in_body(self):
+        """lines starting with --- in the body are content"""
+
+        header, content = self.read_text("---\ntitle: a\n---\nb\n---\n")
+        self.assertEqual(content, "b\n---")
+
+    def test_errors(self):
+        """messages of errors are kept for all file sizes"""
+
+        texts = {"title: a\n---\n": "first line should start with ---",
+                 "---\ntitle: a\n\n---\nb": "empty line in header",
+                 "---\ntitle: a\n": "no content", "": "no content"}
+        for threshold in (docs.MMAP_THRESHOLD, 1):
+            with mock.patch.object(docs, "MMAP_THRESHOLD", threshold):
+                for text, message in texts.items():
+                    with self.assertRaises(Exception) as context:
+                        self.read_text(text)
+                    self.assertEqual(context.exception.message, message)
+
+    def test_mapped(self):
+        """large files are read from a mapping with the same result"""
+
+        body = "\n".join("line " + str(i) + " é" for i in range(20000))
+        text = "---\ntitle: a\n---\n\n" + body + "\r\n  \n"
+        with mock.patch.object(docs, "MMAP_THRESHOLD", len(text) * 2):
+            small = self.read_text(text)
+        with mock.patch("mmap.mmap", wraps=docs.mmap.mmap) as mapped:
+            large = self.read_text(text)
+        self.assertEqual(mapped.call_count, 1)
+        self.assertEqual(large, small)
+        self.assertEqual(large, ({"title": "a"}, body))
+
+
+class InjectContextTests(unittest.TestCase):
+    """replacing placeholders by values and file content"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        with open(join(self.tempdir.name, "intro.md"), "w") as f:
+            f.write("\nIntro text with {b}\n")
+        self.context = {"a": "alpha", "b": "beta", "intro": "intro.md"}
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_placeholders(self):
+        content = "{a} {intro} {a} {unknown} {b}"
+        result = inject_context(content, self.context, dir=self.tempdir.name)
+        # inserted text is not searched for placeholders
+        self.assertEqual(result, "alpha Intro text with {b} alpha "
+                                 "{unknown} beta")
+
+    def test_exact_match(self):
+        """content equal to a key should be replaced by its value"""
+        result = inject_context([" intro\n", "b", "a b"], self.context,
+                                dir=self.tempdir.name)
+        self.assertEqual(result, ["Intro text with {b}", "beta", "a b"])
+
+    def test_memo(self):
+        """context files should be read once while unchanged"""
+        memo = dict()
+        content = "{intro}\n{intro}"
+        inject_context(content, self.context, dir=self.tempdir.name,
+                       memo=memo)
+        self.assertEqual(len(memo), 1)
+        key = list(memo)[0]
+        memo[key] = "from memo"
+        result = inject_context(content, self.context,
+                                dir=self.tempdir.name, memo=memo)
+        self.assertEqual(result, "from memo\nfrom memo")
+
+
+class InjectSupportTests(unittest.TestCase):
+    """replacing names of support files by urls"""
+
+    def setUp(self):
+        self.file_list = [
+            {"file_name": "a.png", "path": "x/a.png"},
+            {"file_name": "aa.png", "path": "x/aa.png"},
+            {"file_name": "a.png", "path": "y/a.png"},
+            {"file_name": "other.png", "path": "x/other.png"}]
+        self.support = ["a.png", "aa.png"]
+
+    def inject(self, content):
+        return inject_support(content, self.support, self.file_list,
+                              "https://api")
+
+    def test_link_targets(self):
+        content = "![a](a.png) [aa](./aa.png \"title\") <img src='a.png'>" \
+                  "\n[ref]: aa.png\n<a href=aa.png>"
+        self.assertEqual(self.inject(content),
+                         "![a](https://api/static/x/a.png) "
+                         "[aa](https://api/static/x/aa.png \"title\") "
+                         "<img src='https://api/static/x/a.png'>\n"
+                         "[ref]: https://api/static/x/aa.png\n"
+                         "<a href=https://api/static/x/aa.png>")
+
+    def test_other_text(self):
+        """names outside link targets, and other files, are unchanged"""
+        content = "see a.png and aa.png, ![o](other.png), ![b](ba.png)"
+        self.assertEqual(self.inject(content), content)
+
+
+class RecordingDoc(Doc):
+    """document interface that records requests instead of sending them"""
+
+    def __init__(self):
+        credentials = CredentialsManager("abc", "nonexistent.yaml",
+                                         token="abc")
+        super().__init__("https://api.captest.io", credentials)
+        self.requests = []
+        self.file_list = []
+        # documents in the collection listing (None: no listing endpoint)
+        self.documents = [{"uuid": "doc-uuid", "name": "intro",
+                           "version": "1"}]
+
+    def get(self, url):
+        self.requests.append(("GET", url))
+        if url.startswith("/data/list/"):
+            return self.file_list
+        if url.startswith("/blog/list/"):
+            if self.documents is None:
+                return {"detail": "not found"}
+            return self.documents if "page=1&" in url else []
+        return {"uuid": "doc-uuid"}
+
+    def post(self, url, body):
+        self.requests.append(("POST", url))
+        return {"uuid": "doc-uuid", "content": body["content"]}
+
+
+class IncrementalPublishTests(unittest.TestCase):
+    """skipping documents that have not changed since the last update"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.doc_path = join(self.tempdir.name, "intro.md")
+        self.write_doc("Content with {value}.")
+        with open(join(self.tempdir.name, "value.txt"), "w") as f:
+            f.write("a value")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write_doc(self, content, support=""):
+        with open(self.doc_path, "w") as f:
+            f.write("---\nname: intro\nversion: 1\ncollection: blog\n")
+            f.write("context:\n  value: value.txt\n" + support)
+            f.write("---\n\n" + content + "\n")
+
+    def publish(self, doc=None, force=False):
+        doc = RecordingDoc() if doc is None else doc
+        result = doc.update(self.doc_path, "blog", force=force)
+        doc.save_manifests()
+        return doc, result
+
+    def test_skip_unchanged(self):
+        """a second update without changes should not contact the api"""
+        self.publish()
+        self.assertTrue(exists(join(self.tempdir.name, MANIFEST_NAME)))
+        doc, result = self.publish()
+        self.assertEqual(result["detail"], "unchanged")
+        self.assertEqual(doc.requests, [])
+
+    def test_force(self):
+        """force should send unchanged documents"""
+        self.publish()
+        doc, result = self.publish(force=True)
+        self.assertEqual(result["content"], "Content with a value.")
+        self.assertEqual(len(doc.requests), 3)
+
+    def test_changed_body(self):
+        self.publish()
+        self.write_doc("New content.")
+        doc, result = self.publish()
+        self.assertEqual(result["content"], "New content.")
+
+    def test_changed_context_file(self):
+        """changes in files used through the context should be detected"""
+        self.publish()
+        with open(join(self.tempdir.name, "value.txt"), "w") as f:
+            f.write("another value")
+        doc, result = self.publish()
+        self.assertEqual(result["content"], "Content with another value.")
+
+    def test_missing_support_files_not_recorded(self):
+        """documents with support files not yet uploaded are resent"""
+        self.write_doc("![image](image.png)",
+                       support="support:\n- image.png\n")
+        self.publish()
+        doc = RecordingDoc()
+        doc.file_list = [{"file_name": "image.png", "path": "x/image.png"}]
+        doc, result = self.publish(doc)
+        self.assertTrue("static/x/image.png" in result["content"])
+        doc, result = self.publish(doc)
+        self.assertEqual(result["detail"], "unchanged")
+
+
+class DocUuidTests(unittest.TestCase):
+    """resolving document uuids once per run"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i in range(3):
+            self.paths.append(join(self.tempdir.name, "d" + str(i) + ".md"))
+            with open(self.paths[-1], "w") as f:
+                f.write("---\nname: d" + str(i) + "\nversion: 1\n")
+                f.write("collection: blog\ndatafile: x.csv\n")
+                f.write("datafile_source: x\ndatafile_license: x\n")
+                f.write("support:\n- image.png\n---\n\nContent\n")
+        self.doc = RecordingDoc()
+        self.doc.documents = [{"uuid": "uuid-" + str(i), "name": "d" + str(i),
+                               "version": "1"} for i in range(3)]
+        self.doc.file_list = [{"file_name": "image.png",
+                               "path": "x/image.png"}]
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def gets(self, prefix):
+        return [_ for _ in self.doc.requests if _[0] == "GET" and
+                _[1].startswith(prefix)]
+
+    def test_listing(self):
+        """uuids of all documents should come from one listing"""
+        results = [self.doc.update(_, "blog", force=True) for _ in self.paths]
+        self.assertEqual([_["uuid"] for _ in results], ["doc-uuid"] * 3)
+        self.assertEqual(len(self.gets("/blog/list/")), 1)
+        self.assertEqual(self.gets("/blog/update/"), [])
+        self.assertEqual(self.doc.doc_uuid("blog", "d2/1"), "uuid-2")
+        self.assertEqual(self.doc.doc_uuid("blog", "new/1"), "doc-uuid")
+        self.assertEqual(self.gets("/blog/update/"),
+                         [("GET", "/blog/update/new/1")])
+
+    def test_no_listing(self):
+        """without a listing, each document should be looked up once"""
+        self.doc.documents = None
+        for path in self.paths + self.paths:
+            self.doc.update(path, "blog", force=True)
+        self.assertEqual(len(self.gets("/blog/list/")), 1)
+        self.assertEqual(len(self.gets("/blog/update/")), 3)
+
+    def test_upload(self):
+        """uploads should use the uuid of the document, and the data files
+        of the document should be listed once"""
+        self.doc.datafile.upload = lambda path, **kwargs: \
+            {"uuid": kwargs["parent_uuid"]}
+        result = self.doc.upload(self.paths[0], "blog")
+        self.assertEqual(result["_primary"]["uuid"], "uuid-0")
+        self.assertEqual(result["_support"][0]["detail"], "exists")
+        self.assertEqual(len(self.gets("/data/list/")), 1)
@@ -0,0 +1,255 @@
+"""
+Tests for downloading data files from a local stand-in server
+"""
+
+import hashlib
+import os
+import tempfile
+from os.path import exists, join
+from cap_client.cache import DownloadCache
+from cap_client.downloads import download_file, download_files
+from cap_client.session import ApiSession
+from tests.standin import StandInHandler, StandInTestCase
+
+
+class RangeHandler(StandInHandler):
+    """serves in-memory files, supporting Range requests
+
+    server.contents maps url paths to bytes; server.truncate maps url paths
+    to a number of bytes after which the next response is cut short.
+    Responses have an ETag derived from the content, and ranges are
+    ignored when If-Range does not match it.
+    """
+
+    def do_GET(self):
+        data = self.server.contents.get(self.path)
+        if data is None:
+            self.send_body(404, b"")
+            return
+        start = 0
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        range_header = self.headers.get("Range")
+        if self.headers.get("If-Range", etag) != etag:
+            range_header = None
+        if range_header is not None and self.server.ranges:
+            start = int(range_header.split("=")[1].split("-")[0])
+            if start >= len(data):
+                self.send_body(416, b"", {
+                    "Content-Range": "bytes */" + str(len(data))})
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes " + str(start) + "-" +
+                             str(len(data) - 1) + "/" + str(len(data)))
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+        self.server.requests.append((self.path, start))
+        cut = self.server.truncate.pop(self.path, None)
+        if cut is not None:
+            self.wfile.write(data[start:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(data[start:])
+
+
+class FileServerTestCase(StandInTestCase):
+    """runs a local stand-in server for static files"""
+
+    handler = RangeHandler
+
+    def setUp(self):
+        super().setUp()
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        self.contents = dict()
+        for i in range(6):
+            name = "file_" + str(i) + ".txt"
+            self.contents[name] = ("line " + str(i) + "\n") * (i * 1000 + 1)
+        self.server.contents = {"/" + k: v.encode()
+                                for k, v in self.contents.items()}
+        self.large = bytes(range(256)) * 1000
+        self.server.contents["/large.bin"] = self.large
+        self.server.truncate = dict()
+        self.server.requests = []
+        self.server.ranges = True
+        self.session = ApiSession(pool_size=4)
+        self.addCleanup(self.session.close)
+
+    def items(self):
+        return [(self.url + "/" + name, join(self.data_dir.name, name))
+                for name in sorted(self.contents)]
+
+
+class DownloadTests(FileServerTestCase):
+    """downloading several files with a pool of workers"""
+
+    def test_download_sequential(self):
+        """a single worker should download all files"""
+        result = download_files(self.session, self.items(), jobs=1)
+        self.assertEqual(len(result), 6)
+        for (url, path), summary in zip(self.items(), result):
+            expected = self.contents[url.split("/")[-1]]
+            with open(path, "r") as f:
+                self.assertEqual(f.read(), expected)
+            self.assertEqual(summary["_bytes"], len(expected))
+
+    def test_download_parallel_keeps_order(self):
+        """summaries should be returned in the same order as the items"""
+        result = download_files(self.session, self.items(), jobs=4)
+        expected = [len(self.contents[_]) for _ in sorted(self.contents)]
+        self.assertEqual([_["_bytes"] for _ in result], expected)
+        self.assertTrue(all(_["_seconds"] >= 0 for _ in result))
+
+    def test_download_missing_file(self):
+        """a failed download should be reported, not raised"""
+        items = [(self.url + "/missing.txt",
+                  join(self.data_dir.name, "missing.txt"))]
+        result = download_files(self.session, items, jobs=2)
+        self.assertTrue("404" in result[0]["_exception"])
+
+    def test_download_nothing(self):
+        self.assertEqual(download_files(self.session, [], jobs=4), [])
+
+
+class ResumeDownloadTests(FileServerTestCase):
+    """interrupted transfers and partial files"""
+
+    def setUp(self):
+        super().setUp()
+        self.large_url = self.url + "/large.bin"
+        self.large_path = join(self.data_dir.name, "large.bin")
+
+    def read_large(self):
+        with open(self.large_path, "rb") as f:
+            return f.read()
+
+    def test_resume_interrupted_transfer(self):
+        """a transfer cut short should resume from where it stopped"""
+        self.server.truncate["/large.bin"] = 200000
+        result = download_file(self.session, self.large_url, self.large_path)
+        self.assertEqual(self.read_large(), self.large)
+        self.assertGreater(result["_resumed"], 0)
+        self.assertEqual(self.server.requests[-1],
+                         ("/large.bin", result["_resumed"]))
+        self.assertFalse(exists(self.large_path + ".part"))
+
+    def test_no_partial_file_under_final_name(self):
+        """a failed transfer should leave only a .part file"""
+        self.server.truncate["/large.bin"] = 200000
+        with self.assertRaises(Exception):
+            download_file(self.session, self.large_url, self.large_path,
+                          attempts=1)
+        self.assertFalse(exists(self.large_path))
+        self.assertTrue(exists(self.large_path + ".part"))
+        # a later attempt picks up the partial file
+        result = download_files(self.session,
+                                [(self.large_url, self.large_path)])
+        self.assertGreater(result[0]["_resumed"], 0)
+        self.assertEqual(result[0]["_bytes"], len(self.large))
+        self.assertEqual(self.read_large(), self.large)
+
+    def test_restart_when_file_changed(self):
+        """a partial file of an older version should not be completed"""
+        self.server.truncate["/large.bin"] = 200000
+        with self.assertRaises(Exception):
+            download_file(self.session, self.large_url, self.large_path,
+                          attempts=1)
+        self.assertTrue(exists(self.large_path + ".part.validator"))
+        self.large = bytes(reversed(self.large))
+        self.server.contents["/large.bin"] = self.large
+        result = download_file(self.session, self.large_url, self.large_path)
+        self.assertEqual(self.read_large(), self.large)
+        self.assertFalse("_resumed" in result)
+        self.assertFalse(exists(self.large_path + ".part.validator"))
+
+    def test_restart_without_validator(self):
+        """a partial file without a validator should not be resumed"""
+        with open(self.large_path + ".part", "wb") as f:
+            f.write(b"garbage")
+        result = download_file(self.session, self.large_url, self.large_path)
+        self.assertEqual(self.read_large(), self.large)
+        self.assertFalse("_resumed" in result)
+        self.assertEqual(self.server.requests[-1], ("/large.bin", 0))
+
+    def test_restart_when_ranges_unsupported(self):
+        """server ignoring Range should lead to a fresh download"""
+        with open(self.large_path + ".part", "wb") as f:
+            f.write(b"garbage")
+        self.server.ranges = False
+        result = download_file(self.session, self.large_url, self.large_path)
+        self.assertEqual(self.read_large(), self.large)
+        self.assertFalse("_resumed" in result)
+
+    def test_complete_partial_file(self):
+        """partial file holding the whole content is moved into place"""
+        with open(self.large_path + ".part", "wb") as f:
+            f.write(self.large)
+        with open(self.large_path + ".part.validator", "w") as f:
+            f.write('"' + hashlib.md5(self.large).hexdigest() + '"')
+        result = download_file(self.session, self.large_url, self.large_path)
+        self.assertEqual(self.read_large(), self.large)
+        self.assertEqual(result["_resumed"], len(self.large))
+        self.assertEqual(self.server.requests, [])
+
+
+class CachedDownloadTests(FileServerTestCase):
+    """serving repeated downloads from a local cache"""
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.cache = DownloadCache(self.cache_dir.name)
+        self.addCleanup(self.cache_dir.cleanup)
+
+    def test_second_download_from_cache(self):
+        """repeated downloads should not contact the server"""
+        first = download_files(self.session, self.items(), cache=self.cache)
+        n_requests = len(self.server.requests)
+        for name in self.contents:
+            os.remove(join(self.data_dir.name, name))
+        second = download_files(self.session, self.items(), cache=self.cache)
+        self.assertEqual(len(self.server.requests), n_requests)
+        self.assertFalse(any("_cached" in _ for _ in first))
+        self.assertTrue(all(_["_cached"] for _ in second))
+        for url, path in self.items():
+            with open(path, "r") as f:
+                self.assertEqual(f.read(), self.contents[url.split("/")[-1]])
+
+    def test_separate_copies(self):
+        """changes to downloaded files should not alter the cache"""
+        items = self.items()
+        download_files(self.session, items, cache=self.cache)
+        url, path = items[0]
+        cached = self.cache.key_path(url)
+        with open(path, "a") as f:
+            f.write("y")
+        self.cache.fetch(url, join(self.data_dir.name, "copy"))
+        with open(cached, "r") as f:
+            self.assertEqual(f.read(), self.contents[url.split("/")[-1]])
+        with open(join(self.data_dir.name, "copy"), "a") as f:
+            f.write("y")
+        self.assertNotEqual(os.stat(path).st_ino, os.stat(cached).st_ino)
+
+    def test_offline_miss(self):
+        """offline mode should report files that are not in the cache"""
+        self.cache.offline = True
+        result = download_files(self.session, self.items()[:1],
+                                cache=self.cache)
+        self.assertTrue("not in cache" in result[0]["_exception"])
+        self.assertEqual(self.server.requests, [])
+
+    def test_evict_least_recently_used(self):
+        """cache should drop the oldest files when it exceeds its size"""
+        items = self.items()
+        download_files(self.session, items, cache=self.cache)
+        total = self.cache.size()
+        # make the first file the most recently used one
+        self.cache.fetch(items[0][0], join(self.data_dir.name, "copy"))
+        self.cache.max_size = total - 1
+        self.cache.evict()
+        self.assertTrue(self.cache.size() < total)
+        self.assertTrue(exists(self.cache.key_path(items[0][0])))
+        self.assertFalse(exists(self.cache.key_path(items[1][0])))
@@ -0,0 +1,90 @@
+"""
+Tests for the modules imported by the command-line entry points, and their
+import time
+"""
+
+import subprocess
+import sys
+import tempfile
+import unittest
+from os.path import abspath, dirname, join
+
+
+ROOT = dirname(dirname(abspath(__file__)))
+# maximum import time for --help, relative to the time spent importing
+# modules at startup (python -c pass) on the same machine
+FACTOR = 2
+# number of runs, of which the fastest is kept
+RUNS = 3
+
+
+def import_times(args, cwd):
+    """run python with -X importtime
+
+    :return: dictionary mapping top-level modules to their cumulative import
+        time (seconds), and a set with all imported modules
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime"] + args,
+                             cwd=cwd, capture_output=True, text=True,
+                             timeout=60)
+    top, modules = dict(), set()
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.add(name.strip())
+        if not name.startswith("  "):
+            top[name.strip()] = int(cumulative) / 1e6
+    return top, modules
+
+
+def imported_modules(args, cwd):
+    """set with all modules imported by a python command"""
+    return import_times(args, cwd)[1]
+
+
+class ImportTests(unittest.TestCase):
+    """entry points should import only what an action needs"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def fastest(self, args):
+        """smallest import time of modules not imported at startup, and
+        the smallest import time at startup"""
+        startup, extra = [], []
+        for _ in range(RUNS):
+            base, _ = import_times(["-c", "pass"], self.tempdir.name)
+            top, _ = import_times(args, self.tempdir.name)
+            startup.append(sum(base.values()))
+            extra.append(sum(v for k, v in top.items() if k not in base))
+        return min(extra), min(startup)
+
+    def check_help(self, script):
+        args = [join(ROOT, script), "--help"]
+        modules = imported_modules(args, self.tempdir.name)
+        for name in ["requests", "urllib3", "yaml", "asyncio", "hashlib",
+                     "cap_client.session", "cap_client.docs"]:
+            self.assertFalse(name in modules, name + " imported for --help")
+        extra, startup = self.fastest(args)
+        self.assertLess(extra, FACTOR * startup)
+
+    def test_user_help(self):
+        self.check_help("cap_client.py")
+
+    def test_admin_help(self):
+        self.check_help("cap_admin_client.py")
+
+    def test_user_view(self):
+        """a simple query should not import modules for other actions"""
+        args = [join(ROOT, "cap_client.py"), "--username", "abc",
+                "--token", "abc", "--api", "http://127.0.0.1:1",
+                "--retries", "0", "--no_cache", "view", "--uuid", "abc"]
+        modules = imported_modules(args, self.tempdir.name)
+        self.assertTrue("cap_client.assignments" in modules)
+        for name in ["yaml", "asyncio", "cap_client.lifecycle",
+                     "cap_client.examples", "cap_client.docs"]:
+            self.assertFalse(name in modules, name + " imported for view")
@@ -0,0 +1,127 @@
+"""
+Tests for the local index of assignments, using a local stand-in server
+"""
+
+import tempfile
+from unittest import mock
+from os.path import join
+from cap_client.assignments import Assignment
+from cap_client.errors import ClientError
+from cap_client.index import AssignmentIndex
+from tests.standin import StandInHandler, StandInTestCase
+
+
+class AssignmentHandler(StandInHandler):
+    """serves server.assignments (uuid: view) as listing, views and files"""
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split("?")[0]
+        server.requests.append(path)
+        uuid = path.rstrip("/").split("/")[-1]
+        if uuid in server.errors:
+            data = {"detail": "busy"}
+        elif path.startswith("/assignment/view/"):
+            data = server.assignments[uuid]
+        elif path.startswith("/data/list/"):
+            data = [{"uuid": "f-" + uuid, "file_role": "primary",
+                     "file_name": "x.txt", "path": uuid + "/x.txt"}]
+        else:
+            data = [{"uuid": k, "status": v["status"]}
+                    for k, v in sorted(server.assignments.items())]
+        self.send_body(200, data)
+
+
+class AssignmentIndexTests(StandInTestCase):
+
+    handler = AssignmentHandler
+
+    def setUp(self):
+        super().setUp()
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.server.requests = []
+        self.server.errors = set()
+        self.server.assignments = {
+            "a1": {"status": "complete", "score": 0.5,
+                   "challenge_name": "trivial", "challenge_version": "0.1"},
+            "a2": {"status": "complete", "score": 0.9,
+                   "challenge_name": "trivial", "challenge_version": "0.1"},
+            "a3": {"status": "generated", "challenge_name": "other",
+                   "challenge_version": "1"}}
+        self.assignment = Assignment(self.url, self.make_credentials())
+        self.index = AssignmentIndex(join(self.tempdir.name, "index.db"))
+
+    def tearDown(self):
+        self.index.close()
+        self.tempdir.cleanup()
+
+    def test_sync_incremental(self):
+        """only new and changed assignments should be refreshed"""
+        result = self.index.sync(self.assignment, jobs=2)
+        self.assertEqual(result["refreshed"], 3)
+        self.server.requests = []
+        self.server.assignments["a3"] = {"status": "submitted"}
+        del self.server.assignments["a1"]
+        result = self.index.sync(self.assignment)
+        self.assertEqual((result["assignments"], result["refreshed"],
+                          result["removed"]), (2, 1, 1))
+        self.assertEqual(sorted(self.server.requests),
+                         ["/assignment/abc", "/assignment/view/a3",
+                          "/data/list/a3"])
+        result = self.index.sync(self.assignment, full=True)
+        self.assertEqual(result["refreshed"], 2)
+
+    def test_sync_errors(self):
+        """failed refreshes should be reported with their messages"""
+        view = self.assignment.view
+
+        def failing_view(uuid, **kwargs):
+            if uuid == "a2":
+                raise ClientError("busy")
+            return view(uuid, **kwargs)
+
+        with mock.patch.object(self.assignment, "view", failing_view):
+            result = self.index.sync(self.assignment)
+        self.assertEqual((result["refreshed"], result["failed"]), (2, 1))
+        self.assertEqual(result["errors"], [{"uuid": "a2",
+                                             "_exception": "busy"}])
+
+    def test_sync_error_bodies(self):
+        """assignments with error responses should be refreshed later"""
+        self.server.errors = {"a2"}
+        result = self.index.sync(self.assignment)
+        self.assertEqual((result["refreshed"], result["failed"]), (2, 1))
+        self.assertTrue("busy" in result["errors"][0]["_exception"])
+        self.server.errors = set()
+        result = self.index.sync(self.assignment)
+        self.assertEqual((result["refreshed"], result["failed"]), (1, 0))
+        self.assertEqual(self.index.query(challenge="trivial")[1]["score"],
+                         0.9)
+
+    def test_query(self):
+        self.index.sync(self.assignment)
+        pending = self.index.query(pending=True)
+        self.assertEqual([_["uuid"] for _ in pending], ["a3"])
+        trivial = self.index.query(challenge="trivial", datafiles=True)
+        self.assertEqual([_["score"] for _ in trivial], [0.5, 0.9])
+        self.assertEqual(trivial[0]["datafiles"][0]["file_name"], "x.txt")
+        summary = self.index.summary(username="abc")
+        self.assertEqual(summary[1], {"challenge": "trivial",
+                                      "version": "0.1", "assignments": 2,
+                                      "complete": 2, "best_score": 0.9})
+
+    def test_execute(self):
+        self.index.sync(self.assignment)
+        result = self.index.execute(
+            "SELECT COUNT(*) AS n FROM datafiles")
+        self.assertEqual(result, [{"n": 3}])
+        with self.assertRaises(ClientError):
+            self.index.execute("DELETE FROM assignments")
+
+    def test_execute_special_path(self):
+        """read-only queries should work for paths with uri characters"""
+        path = join(self.tempdir.name, "a?b#c%20d", "index.db")
+        with AssignmentIndex(path) as index:
+            index.sync(self.assignment)
+            result = index.execute("SELECT COUNT(*) AS n FROM assignments")
+        self.assertEqual(result, [{"n": 3}])
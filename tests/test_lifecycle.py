@@ -0,0 +1,163 @@
+"""
+Tests for running assignments from start to submission
+"""
+
+import json
+import tempfile
+import threading
+import unittest
+from os.path import exists, join
+from cap_client.assignments import Assignment
+from cap_client.errors import ValidationError
+from cap_client.lifecycle import LifecycleRunner, load_manifest
+from cap_client.polling import Poller
+from tests.standin import StandInHandler, StandInTestCase
+
+
+class LifecycleHandler(StandInHandler):
+    """stand-in for assignment endpoints; assignments become generated after
+    one status query"""
+
+    def send_json(self, data):
+        self.send_body(200, data)
+
+    def do_GET(self):
+        server = self.server
+        uuid = self.path.rstrip("/").split("/")[-1]
+        if self.path.startswith("/assignment/view/"):
+            with server.lock:
+                views = server.views.get(uuid, 0)
+                server.views[uuid] = views + 1
+            status = "generated" if views > 0 else "created"
+            self.send_json({"uuid": uuid, "status": status})
+        elif self.path.startswith("/data/list/"):
+            self.send_json([{"uuid": "f-" + uuid, "file_role": "primary",
+                             "path": "x/" + uuid + "/data.txt",
+                             "file_name": "data.txt"}])
+        elif self.path.startswith("/static/"):
+            self.send_body(200, ("data for " + self.path).encode())
+
+    def do_POST(self):
+        body = self.read_body()
+        server = self.server
+        with server.lock:
+            server.posts.append(self.path)
+        if self.path == "/assignment/create/":
+            name = json.loads(body)["name"]
+            if name == "missing":
+                self.send_json({"detail": "challenge not found"})
+            else:
+                self.send_json({"uuid": "a-" + name})
+        elif self.path.startswith("/data/upload") and \
+                b"rejected" in body:
+            self.send_json({"detail": "upload rejected"})
+        else:
+            self.send_json({"uuid": "ok"})
+
+
+class LoadManifestTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write(self, name, content):
+        path = join(self.tempdir.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_yaml(self):
+        self.write("r.txt", "response")
+        path = self.write("runs.yaml", "- name: trivial\n  version: '0.1'\n"
+                                       "  response: r.txt\n  tags: x\n")
+        entries = load_manifest(path)
+        self.assertEqual(entries[0]["version"], "0.1")
+        self.assertEqual(entries[0]["response"],
+                         join(self.tempdir.name, "r.txt"))
+
+    def test_json(self):
+        path = self.write("runs.json", json.dumps(
+            {"assignments": [{"uuid": "abc", "submit": False}]}))
+        self.assertEqual(load_manifest(path), [{"uuid": "abc",
+                                                "submit": False}])
+
+    def test_invalid(self):
+        for content in ["a: [", "{}", "- version: 1\n"]:
+            path = self.write("runs.yaml", content)
+            self.assertRaises(ValidationError, load_manifest, path)
+
+    def test_missing_response(self):
+        """responses should exist before any assignment is started"""
+        path = self.write("runs.yaml", "- name: trivial\n  response: r.txt\n")
+        with self.assertRaises(ValidationError) as cm:
+            load_manifest(path)
+        self.assertTrue("file does not exist" in cm.exception.message)
+
+    def test_unreadable(self):
+        """a manifest that cannot be read should be a validation error"""
+        for name in ["missing.yaml", "."]:
+            path = join(self.tempdir.name, name)
+            with self.assertRaises(ValidationError) as cm:
+                load_manifest(path)
+            self.assertTrue("could not read manifest" in cm.exception.message)
+
+
+class LifecycleRunnerTests(StandInTestCase):
+    """several assignments against a stand-in server"""
+
+    handler = LifecycleHandler
+
+    def setUp(self):
+        super().setUp()
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.server.lock = threading.Lock()
+        self.server.views = dict()
+        self.server.posts = []
+        self.assignment = Assignment(self.url, self.make_credentials())
+        self.response = join(self.tempdir.name, "response.txt")
+        with open(self.response, "w") as f:
+            f.write("response")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_run_all(self):
+        entries = [{"name": "one", "response": self.response, "tags": "t"},
+                   {"name": "missing", "response": self.response},
+                   {"name": "two", "submit": False}]
+        runner = LifecycleRunner(self.assignment, data_dir=self.tempdir.name,
+                                 poller=Poller(interval=0.01))
+        result = runner.run_all(entries, jobs=3)
+        one, missing, two = result["assignments"]
+        self.assertEqual(one["uuid"], "a-one")
+        self.assertEqual(list(one["_latency"]),
+                         ["start", "wait", "download", "upload", "submit"])
+        self.assertEqual(one["wait"]["status"], "generated")
+        self.assertTrue(exists(join(self.tempdir.name, "a-one", "data.txt")))
+        self.assertTrue("challenge not found" in missing["_exception"])
+        self.assertEqual(list(missing["_latency"]), ["start"])
+        self.assertEqual(list(two["_latency"]), ["start", "wait", "download"])
+        self.assertEqual(result["failed"], 1)
+        self.assertEqual(result["stages"]["start"]["count"], 3)
+        self.assertEqual(result["stages"]["submit"]["count"], 1)
+        self.assertTrue("/assignment/submit/a-one/" in self.server.posts)
+
+    def test_failed_upload(self):
+        """assignments should not be submitted without their response"""
+        rejected = join(self.tempdir.name, "rejected.txt")
+        with open(rejected, "w") as f:
+            f.write("rejected")
+        runner = LifecycleRunner(self.assignment, data_dir=self.tempdir.name,
+                                 poller=Poller(interval=0.01))
+        result = runner.run_all([{"name": "one", "response": rejected}])
+        report = result["assignments"][0]
+        self.assertEqual(report["_exception"],
+                         "upload: upload failed: upload rejected")
+        self.assertEqual(list(report["_latency"]),
+                         ["start", "wait", "download", "upload"])
+        self.assertEqual(result["failed"], 1)
+        self.assertFalse(any(_.startswith("/assignment/submit/")
+                             for _ in self.server.posts))
@@ -0,0 +1,85 @@
+"""
+Tests for logging of requests
+"""
+
+import logging
+import unittest
+from cap_client.api import Api
+from cap_client.credentials import CredentialsManager
+from cap_client.errors import ValidationError
+from cap_client.logs import Abbreviated, MAX_LENGTH, set_log_levels
+
+
+class CountingRepr:
+    """counts how many times it is formatted"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __repr__(self):
+        self.count += 1
+        return "counted"
+
+
+class FakeResponse:
+    status_code = 200
+
+    def json(self):
+        return [{"uuid": str(i), "token": "hidden"} for i in range(1000)]
+
+
+class FakeSession:
+    """session answering all requests with a long listing"""
+
+    responses = None
+
+    def request(self, method, url, **kwargs):
+        return FakeResponse()
+
+
+class AbbreviatedTests(unittest.TestCase):
+
+    def test_secrets(self):
+        text = str(Abbreviated({"Authorization": "Bearer abc", "a": 1}))
+        self.assertEqual(text, "{'Authorization': '***', 'a': 1}")
+
+    def test_truncated(self):
+        text = str(Abbreviated("x" * 10000))
+        self.assertTrue(len(text) <= MAX_LENGTH)
+        text = str(Abbreviated(list(range(10000))))
+        self.assertTrue(text.endswith("...]"))
+        text = str(Abbreviated([{"a": "x" * 400}] * 10))
+        self.assertTrue(text.endswith("more characters)"))
+
+    def test_lazy(self):
+        """values should not be formatted when messages are not emitted"""
+        value = CountingRepr()
+        logger = logging.getLogger("cap_client.test")
+        logger.setLevel(logging.WARNING)
+        logger.info("value: %s", Abbreviated(value))
+        self.assertEqual(value.count, 0)
+
+    def test_api(self):
+        credentials = CredentialsManager("abc", "nonexistent.yaml",
+                                         token="secret-token")
+        api = Api("https://api.captest.io", credentials,
+                  session=FakeSession())
+        with self.assertLogs("cap_client.api", logging.INFO) as logs:
+            api.get("/assignment/abc")
+        text = "\n".join(logs.output)
+        self.assertFalse("secret-token" in text)
+        self.assertTrue(len(text) < 3 * MAX_LENGTH)
+
+
+class LogLevelTests(unittest.TestCase):
+
+    def tearDown(self):
+        logging.getLogger("cap_client.session").setLevel(logging.NOTSET)
+
+    def test_set_levels(self):
+        set_log_levels(["session=debug"])
+        self.assertEqual(logging.getLogger("cap_client.session").level,
+                         logging.DEBUG)
+        for value in ["session", "=INFO", "session=LOUD"]:
+            with self.assertRaises(ValidationError):
+                set_log_levels([value])
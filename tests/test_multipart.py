@@ -0,0 +1,84 @@
+"""
+Tests for streaming multipart/form-data bodies
+"""
+
+import tempfile
+import unittest
+from email.parser import BytesParser
+from email.policy import HTTP
+from os.path import join
+from cap_client.multipart import MultipartEncoder
+
+
+class MultipartEncoderTests(unittest.TestCase):
+    """encoding text fields and a file into a multipart body"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.file_path = join(self.tempdir.name, "data.bin")
+        self.file_content = bytes(range(256)) * 1000
+        with open(self.file_path, "wb") as f:
+            f.write(self.file_content)
+        self.fields = {"metadata": '{"file_name": "data.bin"}'}
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def parse(self, encoder, body):
+        content_type = encoder.content_type.encode()
+        header = b"Content-Type: " + content_type + b"\r\n\r\n"
+        message = BytesParser(policy=HTTP).parsebytes(header + body)
+        return list(message.iter_parts())
+
+    def test_length(self):
+        """length should match the number of bytes produced"""
+        encoder = MultipartEncoder(self.fields, "filedata", self.file_path,
+                                   chunk_size=1000)
+        body = b"".join(encoder)
+        self.assertEqual(len(body), len(encoder))
+
+    def test_fields_and_file(self):
+        """body should hold the text fields followed by the file"""
+        encoder = MultipartEncoder(self.fields, "filedata", self.file_path)
+        parts = self.parse(encoder, b"".join(encoder))
+        self.assertEqual(len(parts), 2)
+        name = parts[0].get_param("name", header="content-disposition")
+        self.assertEqual(name, "metadata")
+        self.assertEqual(parts[0].get_content(), self.fields["metadata"])
+        self.assertEqual(parts[1].get_filename(), "data.bin")
+        self.assertEqual(parts[1].get_content(), self.file_content)
+
+    def test_bounded_chunks(self):
+        """file content should be produced in chunks of bounded size"""
+        encoder = MultipartEncoder(self.fields, "filedata", self.file_path,
+                                   chunk_size=4096)
+        chunks = list(encoder)
+        self.assertGreater(len(chunks), 60)
+        self.assertTrue(all(len(_) <= 4096 for _ in chunks[1:-1]))
+
+    def test_progress(self):
+        """progress should increase up to the total size"""
+        calls = []
+        encoder = MultipartEncoder(self.fields, "filedata", self.file_path,
+                                   progress=lambda *_: calls.append(_),
+                                   chunk_size=50000)
+        list(encoder)
+        sent = [_[0] for _ in calls]
+        self.assertEqual(sent, sorted(sent))
+        self.assertEqual(calls[-1], (len(encoder), len(encoder)))
+
+    def test_repeat_iteration(self):
+        """iterating twice should produce the same body (e.g. for retries)"""
+        encoder = MultipartEncoder(self.fields, "filedata", self.file_path)
+        self.assertEqual(b"".join(encoder), b"".join(encoder))
+
+    def test_close_unfinished(self):
+        """closing should release the file of an unfinished iteration"""
+        with MultipartEncoder(self.fields, "filedata",
+                              self.file_path) as encoder:
+            chunks = iter(encoder)
+            next(chunks)
+            next(chunks)
+        self.assertIsNone(encoder._chunks)
+        with self.assertRaises(StopIteration):
+            next(chunks)
@@ -0,0 +1,52 @@
+"""
+Tests for writing the output of actions
+"""
+
+import io
+import json
+import unittest
+from cap_client.output import write_result
+
+
+class StreamRecorder(io.StringIO):
+    """records the content written before each flush"""
+
+    def __init__(self):
+        super().__init__()
+        self.flushed = []
+
+    def flush(self):
+        self.flushed.append(self.getvalue())
+
+
+class OutputTests(unittest.TestCase):
+
+    def write(self, result, output):
+        stream = StreamRecorder()
+        write_result(result, output, stream)
+        return stream
+
+    def test_json(self):
+        """default output should be indented json"""
+        result = [{"a": 1}, {"b": 2}]
+        stream = self.write(result, "json")
+        self.assertEqual(stream.getvalue(), json.dumps(result, indent=2) +
+                         "\n")
+        stream = self.write(iter(result), "compact")
+        self.assertEqual(stream.getvalue(), '[{"a":1},{"b":2}]\n')
+
+    def test_ndjson(self):
+        stream = self.write([{"a": 1}, {"b": 2}], "ndjson")
+        self.assertEqual(stream.getvalue(), '{"a":1}\n{"b":2}\n')
+        stream = self.write({"a": 1}, "ndjson")
+        self.assertEqual(stream.getvalue(), '{"a":1}\n')
+
+    def test_ndjson_streaming(self):
+        """records from an iterator should be written as they arrive"""
+        def records():
+            for i in range(3):
+                yield {"i": i}
+        stream = self.write(records(), "ndjson")
+        self.assertEqual(stream.flushed, ['{"i":0}\n',
+                                          '{"i":0}\n{"i":1}\n',
+                                          '{"i":0}\n{"i":1}\n{"i":2}\n'])
@@ -0,0 +1,102 @@
+"""
+Tests for iterating over paginated listings, using a local stand-in server
+"""
+
+import time
+from urllib.parse import parse_qs, urlsplit
+from cap_client.assignments import Assignment
+from cap_client.errors import ClientError
+from tests.standin import StandInHandler, StandInTestCase
+
+
+class PageHandler(StandInHandler):
+    """serves server.records in pages
+
+    server.mode is one of "envelope" (records under results, with a next
+    link), "list" (plain lists; pages beyond the end are empty), "ignore"
+    (all records, whatever the parameters), or "error" (not found). Pages
+    listed in server.failing are not found in any mode.
+    """
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        page = int(query.get("page", ["1"])[0])
+        size = int(query.get("page_size", ["10"])[0])
+        server.requests.append((parts.path, page, time.monotonic()))
+        time.sleep(server.delay)
+        records = server.records[(page - 1) * size:page * size]
+        if server.mode == "error" or page in server.failing:
+            data = {"detail": "not found"}
+        elif server.mode == "ignore":
+            data = server.records
+        elif server.mode == "list":
+            data = records
+        else:
+            more = page * size < len(server.records)
+            data = {"count": len(server.records),
+                    "next": parts.path + "?page=" + str(page + 1)
+                    if more else None,
+                    "results": records}
+        self.send_body(200, data)
+
+
+class PaginationTests(StandInTestCase):
+
+    handler = PageHandler
+
+    def setUp(self):
+        super().setUp()
+        self.server.records = [{"uuid": "a" + str(i)} for i in range(25)]
+        self.server.requests = []
+        self.server.delay = 0
+        self.server.failing = ()
+        self.server.mode = "envelope"
+        self.assignment = Assignment(self.url, self.make_credentials())
+
+    def test_modes(self):
+        """all records should be produced once, whatever the pagination"""
+        expected = self.server.records
+        for mode, size, requests in [("envelope", 10, 3), ("list", 10, 3),
+                                     ("list", 5, 6), ("ignore", 10, 2),
+                                     ("ignore", 100, 1)]:
+            self.server.mode = mode
+            self.server.requests = []
+            result = list(self.assignment.iter(page_size=size))
+            self.assertEqual(result, expected, mode)
+            self.assertEqual(len(self.server.requests), requests, mode)
+            self.assertEqual(self.server.requests[0][0], "/assignment/abc")
+
+    def test_datafiles(self):
+        self.server.mode = "list"
+        result = list(self.assignment.datafile.iter("abc", page_size=10))
+        self.assertEqual(len(result), 25)
+        self.assertEqual(self.server.requests[0][0], "/data/list/abc")
+
+    def test_prefetch(self):
+        """the next page should be requested before the current one is
+        consumed"""
+        self.server.delay = 0.05
+        records = self.assignment.iter(page_size=10)
+        first = next(records)
+        time.sleep(0.1)
+        self.assertEqual(first, {"uuid": "a0"})
+        self.assertEqual([_[1] for _ in self.server.requests], [1, 2])
+        records.close()
+
+    def test_first_page_error(self):
+        self.server.mode = "list"
+        self.server.records = []
+        self.assertEqual(list(self.assignment.iter()), [])
+        self.server.mode = "error"
+        with self.assertRaises(ClientError):
+            list(self.assignment.iter())
+
+    def test_later_page_error(self):
+        """an error on a later page should not end the listing silently"""
+        for mode in ("envelope", "list"):
+            self.server.mode = mode
+            self.server.failing = (2,)
+            with self.assertRaises(ClientError):
+                list(self.assignment.iter(page_size=10))
@@ -0,0 +1,116 @@
+"""
+Tests for polling the status of assignments
+"""
+
+import tempfile
+import unittest
+from cap_client.assignments import Assignment
+from cap_client.polling import Poller, status_rank
+from cap_client.responses import ResponseCache
+from cap_client.session import ApiSession
+from tests.standin import StandInHandler, StandInTestCase
+
+
+class StatusHandler(StandInHandler):
+    """serves assignment views; server.statuses lists successive statuses"""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        if len(server.statuses) > 1:
+            status = server.statuses.pop(0)
+        else:
+            status = server.statuses[0]
+        data = {"detail": "not found"} if status is None else \
+            {"uuid": "abc", "status": status}
+        self.send_body(200, data)
+
+
+class PollerTests(unittest.TestCase):
+    """intervals, transitions and timeouts without requests"""
+
+    def test_transitions(self):
+        states = iter(["a", "a", "b", "b", "b", "c"])
+        changes = []
+        poller = Poller(interval=0.001, max_interval=0.01,
+                        callback=lambda old, new, _: changes.append((old,
+                                                                     new)))
+        result, done = poller.wait(lambda: next(states),
+                                   lambda _: _ == "c")
+        self.assertEqual((result, done), ("c", True))
+        self.assertEqual(changes, [(None, "a"), ("a", "b"), ("b", "c")])
+
+    def test_timeout(self):
+        calls = []
+        poller = Poller(interval=0.01, max_interval=0.02, timeout=0.1)
+        result, done = poller.wait(lambda: calls.append(1) or len(calls),
+                                   lambda _: False, state=lambda _: "same")
+        self.assertFalse(done)
+        # intervals grow: 0.01, 0.02, 0.02, ...
+        self.assertGreater(len(calls), 3)
+        self.assertLess(len(calls), 10)
+
+    def test_zero_interval(self):
+        """a zero interval should not lead to repeated immediate queries"""
+        calls = []
+        poller = Poller(interval=0, max_interval=0.02, timeout=0.1)
+        result, done = poller.wait(lambda: calls.append(1) or len(calls),
+                                   lambda _: False, state=lambda _: "same")
+        self.assertFalse(done)
+        # intervals: 0, 0.02, 0.02, ...
+        self.assertGreater(len(calls), 3)
+        self.assertLess(len(calls), 10)
+
+    def test_status_rank(self):
+        self.assertLess(status_rank("created"), status_rank("generated"))
+        self.assertLess(status_rank("submitted"), status_rank("complete"))
+
+
+class AssignmentWaitTests(StandInTestCase):
+    """waiting for assignment statuses against a stand-in server"""
+
+    handler = StatusHandler
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.server.requests = []
+        session = ApiSession(responses=ResponseCache(self.cache_dir.name))
+        self.assignment = Assignment(self.url, self.make_credentials(session))
+        self.poller = Poller(interval=0.01, max_interval=0.02, timeout=2)
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_wait_generated(self):
+        """views should bypass cached responses while waiting"""
+        self.server.statuses = ["created", "created", "generated"]
+        self.assertEqual(self.assignment.view("abc")["status"], "created")
+        result = self.assignment.wait("abc", poller=self.poller)
+        self.assertEqual(result["status"], "generated")
+        self.assertTrue("_exception" not in result)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_wait_later_status(self):
+        """a status beyond the target should end the wait"""
+        self.server.statuses = ["complete"]
+        result = self.assignment.wait("abc", status="submitted",
+                                      poller=self.poller)
+        self.assertEqual(result["status"], "complete")
+
+    def test_wait_timeout(self):
+        self.server.statuses = ["generated"]
+        self.poller.timeout = 0.05
+        result = self.assignment.wait("abc", status="complete",
+                                      poller=self.poller)
+        self.assertEqual(result["_exception"],
+                         "timeout waiting for status: complete")
+
+    def test_wait_error(self):
+        """errors should end the wait"""
+        self.server.statuses = [None]
+        result = self.assignment.wait("abc", poller=self.poller)
+        self.assertEqual(result["detail"], "not found")
+        self.assertEqual(result["_exception"],
+                         "could not view assignment: not found")
+        self.assertEqual(len(self.server.requests), 1)
@@ -0,0 +1,122 @@
+"""
+Tests for caching and revalidating api responses
+"""
+
+import json
+import tempfile
+from cap_client.api import Api
+from cap_client.responses import ResponseCache, parse_ttl
+from cap_client.session import ApiSession
+from tests.standin import StandInHandler, StandInTestCase
+
+
+class JsonHandler(StandInHandler):
+    """serves json content with an ETag; server.content maps paths to data"""
+
+    def send_json(self, status, data=None):
+        body = b"" if data is None else json.dumps(data).encode()
+        headers = dict()
+        if data is not None:
+            headers["ETag"] = '"' + str(len(body)) + '"'
+        self.send_body(status, body, headers)
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        data = self.server.content[self.path]
+        etag = '"' + str(len(json.dumps(data).encode())) + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_json(304)
+        else:
+            self.send_json(200, data)
+
+    def do_POST(self):
+        self.read_body()
+        self.send_json(200, {"detail": "ok"})
+
+
+class ResponseCacheTests(StandInTestCase):
+    """reusing and revalidating GET responses"""
+
+    handler = JsonHandler
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.server.requests = []
+        self.server.content = {
+            "/data/list/abc": [{"file_name": "a.txt", "path": "x/a.txt"}],
+            "/assignment/view/abc": {"status": "generated"}
+        }
+        self.ttl = {"/data/list/": 60}
+        self.responses = ResponseCache(self.cache_dir.name, ttl=self.ttl)
+        session = ApiSession(responses=self.responses)
+        self.api = Api(self.url, self.make_credentials(session))
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_fresh_response_served_locally(self):
+        """responses within their time-to-live should not reach the api"""
+        first = self.api.get("/data/list/abc")
+        second = self.api.get("/data/list/abc")
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_cached_result_is_a_copy(self):
+        """modifying a result should not alter the stored response"""
+        self.api.get("/data/list/abc")[0]["file_name"] = "changed"
+        self.assertEqual(self.api.get("/data/list/abc")[0]["file_name"],
+                         "a.txt")
+
+    def test_revalidate_with_etag(self):
+        """responses without a time-to-live should be revalidated"""
+        first = self.api.get("/assignment/view/abc")
+        second = self.api.get("/assignment/view/abc")
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertTrue("If-None-Match" in self.server.requests[1][1])
+
+    def test_revalidate_detects_changes(self):
+        """revalidation should fetch content that changed on the server"""
+        self.api.get("/assignment/view/abc")
+        self.server.content["/assignment/view/abc"] = {"status": "complete"}
+        result = self.api.get("/assignment/view/abc")
+        self.assertEqual(result["status"], "complete")
+
+    def test_post_marks_responses_stale(self):
+        """a POST should force revalidation of fresh responses"""
+        self.api.get("/data/list/abc")
+        self.api.post("/data/delete/", {"uuid": "abc"})
+        self.api.get("/data/list/abc")
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_persistent_cache(self):
+        """a new cache object should reuse responses stored on disk"""
+        self.api.get("/data/list/abc")
+        self.api.session.responses = ResponseCache(self.cache_dir.name,
+                                                   ttl=self.ttl)
+        self.api.get("/data/list/abc")
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_data_lists_revalidated_by_default(self):
+        """lists of data files may grow, so they have no default ttl"""
+        self.api.session.responses = ResponseCache(self.cache_dir.name)
+        self.api.get("/data/list/abc")
+        self.api.get("/data/list/abc")
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_offline(self):
+        """stored responses should be used without revalidation offline"""
+        first = self.api.get("/assignment/view/abc")
+        self.api.session.responses = ResponseCache(self.cache_dir.name,
+                                                   offline=True)
+        self.assertEqual(self.api.get("/assignment/view/abc"), first)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_ttl_policy(self):
+        """longest endpoint prefix should determine the time-to-live"""
+        ttl = parse_ttl(["/data/=5", "/data/list/=30"], ttl=dict())
+        responses = ResponseCache(self.cache_dir.name, ttl=ttl)
+        self.assertEqual(responses.ttl_for("/data/list/abc"), 30)
+        self.assertEqual(responses.ttl_for("/data/view/abc"), 5)
+        self.assertEqual(responses.ttl_for("/assignment/abc"), 0)
@@ -0,0 +1,151 @@
+"""
+Tests for retrying failed requests, using a local stand-in server
+"""
+
+import json
+import socket
+import time
+import unittest
+from cap_client.api import Api
+from cap_client.errors import ClientError
+from cap_client.retry import RetryPolicy, CircuitBreaker, parse_retry_after
+from cap_client.session import ApiSession
+from tests.standin import StandInHandler, StandInTestCase
+
+
+class FlakyHandler(StandInHandler):
+    """responds with scripted status codes before succeeding
+
+    server.statuses is a list of (status, headers) consumed by successive
+    requests; once it is empty, requests succeed with a json body.
+    """
+
+    def respond(self):
+        self.server.requests.append((self.command, self.path))
+        status, headers = 200, dict()
+        if self.server.statuses:
+            status, headers = self.server.statuses.pop(0)
+        body = json.dumps({"status": status}).encode()
+        if status == 200 and self.server.invalid:
+            body = b"<html>busy</html>"
+        self.send_body(status, body, headers)
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.read_body()
+        self.respond()
+
+
+class RetryPolicyTests(unittest.TestCase):
+    """decisions and delays, without requests"""
+
+    def test_idempotent(self):
+        """GET should be retried on any transient status, POST only when
+        the request was not processed"""
+        policy = RetryPolicy(retries=2)
+        self.assertTrue(policy.retry_status("GET", 502, 0))
+        self.assertFalse(policy.retry_status("GET", 502, 2))
+        self.assertFalse(policy.retry_status("GET", 500, 0))
+        self.assertTrue(policy.retry_status("POST", 429, 0))
+        self.assertTrue(policy.retry_status("POST", 503, 1))
+        self.assertFalse(policy.retry_status("POST", 502, 0))
+        self.assertTrue(policy.retry_error("GET", False, 0))
+        self.assertFalse(policy.retry_error("POST", False, 0))
+        self.assertTrue(policy.retry_error("POST", True, 0))
+
+    def test_delay(self):
+        """delays should grow exponentially, with jitter and an upper
+        limit"""
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+        for attempt, limit in [(0, 1), (1, 2), (2, 4), (3, 5), (10, 5)]:
+            delay = policy.delay(attempt)
+            self.assertGreaterEqual(delay, limit / 2)
+            self.assertLessEqual(delay, limit)
+        self.assertEqual(policy.delay(0, retry_after=7), 7)
+        self.assertIsNone(policy.delay(0, retry_after=1000))
+
+    def test_retry_after(self):
+        self.assertEqual(parse_retry_after("3"), 3)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"),
+                         0)
+
+
+class CircuitBreakerTests(unittest.TestCase):
+
+    def test_open_and_reset(self):
+        """consecutive failures should stop requests for a while"""
+        breaker = CircuitBreaker(threshold=2, reset_timeout=0.1)
+        breaker.record(False)
+        breaker.check()
+        breaker.record(False)
+        self.assertRaises(ClientError, breaker.check)
+        time.sleep(0.15)
+        breaker.check()
+        self.assertRaises(ClientError, breaker.check)
+        breaker.record(True)
+        breaker.check()
+        self.assertEqual(breaker.failures, 0)
+
+
+class RetryRequestTests(StandInTestCase):
+    """requests against a stand-in server that fails transiently"""
+
+    handler = FlakyHandler
+
+    def setUp(self):
+        super().setUp()
+        self.server.statuses = []
+        self.server.requests = []
+        self.server.invalid = False
+        self.session = ApiSession(retry=RetryPolicy(retries=3, backoff=0.01))
+        self.api = Api(self.url, self.make_credentials(self.session))
+
+    def test_get_transient(self):
+        self.server.statuses = [(502, {}), (429, {"Retry-After": "0"}),
+                                (504, {})]
+        self.assertEqual(self.api.get("/a/"), {"status": 200})
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_get_exhausted(self):
+        """the last response should be returned when retries run out"""
+        self.server.statuses = [(503, {})] * 5
+        self.assertEqual(self.api.get("/a/"), {"status": 503})
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_retry_after_too_long(self):
+        self.server.statuses = [(429, {"Retry-After": "3600"})]
+        self.assertEqual(self.api.get("/a/"), {"status": 429})
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_post(self):
+        """POST should be retried only if the request was not processed"""
+        self.server.statuses = [(503, {}), (200, {})]
+        self.assertEqual(self.api.post("/a/", {"x": 1}), {"status": 200})
+        self.assertEqual(len(self.server.requests), 2)
+        self.server.statuses = [(502, {})]
+        self.assertEqual(self.api.post("/a/", {"x": 1}), {"status": 502})
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_post_invalid_json(self):
+        self.server.invalid = True
+        self.assertEqual(self.api.post("/a/", {"x": 1}),
+                         "error parsing JSON response")
+
+    def test_connection_refused(self):
+        """failed connections should be retried until the circuit opens"""
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        self.api.api_url = "http://127.0.0.1:" + str(port)
+        self.session.breaker = CircuitBreaker(threshold=3)
+        with self.assertRaises(ClientError):
+            self.api.post("/a/", {"x": 1})
+        self.assertEqual(self.session.breaker.failures, 3)
+        with self.assertRaises(ClientError) as e:
+            self.api.get("/a/")
+        self.assertTrue("unavailable" in e.exception.message)
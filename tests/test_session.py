@@ -0,0 +1,39 @@
+"""
+Tests for the pooled http session shared by api objects
+"""
+
+import unittest
+from cap_client.assignments import Assignment
+from cap_client.credentials import CredentialsManager
+from cap_client.session import ApiSession
+
+
+class ApiSessionTests(unittest.TestCase):
+    """configuring and sharing a pool of connections"""
+
+    def test_pool_size(self):
+        """adapters should use the configured pool size"""
+        session = ApiSession(pool_size=3)
+        adapter = session.session.get_adapter("https://api.captest.io")
+        self.assertEqual(adapter._pool_maxsize, 3)
+
+    def test_disable_keep_alive(self):
+        """keep_alive=0 should ask the server to close connections"""
+        session = ApiSession(keep_alive=0)
+        self.assertEqual(session.session.headers["Connection"], "close")
+
+    def test_default_session(self):
+        """credentials should create a session when none is provided"""
+        credentials = CredentialsManager("abc", "nonexistent.yaml")
+        self.assertTrue(isinstance(credentials.session, ApiSession))
+        self.assertIs(credentials.session, credentials.session)
+
+    def test_shared_session(self):
+        """api objects should reuse the session held by the credentials"""
+        session = ApiSession()
+        credentials = CredentialsManager("abc", "nonexistent.yaml",
+                                         session=session)
+        assignment = Assignment("https://api.captest.io", credentials)
+        self.assertIs(assignment.session, session)
+        self.assertIs(assignment.datafile.session, session)
+        self.assertIs(assignment.datafile, assignment.datafile)
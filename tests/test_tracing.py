@@ -0,0 +1,129 @@
+"""
+Tests for tracing requests, using a local stand-in server
+"""
+
+import json
+import tempfile
+import unittest
+from os.path import join
+from cap_client.api import Api
+from cap_client.errors import ClientError
+from cap_client.retry import RetryPolicy
+from cap_client.session import ApiSession
+from cap_client.tracing import Tracer, JsonLinesSink, StatsSink, \
+    OtlpJsonSink, endpoint_template
+from tests.standin import StandInHandler, StandInTestCase
+
+
+class TraceHandler(StandInHandler):
+    """responds with server.statuses in turn, then with a json body"""
+
+    def respond(self):
+        status = 200
+        if self.server.statuses:
+            status = self.server.statuses.pop(0)
+        self.send_body(status, {"path": self.path})
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.read_body()
+        self.respond()
+
+
+class ListSink:
+    """keeps spans in a list"""
+
+    def __init__(self):
+        self.spans = []
+
+    def emit(self, span):
+        self.spans.append(span)
+
+    def close(self):
+        pass
+
+
+class EndpointTemplateTests(unittest.TestCase):
+
+    def test_identifiers(self):
+        url = "https://api.captest.io/data/list/" \
+              "0b7a2a0c-46fa-4bd4-9d6c-4aa7e4a4a7f1?page=2"
+        self.assertEqual(endpoint_template(url), "/data/list/{id}")
+        self.assertEqual(endpoint_template("http://h/blog/update/intro/1.2"),
+                         "/blog/update/intro/{id}")
+        self.assertEqual(endpoint_template("http://h/assignment/abc/"),
+                         "/assignment/abc/")
+
+
+class TracingTests(StandInTestCase):
+
+    handler = TraceHandler
+
+    def setUp(self):
+        super().setUp()
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.server.statuses = []
+        self.spans, self.stats = ListSink(), StatsSink()
+        self.jsonl = join(self.tempdir.name, "trace.jsonl")
+        self.otlp = join(self.tempdir.name, "trace.json")
+        self.tracer = Tracer([self.spans, self.stats,
+                              JsonLinesSink(self.jsonl),
+                              OtlpJsonSink(self.otlp)])
+        session = ApiSession(retry=RetryPolicy(retries=2, backoff=0.01),
+                             tracer=self.tracer)
+        self.api = Api(self.url, self.make_credentials(session))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_spans(self):
+        """each request should produce one span, including its retries"""
+        self.server.statuses = [503]
+        self.api.get("/data/list/1234")
+        self.api.post("/assignment/start/", {"name": "x"})
+        self.api.get("/data/list/5678")
+        get, post, reused = self.spans.spans
+        self.assertEqual((get["method"], get["endpoint"], get["status"],
+                          get["retries"]),
+                         ("GET", "/data/list/{id}", 200, 1))
+        self.assertEqual(get["bytes_in"], len('{"path": "/data/list/1234"}'))
+        self.assertEqual(post["bytes_out"], len('{"name": "x"}'))
+        for phase in ("connect", "ttfb", "total"):
+            self.assertTrue(get["seconds"][phase] >= 0, phase)
+        # connections are reused after the first request
+        self.assertTrue("connect" not in reused["seconds"])
+        seconds = reused["seconds"]
+        self.assertTrue(seconds["ttfb"] <= seconds["total"])
+
+    def test_error(self):
+        self.api.session.close()
+        self.api.session.retry = RetryPolicy(retries=0)
+        self.api.api_url = "http://127.0.0.1:1"
+        with self.assertRaises(ClientError):
+            self.api.get("/data/list/1234")
+        span = self.spans.spans[0]
+        self.assertEqual(span["status"], None)
+        self.assertTrue(span["error"].startswith("ConnectionError"))
+
+    def test_sinks(self):
+        for i in range(3):
+            self.api.get("/data/list/" + str(i))
+        self.api.get("/assignment/abc")
+        self.tracer.close()
+        summary = self.stats.summary()
+        self.assertEqual(sorted((_["endpoint"], _["requests"])
+                                for _ in summary),
+                         [("/assignment/abc", 1), ("/data/list/{id}", 3)])
+        with open(self.jsonl) as f:
+            records = [json.loads(_) for _ in f]
+        self.assertEqual(records, self.spans.spans)
+        with open(self.otlp) as f:
+            spans = json.load(f)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertEqual(len(spans), 4)
+        self.assertEqual(spans[0]["name"], "GET /data/list/{id}")
+        self.assertEqual(len(set(_["traceId"] for _ in spans)), 1)
+        attributes = {_["key"]: _["value"] for _ in spans[0]["attributes"]}
+        self.assertEqual(attributes["http.response.status_code"],
+                         {"intValue": "200"})
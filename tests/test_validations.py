@@ -57,6 +57,14 @@ class ValidateConfigTests(unittest.TestCase):
                 validate_config(config)
             self.assertTrue("directory does not exist" in str(cm.exception))
 
+    def test_sleep_zero(self):
+        config = MockConfig()
+        config.sleep = 0
+        self.assertEqual(validate_config(config).sleep, 0)
+        config.sleep = -1
+        with self.assertRaises(ValidationError):
+            validate_config(config)
+
 
 class ValidateCredentialsTests(unittest.TestCase):
     """ensures a credentials manager has both a username and password"""